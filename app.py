@@ -1,8 +1,13 @@
 import gradio as gr
-from langchain_core.messages import HumanMessage, AIMessage
 from typing import List, Tuple
 from src.common.logger import log
-from src.bot.graph import GraphBuilder
+from src.common import config
+from src.bot.service import (
+    astream_reply,
+    delete_conversation,
+    get_chatbot_graph,
+    start_warm_up,
+)
 from dotenv import load_dotenv
 import os
 import uuid
@@ -10,18 +15,15 @@ import uuid
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
+# With CHAT_SERVER_URL, the LLM is called by the chat server (serve.py)
+if config.LLM_TYPE == "google_genai" and not config.CHAT_SERVER_URL and not GOOGLE_API_KEY:
     raise ValueError(
         "GOOGLE_API_KEY not found. Please set it in Hugging Face Space secrets."
     )
 
-log.info("Initializing LangGraph chatbot graph...")
-try:
-    chatbot_graph = GraphBuilder.build_graph()
-    log.info("Chatbot graph initialized successfully.")
-except Exception as e:
-    log.critical(f"Failed to initialize the chatbot graph: {e}")
-    raise
+# The chatbot graph and its models are built on first use (see
+# src/bot/service.py), warmed up in the background once the UI is up.
+# With CHAT_SERVER_URL, chats are answered by the workers of serve.py instead.
 
 
 with gr.Blocks(theme="soft", title="Jira Reviews ChatBot") as demo:
@@ -56,10 +58,14 @@ with gr.Blocks(theme="soft", title="Jira Reviews ChatBot") as demo:
         log.info(f"New user session started. Thread ID: {new_thread_id}")
         return new_thread_id, []
 
-    def handle_chat(message: str, history: List[Tuple[str, str]], thread_id: str):
+    async def handle_chat(
+        message: str, history: List[Tuple[str, str]], thread_id: str
+    ):
         """
-        Main chat logic that streams the response from the LangGraph agent.
-        Receives the unique thread_id from the session state.
+        Main chat logic that streams the response from the LangGraph agent
+        token by token.
+        Receives the unique thread_id from the session state. It runs on the
+        event loop, so waiting on the LLM does not hold a worker thread.
         """
         if not thread_id:
             # This is a fallback, the demo.load should always provide a thread_id
@@ -73,16 +79,17 @@ with gr.Blocks(theme="soft", title="Jira Reviews ChatBot") as demo:
 
         response_stream = ""
         try:
-            # Stream the response using the unique thread_id for memory
-            for chunk in chatbot_graph.stream(
-                {"messages": [HumanMessage(content=message.strip())]},
-                {"configurable": {"thread_id": thread_id}},
-                stream_mode="values",
-            ):
-                if isinstance(chunk["messages"][-1], AIMessage):
-                    response_stream = chunk["messages"][-1].content
-                    history[-1][1] = response_stream
-                    yield history, thread_id
+            if not config.CHAT_SERVER_URL and not get_chatbot_graph.loaded():
+                history[-1][1] = config.WARM_UP_MESSAGE
+                yield history, thread_id
+            # Stream LLM tokens as they are generated, using the unique
+            # thread_id for memory
+            async for text, replace in astream_reply(message, thread_id):
+                # A complete message (e.g. a node's final or fallback answer)
+                # replaces the tokens streamed so far
+                response_stream = text if replace else response_stream + text
+                history[-1][1] = response_stream
+                yield history, thread_id
 
         except Exception as e:
             log.error(f"Error during chatbot stream for thread '{thread_id}': {e}")
@@ -108,18 +115,33 @@ with gr.Blocks(theme="soft", title="Jira Reviews ChatBot") as demo:
         inputs=[chat_input, chatbot, thread_id_state],
         # Return the updated chatbot history and the (unchanged) thread_id
         outputs=[chatbot, thread_id_state],
+        # handle_chat is async, so concurrent chats share the event loop
+        # instead of queueing behind Gradio's default limit of one
+        concurrency_limit=config.CHAT_CONCURRENCY_LIMIT,
     )
     # ...also clear the input textbox after submission.
     chat_input.submit(fn=lambda: "", inputs=[], outputs=[chat_input])
 
+    def restart_session(thread_id: str):
+        """Deletes the finished conversation and starts a new one."""
+        if thread_id:
+            try:
+                delete_conversation(thread_id)
+            except Exception as e:
+                log.error(f"Failed to delete thread '{thread_id}': {e}")
+        return start_new_session()
+
     # 3. When the user clicks the "New Chat" button, start a new session.
     clear_button.click(
-        fn=start_new_session,
-        inputs=[],
+        fn=restart_session,
+        inputs=[thread_id_state],
         # Reset the thread_id state and clear the chatbot UI
         outputs=[thread_id_state, chatbot],
     )
 
 
 if __name__ == "__main__":
-    demo.launch(debug=True)
+    demo.launch(prevent_thread_lock=True, show_error=True)
+    if not config.CHAT_SERVER_URL:
+        start_warm_up()
+    demo.block_thread()
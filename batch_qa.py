@@ -0,0 +1,47 @@
+"""
+Answers a JSONL file of questions offline.
+
+Each input line is {"id": ..., "query": ...} (or a bare JSON string). One
+JSON line per question is appended to the output as soon as it is answered,
+with the answer, the ids of the reviews used and the time spent embedding,
+retrieving and generating. Rerunning on the same output file skips the
+questions already answered.
+
+Usage:
+    python batch_qa.py questions.jsonl answers.jsonl
+    python batch_qa.py questions.jsonl answers.jsonl --llm fake --batch-size 128
+"""
+
+from src.common import config
+from src.common.logger import setup_logger
+from src.rag.batch_runner import BatchQuestionAnswering
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--llm", default=config.LLM_TYPE, help='"google_genai" or "fake"')
+    parser.add_argument("--batch-size", type=int, default=config.BATCH_QA_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=config.BATCH_QA_CONCURRENCY)
+    parser.add_argument(
+        "--rps",
+        type=float,
+        default=config.BATCH_QA_REQUESTS_PER_SECOND,
+        help="LLM calls started per second (0: unlimited)",
+    )
+    args = parser.parse_args()
+    setup_logger(file_name="batch_qa.log")
+    runner = BatchQuestionAnswering.from_config(
+        llm_type=args.llm,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        requests_per_second=args.rps or None,
+    )
+    summary = runner.run(args.input, args.output)
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
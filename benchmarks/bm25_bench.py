@@ -0,0 +1,108 @@
+"""
+BM25 query latency: vectorized CSR engine vs langchain's BM25Retriever.
+
+For each corpus size, synthetic reviews are indexed by both engines and the
+same sampled queries are timed one at a time; the vectorized engine is also
+timed in batches. Rankings are checked against rank_bm25: `ids` counts
+queries whose top-k document ids are identical, `scores` counts queries whose
+top-k scores agree (ids can only differ among tied scores).
+
+rank_bm25 keeps a Python dict per document, so the reference is skipped above
+--reference-max-docs to stay within memory.
+
+Usage:
+    python -m benchmarks.bm25_bench
+    python -m benchmarks.bm25_bench --sizes 3500,100000 --queries 200
+"""
+
+from benchmarks.common import summarize
+from benchmarks.synthetic import ReviewModel
+from langchain_community.retrievers import BM25Retriever
+from langchain_core.documents import Document
+from src.common import config
+from src.rag.bm25_index import Bm25Index
+import argparse
+import numpy as np
+import time
+
+
+def time_queries(search, queries: list) -> list:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def check_rankings(index: Bm25Index, reference: BM25Retriever, queries: list, k: int):
+    same_ids = same_scores = 0
+    for query in queries:
+        tokens = query.split()
+        doc_ids, scores = index.top_k_batch([tokens], k)[0]
+        reference_scores = reference.vectorizer.get_scores(tokens)
+        reference_ids = np.argsort(reference_scores)[::-1][:k]
+        # The reference pads with non-matching documents; compare matches only
+        reference_ids = reference_ids[reference_scores[reference_ids] > 0]
+        same_ids += doc_ids.tolist() == reference_ids.tolist()
+        same_scores += len(scores) == len(reference_ids) and np.allclose(
+            scores, reference_scores[reference_ids], rtol=1e-5
+        )
+    return same_ids, same_scores
+
+
+def run(size: int, model: ReviewModel, args):
+    rng = np.random.default_rng(size)
+    queries = [model.sample_query(rng) for _ in range(args.queries)]
+    texts = [review["review_detail"] for review in model.generate(size, seed=size)]
+    tokens = sum(len(text.split()) for text in texts)
+    print(f"\n{size} reviews ({tokens / size:.0f} tokens/review)")
+
+    start = time.perf_counter()
+    index = Bm25Index.build(texts)
+    print(f"  csr build      {time.perf_counter() - start:.2f} s  nnz={index.matrix.nnz}")
+    print("  " + summarize("csr", time_queries(
+        lambda q: index.top_k(q.split(), args.k), queries
+    )))
+    tokenized = [query.split() for query in queries]
+    start = time.perf_counter()
+    for i in range(0, len(tokenized), args.batch_size):
+        index.top_k_batch(tokenized[i : i + args.batch_size], args.k)
+    elapsed = time.perf_counter() - start
+    print(
+        f"  csr batch      {len(queries) / elapsed:.0f} queries/s "
+        f"(batches of {args.batch_size})"
+    )
+
+    if size > args.reference_max_docs:
+        print("  rank_bm25      skipped (--reference-max-docs)")
+        return
+    documents = [Document(page_content=text) for text in texts]
+    del texts
+    start = time.perf_counter()
+    reference = BM25Retriever.from_documents(documents, k=args.k)
+    print(f"  rank_bm25 build {time.perf_counter() - start:.2f} s")
+    print("  " + summarize("rank_bm25", time_queries(reference.invoke, queries)))
+    same_ids, same_scores = check_rankings(index, reference, queries, args.k)
+    print(
+        f"  rankings       ids {same_ids}/{len(queries)}  "
+        f"scores {same_scores}/{len(queries)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="3500,100000,1000000")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=config.SPARSE_RETRIEVED_DOCUMENTS)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--reference-max-docs", type=int, default=100_000)
+    args = parser.parse_args()
+
+    model = ReviewModel.from_dataset()
+    for size in map(int, args.sizes.split(",")):
+        run(size, model, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Conversation checkpointer under many concurrent sessions: LangGraph's
+MemorySaver vs the bounded SQLite checkpointer.
+
+Each session is a multi-turn chat through the compiled graph (fake LLM,
+static retriever) on one event loop. Reported per backend: checkpoint read
+and write latency as the graph sees it, chat throughput, and what is left in
+memory and on disk afterwards. MemorySaver keeps every checkpoint of every
+thread; the SQLite checkpointer keeps the last messages and checkpoints of
+each thread, and caps its cache.
+
+Usage:
+    python -m benchmarks.checkpoint_bench
+    python -m benchmarks.checkpoint_bench --sessions 1000 --turns 10 --concurrency 100
+"""
+
+from benchmarks.common import static_retriever, summarize
+from langchain_core.messages import HumanMessage
+from src.bot.checkpointer import SqliteCheckpointer
+from src.bot.graph import GraphBuilder
+from src.bot.router import build_router
+from src.rag.llms import FakeLLM
+from src.rag.rag_executor import RAGExecutor
+from langgraph.checkpoint.memory import MemorySaver
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+
+def instrument(saver) -> dict:
+    """Times the checkpointer calls the graph makes, in seconds."""
+    timings = {"read": [], "write": []}
+
+    def timed(name, method):
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                timings[name].append(time.perf_counter() - start)
+
+        return wrapper
+
+    saver.aget_tuple = timed("read", saver.aget_tuple)
+    saver.aput = timed("write", saver.aput)
+    saver.aput_writes = timed("write", saver.aput_writes)
+    return timings
+
+
+def memory_saver_bytes(saver: MemorySaver) -> int:
+    """Serialized size of everything a MemorySaver holds."""
+    total = sum(len(blob) for _, blob in saver.blobs.values())
+    for namespaces in saver.storage.values():
+        for checkpoints in namespaces.values():
+            for checkpoint, metadata, _ in checkpoints.values():
+                total += len(checkpoint[1]) + len(metadata[1])
+    for writes in saver.writes.values():
+        total += sum(len(value[1]) for _, _, value, _ in writes.values())
+    return total
+
+
+async def run_sessions(graph, sessions: int, turns: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def session(i: int):
+        async with semaphore:
+            for turn in range(turns):
+                await graph.ainvoke(
+                    {"messages": [HumanMessage(content=f"Is Jira good for agile? {turn}")]},
+                    {"configurable": {"thread_id": f"session-{i}"}},
+                )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    return time.perf_counter() - start
+
+
+def run(name: str, saver, args) -> None:
+    llm = FakeLLM(latency=args.llm_latency).get_llm()
+    graph = GraphBuilder.build_graph(
+        chat_model=llm,
+        rag_agent=RAGExecutor(retriever=static_retriever(), llm=llm),
+        router=build_router("llm", chat_model=llm),
+        speculative_retrieval=False,
+        checkpointer=saver,
+    )
+    timings = instrument(saver)
+    elapsed = asyncio.run(run_sessions(graph, args.sessions, args.turns, args.concurrency))
+    turns = args.sessions * args.turns
+    print(f"\n{name}: {turns / elapsed:.1f} turns/s")
+    print("  " + summarize("read", timings["read"]))
+    print("  " + summarize("write", timings["write"]))
+    if isinstance(saver, SqliteCheckpointer):
+        saver.flush()
+        stats = saver.stats()
+        print(
+            f"  in memory {stats['cache_bytes'] / 1e6:.2f} MB "
+            f"({stats['cached_threads']} threads cached), "
+            f"on disk {stats['disk_bytes'] / 1e6:.2f} MB ({stats['threads']} threads)"
+        )
+        print(
+            "  " + ", ".join(
+                f"{op} p50={s['p50_ms']:.3f} ms p95={s['p95_ms']:.3f} ms"
+                for op, s in stats["latencies"].items()
+                if op in ("flush", "sweep") and s["calls"]
+            )
+        )
+        saver.close()
+    else:
+        print(f"  in memory {memory_saver_bytes(saver) / 1e6:.2f} MB (every checkpoint kept)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--max-cached-threads", type=int, default=200)
+    args = parser.parse_args()
+
+    run("MemorySaver", MemorySaver(), args)
+    with tempfile.TemporaryDirectory(prefix="checkpoint_bench_") as directory:
+        run(
+            "SqliteCheckpointer",
+            SqliteCheckpointer(
+                os.path.join(directory, "checkpoints.sqlite"),
+                max_cached_threads=args.max_cached_threads,
+            ),
+            args,
+        )
+
+
+if __name__ == "__main__":
+    main()
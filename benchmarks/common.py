@@ -0,0 +1,64 @@
+"""Shared helpers for the offline benchmarks."""
+
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+import asyncio
+import statistics
+import time
+
+
+DOCUMENTS = [
+    Document(
+        page_content="title: Great for agile teams\npros: Boards and sprints are easy.\n",
+        metadata={"author": "Bench A.", "review_date": "June 2024", "rating": 5.0},
+    ),
+    Document(
+        page_content="title: Steep learning curve\ncons: Workflows are complex.\n",
+        metadata={"author": "Bench B.", "review_date": "May 2024", "rating": 3.0},
+    ),
+]
+
+
+def static_retriever(documents=None, latency: float = 0.0):
+    """
+    A retriever stand-in that always returns the same documents after
+    `latency` seconds.
+    """
+    documents = documents if documents is not None else DOCUMENTS
+
+    def retrieve(query):
+        time.sleep(latency)
+        return documents
+
+    async def aretrieve(query):
+        await asyncio.sleep(latency)
+        return documents
+
+    return RunnableLambda(retrieve, afunc=aretrieve)
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def summarize(label: str, timings: list) -> str:
+    """Formats mean/p50/p95 of `timings` (seconds) in milliseconds."""
+    timings_ms = [t * 1000 for t in timings]
+    return (
+        f"{label:<8} mean={statistics.mean(timings_ms):.3f} ms  "
+        f"p50={statistics.median(timings_ms):.3f} ms  "
+        f"p95={percentile(timings_ms, 0.95):.3f} ms"
+    )
+
+
+def latency_stats(timings: list) -> dict:
+    """Mean/p50/p95/max of `timings` (seconds) in milliseconds, for JSON reports."""
+    timings_ms = [t * 1000 for t in timings]
+    return {
+        "count": len(timings_ms),
+        "mean_ms": round(statistics.mean(timings_ms), 3),
+        "p50_ms": round(statistics.median(timings_ms), 3),
+        "p95_ms": round(percentile(timings_ms, 0.95), 3),
+        "max_ms": round(max(timings_ms), 3),
+    }
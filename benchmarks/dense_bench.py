@@ -0,0 +1,112 @@
+"""
+Dense retrieval latency and recall: exact NumPy index vs Chroma (HNSW).
+
+Both stores hold the same synthetic, clustered 768-d unit vectors (BGE-base
+dimensions) and answer the same queries: noisy copies of random documents.
+Recall@k is measured against exact cosine ranking. Query embedding is left
+out, since it costs the same for both stores. Timings go through the
+langchain VectorStore interface the retriever uses.
+
+Usage:
+    python -m benchmarks.dense_bench
+    python -m benchmarks.dense_bench --sizes 3500,20000 --queries 200 --k 3
+"""
+
+from benchmarks.common import summarize
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from src.rag.dense_index import DenseIndex, DenseIndexVectorStore
+from src.rag.docstore import InMemoryDocStore
+import argparse
+import numpy as np
+import tempfile
+import time
+
+
+def clustered_vectors(n: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit vectors around a few hundred topics, like review embeddings."""
+    centers = rng.normal(size=(max(8, n // 20), dim))
+    vectors = centers[rng.integers(0, len(centers), size=n)]
+    vectors = vectors + rng.normal(scale=0.6, size=(n, dim))
+    return DenseIndex.normalize(vectors)
+
+
+def time_queries(search, queries) -> tuple:
+    timings, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        timings.append(time.perf_counter() - start)
+    return timings, results
+
+
+def recall(results: list, truth: np.ndarray) -> float:
+    found = [
+        len({doc.metadata["row"] for doc in docs} & set(row.tolist()))
+        for docs, row in zip(results, truth)
+    ]
+    return sum(found) / truth.size
+
+
+def run(size: int, args):
+    rng = np.random.default_rng(size)
+    vectors = clustered_vectors(size, args.dim, rng)
+    rows = rng.integers(0, size, size=args.queries)
+    queries = DenseIndex.normalize(
+        vectors[rows] + rng.normal(scale=0.05, size=(args.queries, args.dim))
+    )
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, : args.k]
+    documents = [
+        Document(page_content=f"review {i}", metadata={"row": i}) for i in range(size)
+    ]
+    print(f"\n{size} documents x {args.dim} dims, k={args.k}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        DenseIndex.write([vectors], size, args.dim, directory + "/dense")
+        numpy_store = DenseIndexVectorStore(
+            None,
+            index=DenseIndex.load(directory + "/dense"),
+            docstore=InMemoryDocStore(documents),
+        )
+        timings, results = time_queries(
+            lambda q: numpy_store.similarity_search_by_vector(q.tolist(), k=args.k),
+            queries,
+        )
+        print("  " + summarize("numpy", timings) + f"  recall={recall(results, truth):.3f}")
+        start = time.perf_counter()
+        for i in range(0, len(queries), args.batch_size):
+            numpy_store._index.search_batch(queries[i : i + args.batch_size], args.k)
+        elapsed = time.perf_counter() - start
+        print(f"  numpy batch {len(queries) / elapsed:.0f} queries/s")
+
+        chroma = Chroma(persist_directory=directory + "/chroma")
+        start = time.perf_counter()
+        for i in range(0, size, 4096):
+            chroma._collection.add(
+                ids=[str(j) for j in range(i, min(i + 4096, size))],
+                embeddings=vectors[i : i + 4096],
+                documents=[doc.page_content for doc in documents[i : i + 4096]],
+                metadatas=[doc.metadata for doc in documents[i : i + 4096]],
+            )
+        print(f"  chroma load {time.perf_counter() - start:.1f} s")
+        timings, results = time_queries(
+            lambda q: chroma.similarity_search_by_vector(q.tolist(), k=args.k),
+            queries,
+        )
+        print("  " + summarize("chroma", timings) + f"  recall={recall(results, truth):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="3500,20000")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+    for size in map(int, args.sizes.split(",")):
+        run(size, args)
+
+
+if __name__ == "__main__":
+    main()
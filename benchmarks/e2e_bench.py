@@ -0,0 +1,274 @@
+"""
+End-to-end benchmark of the chatbot on synthetic corpora.
+
+For each corpus size, synthetic reviews in the schema of
+data/all_reviews.json are written to a temporary directory and the whole
+pipeline is run against them, offline:
+
+    ingest        ingest_data() into temporary stores and indexes
+    cold start    create_ensemble_retriever() and GraphBuilder.build_graph()
+    stages        per-query latency of route, retrieve, format and generate
+    throughput    concurrent chats through the compiled graph (graph.ainvoke)
+
+The LLM is the deterministic fake (with --llm-latency seconds per call) and
+the embedder is a deterministic hashing fake (--embedder fake) or a small
+local sentence-transformers model, so the numbers measure this code rather
+than a remote API. Results are written as JSON, with the git commit, so runs
+on two commits can be compared with --baseline.
+
+Usage:
+    python -m benchmarks.e2e_bench
+    python -m benchmarks.e2e_bench --sizes 1000,10000,100000,1000000 --output e2e.json
+    python -m benchmarks.e2e_bench --embedder sentence-transformers/all-MiniLM-L6-v2
+    python -m benchmarks.e2e_bench --baseline e2e_main.json --output e2e_branch.json
+"""
+
+from benchmarks.common import latency_stats
+from benchmarks.synthetic import ReviewModel, write_corpus
+from contextlib import contextmanager
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.messages import HumanMessage
+from src.bot.graph import GraphBuilder
+from src.bot.router import build_router
+from src.common import config
+from src.common.logger import log
+from src.common.utils import measure_time
+from src.rag.embeddings import HfEmbedder
+from src.rag.llms import FakeLLM
+from src.rag.rag_executor import RAGExecutor
+from src.rag.retriever import create_ensemble_retriever
+from ingest import ingest_data
+import argparse
+import asyncio
+import json
+import numpy as np
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import uuid
+
+
+# Every path ingestion writes and the retrievers read
+PATH_SETTINGS = {
+    "REVIEW_DATA_PATH": "reviews.json",
+    "DB_PERSIST_DIRECTORY": "chroma_db",
+    "DOCSTORE_DIRECTORY": "docstore",
+    "BM25_INDEX_DIRECTORY": "bm25",
+    "DENSE_INDEX_DIRECTORY": "dense",
+    "METADATA_INDEX_DIRECTORY": "metadata",
+    "INGEST_MANIFEST_PATH": "manifest.json",
+    "INGEST_CHECKPOINT_PATH": "ingest_checkpoint.json",
+    "EMBEDDING_CACHE_DIRECTORY": "embedding_cache",
+}
+
+
+@contextmanager
+def overridden(settings: dict, embeddings):
+    """
+    Points config at `settings` and shares `embeddings` as the process-wide
+    embedding model, restoring both afterwards.
+    """
+    saved = {name: getattr(config, name) for name in settings}
+    saved_embeddings = HfEmbedder._embeddings
+    for name, value in settings.items():
+        setattr(config, name, value)
+    HfEmbedder._embeddings = embeddings
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+        HfEmbedder._embeddings = saved_embeddings
+
+
+def load_embedder(name: str):
+    if name == "fake":
+        return DeterministicFakeEmbedding(size=384)
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=name, model_kwargs=config.MODEL_KWARGS)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def stage_latencies(router, rag_agent, queries: list) -> dict:
+    """Latency of each stage of the RAG path, one query at a time."""
+    generator = rag_agent.generator
+    timings = {"route": [], "retrieve": [], "format": [], "generate": []}
+    for query in queries:
+        _, seconds = timed(router.route, query)
+        timings["route"].append(seconds)
+        documents, seconds = timed(rag_agent.ensemble_retriever.invoke, query)
+        timings["retrieve"].append(seconds)
+        context, seconds = timed(generator.format_retrieved_document, documents, query)
+        timings["format"].append(seconds)
+        _, seconds = timed(
+            generator.answer_chain.invoke, {"input": query, "context": context}
+        )
+        timings["generate"].append(seconds)
+    return {stage: latency_stats(values) for stage, values in timings.items()}
+
+
+async def throughput(graph, queries: list, chats: int, concurrency: int) -> dict:
+    """Chats per second with at most `concurrency` chats in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_chat(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await graph.ainvoke(
+                {"messages": [HumanMessage(content=queries[i % len(queries)])]},
+                {"configurable": {"thread_id": str(uuid.uuid4())}},
+            )
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_chat(i) for i in range(chats)))
+    elapsed = time.perf_counter() - start
+    return {
+        "chats": chats,
+        "concurrency": concurrency,
+        "chats_per_second": round(chats / elapsed, 2),
+        "latency": latency_stats(latencies),
+    }
+
+
+def run(size: int, model: ReviewModel, embeddings, args) -> dict:
+    rng = np.random.default_rng(size)
+    # Phrased like user questions, so the keyword router sends them to RAG
+    queries = [
+        f"What do reviews say about {model.sample_query(rng)}?"
+        for _ in range(args.queries)
+    ]
+    result = {"size": size}
+    with tempfile.TemporaryDirectory(prefix="e2e_bench_") as directory:
+        settings = {
+            name: os.path.join(directory, path) for name, path in PATH_SETTINGS.items()
+        }
+        with overridden(settings, embeddings):
+            with measure_time(f"Writing {size} synthetic reviews", log) as timing:
+                write_corpus(config.REVIEW_DATA_PATH, size, model, seed=size)
+            result["corpus_seconds"] = round(timing["seconds"], 3)
+            with measure_time(f"Ingesting {size} reviews", log) as timing:
+                ingest_data(embeddings=embeddings)
+            result["ingest_seconds"] = round(timing["seconds"], 3)
+            result["ingest_reviews_per_second"] = round(size / timing["seconds"], 1)
+
+            llm = FakeLLM(latency=args.llm_latency).get_llm()
+            with measure_time("Cold start: ensemble retriever", log) as timing:
+                retriever = create_ensemble_retriever()
+            result["cold_start_retriever_seconds"] = round(timing["seconds"], 3)
+            with measure_time("Cold start: graph", log) as timing:
+                rag_agent = RAGExecutor(retriever=retriever, llm=llm)
+                router = build_router(config.ROUTER_TYPE, chat_model=llm, embeddings=embeddings)
+                graph = GraphBuilder.build_graph(chat_model=llm, rag_agent=rag_agent, router=router)
+            result["cold_start_graph_seconds"] = round(timing["seconds"], 3)
+
+            # Warm-up: the first queries pay for memory-mapping the indexes
+            stage_latencies(router, rag_agent, queries[:3])
+            result["stages"] = stage_latencies(router, rag_agent, queries)
+            result["throughput"] = asyncio.run(
+                throughput(graph, queries, args.chats, args.concurrency)
+            )
+    return result
+
+
+def compare(results: list, baseline_path: str):
+    """Prints the change of the headline numbers against a previous report."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {run["size"]: run for run in json.load(f)["runs"]}
+    print(f"\nChange against {baseline_path} (negative is faster):")
+    for run in results:
+        before = baseline.get(run["size"])
+        if before is None:
+            continue
+        rows = [
+            ("ingest s", before["ingest_seconds"], run["ingest_seconds"]),
+            (
+                "cold start s",
+                before["cold_start_retriever_seconds"] + before["cold_start_graph_seconds"],
+                run["cold_start_retriever_seconds"] + run["cold_start_graph_seconds"],
+            ),
+        ]
+        rows += [
+            (f"{stage} p50 ms", before["stages"][stage]["p50_ms"], stats["p50_ms"])
+            for stage, stats in run["stages"].items()
+        ]
+        rows.append(
+            (
+                "chat p95 ms",
+                before["throughput"]["latency"]["p95_ms"],
+                run["throughput"]["latency"]["p95_ms"],
+            )
+        )
+        for label, old, new in rows:
+            change = (new - old) / old if old else 0.0
+            print(f"  {run['size']:>8}  {label:<16} {old:>10.3f} -> {new:>10.3f}  {change:+.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--embedder",
+        default="fake",
+        help='"fake" (deterministic hashing) or a sentence-transformers model name',
+    )
+    parser.add_argument("--output", default="e2e_bench.json")
+    parser.add_argument("--baseline", help="A previous --output to compare with")
+    args = parser.parse_args()
+
+    model = ReviewModel.from_dataset()
+    embeddings = load_embedder(args.embedder)
+    runs = []
+    for size in map(int, args.sizes.split(",")):
+        runs.append(run(size, model, embeddings, args))
+        print(json.dumps(runs[-1], indent=2))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "settings": {
+            "vector_store": config.VECTOR_STORE_TYPE,
+            "router": config.ROUTER_TYPE,
+            "fusion": config.FUSION_METHOD,
+            "rerank": config.RERANK_ENABLED,
+        },
+        "args": vars(args),
+        "runs": runs,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.baseline:
+        compare(runs, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
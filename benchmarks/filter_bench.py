@@ -0,0 +1,133 @@
+"""
+Metadata-filtered retrieval at scale: filters pushed down into the indexes
+vs filtering the results afterwards.
+
+For each corpus size, synthetic reviews (with ratings and dates sampled from
+the real ones) are indexed by BM25, an exact dense index and the metadata
+index. Filtered queries ("negative reviews from 2024", ...) are answered
+two ways:
+
+    pushdown     the metadata index selects the reviews, and only those are
+                 ranked (BM25 mask, dense rows)
+    post-filter  the unfiltered top k * --overfetch are retrieved and the
+                 ones failing the filter dropped
+
+Recall@k is measured against the exact filtered top k, which pushdown
+returns by construction; post-filtering misses results of selective filters.
+
+Usage:
+    python -m benchmarks.filter_bench
+    python -m benchmarks.filter_bench --sizes 3500,100000 --queries 100 --overfetch 10
+"""
+
+from benchmarks.common import summarize
+from benchmarks.dense_bench import clustered_vectors
+from benchmarks.synthetic import ReviewModel
+from langchain_core.documents import Document
+from src.rag.bm25_index import Bm25Index
+from src.rag.dense_index import DenseIndex
+from src.rag.metadata_index import MetadataIndex, extract_filter
+import argparse
+import numpy as np
+import time
+
+
+FILTERED_QUERIES = [
+    "negative reviews from 2024",
+    "5-star reviews",
+    "reviews from June 2023",
+    "positive reviews since 2022",
+    "at least 4.5 stars before 2020",
+]
+
+
+def timed(search, queries: list) -> tuple:
+    timings, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        timings.append(time.perf_counter() - start)
+    return timings, results
+
+
+def recall(results: list, truth: list) -> float:
+    found = sum(len(set(r.tolist()) & set(t.tolist())) for r, t in zip(results, truth))
+    return found / max(1, sum(len(t) for t in truth))
+
+
+def run(size: int, model: ReviewModel, args):
+    rng = np.random.default_rng(size)
+    reviews = list(model.generate(size, seed=size))
+    documents = [
+        Document(
+            page_content=review["review_detail"],
+            metadata={"rating": review["rating"], "review_date": review["review_date"]},
+        )
+        for review in reviews
+    ]
+    metadata_index = MetadataIndex.build(documents)
+    bm25 = Bm25Index.build(doc.page_content for doc in documents)
+    dense = DenseIndex(clustered_vectors(size, args.dim, rng))
+
+    # Each query: a filter phrase plus sampled words to rank by
+    queries = []
+    for i in range(args.queries):
+        metadata_filter, _ = extract_filter(FILTERED_QUERIES[i % len(FILTERED_QUERIES)])
+        queries.append(
+            (
+                metadata_filter,
+                model.sample_query(rng).split(),
+                dense.embeddings[rng.integers(0, size)],
+            )
+        )
+    selectivity = np.mean([len(metadata_index.positions(f)) / size for f, _, _ in queries])
+    print(f"\n{size} reviews, k={args.k}, mean filter selectivity {selectivity:.1%}")
+
+    k, overfetch = args.k, args.k * args.overfetch
+
+    def bm25_pushdown(query):
+        metadata_filter, tokens, _ = query
+        return bm25.top_k_batch([tokens], k, metadata_index.mask(metadata_filter))[0][0]
+
+    def bm25_postfilter(query):
+        metadata_filter, tokens, _ = query
+        doc_ids, _ = bm25.top_k_batch([tokens], overfetch)[0]
+        return doc_ids[metadata_index.mask(metadata_filter)[doc_ids]][:k]
+
+    def dense_pushdown(query):
+        metadata_filter, _, vector = query
+        return dense.search(vector, k, metadata_index.positions(metadata_filter))[0]
+
+    def dense_postfilter(query):
+        metadata_filter, _, vector = query
+        ids, _ = dense.search(vector, overfetch)
+        return ids[metadata_index.mask(metadata_filter)[ids]][:k]
+
+    for name, pushdown, postfilter in [
+        ("bm25", bm25_pushdown, bm25_postfilter),
+        ("dense", dense_pushdown, dense_postfilter),
+    ]:
+        push_timings, truth = timed(pushdown, queries)
+        post_timings, results = timed(postfilter, queries)
+        print("  " + summarize(f"{name}", push_timings) + "  pushdown     recall=1.000")
+        print(
+            "  " + summarize(f"{name}", post_timings)
+            + f"  post-filter  recall={recall(results, truth):.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="3500,100000")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--overfetch", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+    model = ReviewModel.from_dataset()
+    for size in map(int, args.sizes.split(",")):
+        run(size, model, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Offline evaluation of the score fusion methods on a labeled query set.
+
+Reads `data/fusion_eval.jsonl` ({"query", "relevant_ids"} per line, ids being
+review ids) and retrieves the candidates of the dense and sparse retrievers
+once per query. Each fusion method (rrf, minmax, convex) then fuses the same
+candidates; its recall@k, MRR@k and fusion latency are reported.
+
+The default set holds known-item queries: the title of a sampled review,
+whose only relevant review is the review itself. `--build` samples a new set.
+
+Usage:
+    python -m benchmarks.fusion_eval
+    python -m benchmarks.fusion_eval --k 4 --depth 20 --weights 0.3,0.7
+    python -m benchmarks.fusion_eval --build   # resample the known-item queries
+"""
+
+from benchmarks.common import percentile
+from src.common import config
+from src.common.utils import load_json_from_file, review_id
+from src.rag.fusion import FUSION_METHODS, get_fusion, scored_results
+from src.rag.retriever import Bm25Retriever, ChromaRetriever
+from src.rag.vector_stores import load_vector_store
+import argparse
+import json
+import statistics
+import time
+
+
+EVAL_SET_PATH = "data/fusion_eval.jsonl"
+
+
+def load_eval_set(fp: str) -> list:
+    with open(fp, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_eval_set(fp: str, step: int = 29, min_words: int = 4):
+    """Writes a known-item query for the title of every `step`-th review."""
+    examples = []
+    for review in load_json_from_file(config.REVIEW_DATA_PATH)[::step]:
+        first_line = review["review_detail"].split("\n")[0]
+        if not first_line.startswith("title:"):
+            continue
+        title = first_line[len("title:") :].strip().strip('"')
+        if len(title.split()) >= min_words:
+            examples.append({"query": title, "relevant_ids": [review_id(review)]})
+    with open(fp, "w", encoding="utf-8") as f:
+        for example in examples:
+            f.write(json.dumps(example) + "\n")
+    print(f"Wrote {len(examples)} queries to {fp}")
+
+
+def evaluate(fusion, candidates: list, examples: list, k: int) -> dict:
+    recall, reciprocal_ranks, latencies_ms = [], [], []
+    for results, example in zip(candidates, examples):
+        start = time.perf_counter()
+        fused = fusion.fuse(results, k)
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+        fused_ids = [doc.metadata.get("review_id") for doc in fused]
+        relevant = set(example["relevant_ids"])
+        recall.append(len(relevant.intersection(fused_ids)) / len(relevant))
+        ranks = [rank for rank, i in enumerate(fused_ids, start=1) if i in relevant]
+        reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+    return {
+        "recall": statistics.mean(recall),
+        "mrr": statistics.mean(reciprocal_ranks),
+        "p50_ms": statistics.median(latencies_ms),
+        "p95_ms": percentile(latencies_ms, 0.95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--eval-set", default=EVAL_SET_PATH)
+    parser.add_argument("--k", type=int, default=config.FUSED_RETRIEVED_DOCUMENTS)
+    parser.add_argument(
+        "--depth", type=int, default=10, help="Candidates retrieved per retriever."
+    )
+    parser.add_argument(
+        "--weights",
+        default=",".join(map(str, config.ENSEMBLE_RETRIEVER_WEIGHTS)),
+        help="Comma-separated [dense, sparse] weights.",
+    )
+    parser.add_argument("--build", action="store_true")
+    args = parser.parse_args()
+
+    if args.build:
+        build_eval_set(args.eval_set)
+        return
+
+    examples = load_eval_set(args.eval_set)
+    weights = [float(w) for w in args.weights.split(",")]
+    dense = ChromaRetriever().get_retriever(load_vector_store(), k=args.depth)
+    sparse = Bm25Retriever().get_retriever()
+    sparse.k = args.depth
+    candidates = [
+        scored_results([dense.invoke(e["query"]), sparse.invoke(e["query"])])
+        for e in examples
+    ]
+
+    print(f"queries: {len(examples)}  k: {args.k}  depth: {args.depth}  weights: {weights}")
+    for position, name in enumerate(["dense", "sparse"]):
+        # A single retriever is "fused" alone to score it on the same metrics
+        single = [[results[position]] for results in candidates]
+        metrics = evaluate(get_fusion("rrf"), single, examples, args.k)
+        print(f"  {name:<7} recall@{args.k} {metrics['recall']:.3f}  MRR {metrics['mrr']:.3f}")
+    for method in FUSION_METHODS:
+        metrics = evaluate(get_fusion(method, weights), candidates, examples, args.k)
+        print(
+            f"  {method:<7} recall@{args.k} {metrics['recall']:.3f}  "
+            f"MRR {metrics['mrr']:.3f}  "
+            f"fusion p50 {metrics['p50_ms']:.3f} ms  p95 {metrics['p95_ms']:.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of the per-request overhead of the RAG generation path.
+
+"before" reproduces the old behaviour of `LcGeneration.generate_response`: a new
+LLM client and a new RAG chain for every query. "after" uses one
+`LcGeneration`, built once, for all queries. Retrieval and generation are
+replaced by a fixed document list and the offline fake LLM, so the numbers
+only reflect the framework overhead.
+
+Usage:
+    python -m benchmarks.generation_bench --requests 200
+"""
+
+from benchmarks.common import static_retriever, summarize
+from src.rag.chain import LcGeneration
+from src.rag.llms import FakeLLM, GoogleGenAiLLM
+import argparse
+import os
+import statistics
+import time
+
+
+QUERY = "Is Jira good for agile teams?"
+
+
+def run_before(requests: int, with_client: bool) -> list:
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        if with_client:
+            # the old code constructed a ChatGoogleGenerativeAI client per message
+            GoogleGenAiLLM().get_llm()
+        generator = LcGeneration(retriever=static_retriever(), llm=FakeLLM().get_llm())
+        generator.invoke(QUERY)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_after(requests: int) -> list:
+    generator = LcGeneration(retriever=static_retriever(), llm=FakeLLM().get_llm())
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        generator.invoke(QUERY)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument(
+        "--no-client",
+        action="store_true",
+        help="Do not construct a Google GenAI client per request in the 'before' run.",
+    )
+    args = parser.parse_args()
+
+    with_client = not args.no_client
+    if with_client:
+        # Constructing the client needs a key but does not call the API
+        os.environ.setdefault("GOOGLE_API_KEY", "benchmark-dummy-key")
+
+    # warm up imports and lazy initialisation on both paths
+    run_before(3, with_client)
+    run_after(3)
+
+    before = run_before(args.requests, with_client)
+    after = run_after(args.requests)
+    print(summarize("before", before))
+    print(summarize("after", after))
+    print(
+        f"per-request overhead saved: "
+        f"{(statistics.mean(before) - statistics.mean(after)) * 1000:.3f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
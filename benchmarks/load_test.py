@@ -0,0 +1,146 @@
+"""
+Load test of the chatbot graph with many concurrent conversations.
+
+The graph is built with the offline fake LLM (configurable latency) and a
+static retriever, so the run measures how the request path behaves while it
+waits on the LLM, not the LLM itself.
+
+- async mode drives every chat with `graph.astream` on one event loop, like
+  the async Gradio handler.
+- sync mode drives every chat with `graph.stream` on a thread pool, like a
+  sync Gradio handler (AnyIO's default pool has 40 threads).
+
+Usage:
+    python -m benchmarks.load_test --chats 500 --latency 0.5
+    python -m benchmarks.load_test --chats 500 --latency 0.5 --mode sync
+"""
+
+from benchmarks.common import percentile, static_retriever
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from src.bot.graph import GraphBuilder
+from src.bot.router import build_router
+from src.rag.llms import FakeLLM
+from src.rag.rag_executor import RAGExecutor
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+import uuid
+
+
+def build_graph(args):
+    llm = FakeLLM(
+        latency=args.latency, token_latency=args.token_latency, route=args.route
+    ).get_llm()
+    rag_agent = RAGExecutor(
+        retriever=static_retriever(latency=args.retrieval_latency), llm=llm
+    )
+    # The fake LLM router answers `route` after `latency` seconds
+    router = build_router("llm", chat_model=llm)
+    return GraphBuilder.build_graph(
+        chat_model=llm,
+        rag_agent=rag_agent,
+        router=router,
+        speculative_retrieval=args.speculative,
+    )
+
+
+def chat_input(i: int):
+    return (
+        {"messages": [HumanMessage(content=f"Is Jira good for agile teams? #{i}")]},
+        {"configurable": {"thread_id": str(uuid.uuid4())}},
+    )
+
+
+async def run_async(graph, chats: int) -> tuple:
+    peak_threads = threading.active_count()
+
+    async def one_chat(i: int):
+        start = time.perf_counter()
+        first_token = None
+        async for msg, _ in graph.astream(*chat_input(i), stream_mode="messages"):
+            if first_token is None and isinstance(msg, AIMessageChunk):
+                first_token = time.perf_counter() - start
+        return first_token, time.perf_counter() - start
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while True:
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.01)
+
+    sampler = asyncio.create_task(sample_threads())
+    results = await asyncio.gather(*(one_chat(i) for i in range(chats)))
+    sampler.cancel()
+    return results, peak_threads
+
+
+def run_sync(graph, chats: int, workers: int) -> tuple:
+    def one_chat(i: int):
+        start = time.perf_counter()
+        first_token = None
+        for msg, _ in graph.stream(*chat_input(i), stream_mode="messages"):
+            if first_token is None and isinstance(msg, AIMessageChunk):
+                first_token = time.perf_counter() - start
+        return first_token, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(one_chat, range(chats)))
+        peak_threads = threading.active_count()
+    return results, peak_threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--mode", choices=["async", "sync"], default="async")
+    parser.add_argument(
+        "--latency", type=float, default=0.5, help="Fake LLM seconds to first token."
+    )
+    parser.add_argument(
+        "--token-latency", type=float, default=0.01, help="Fake LLM seconds per token."
+    )
+    parser.add_argument(
+        "--retrieval-latency", type=float, default=0.0, help="Retriever seconds."
+    )
+    parser.add_argument("--route", choices=["rag", "chat"], default="rag")
+    parser.add_argument(
+        "--speculative",
+        action="store_true",
+        help="Retrieve while routing (SPECULATIVE_RETRIEVAL).",
+    )
+    parser.add_argument("--sync-workers", type=int, default=40)
+    args = parser.parse_args()
+
+    graph = build_graph(args)
+
+    start = time.perf_counter()
+    if args.mode == "async":
+        results, peak_threads = asyncio.run(run_async(graph, args.chats))
+    else:
+        results, peak_threads = run_sync(graph, args.chats, args.sync_workers)
+    wall = time.perf_counter() - start
+
+    ttft = [r[0] for r in results if r[0] is not None]
+    latency = [r[1] for r in results]
+    print(
+        f"mode={args.mode} chats={args.chats} route={args.route} "
+        f"speculative={args.speculative}"
+    )
+    print(f"wall time      {wall:.2f} s  ({args.chats / wall:.1f} chats/s)")
+    print(
+        f"latency        p50={statistics.median(latency):.3f} s  "
+        f"p95={percentile(latency, 0.95):.3f} s"
+    )
+    if ttft:
+        print(
+            f"first token    p50={statistics.median(ttft):.3f} s  "
+            f"p95={percentile(ttft, 0.95):.3f} s"
+        )
+    print(f"peak threads   {peak_threads}")
+
+
+if __name__ == "__main__":
+    main()
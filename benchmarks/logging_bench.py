@@ -0,0 +1,110 @@
+"""
+Per-request cost of logging on the chat path.
+
+The same RAG requests (fake LLM, a static retriever returning --documents
+real reviews, so the logged payloads have their real size) go through the
+compiled graph with the logger in each mode:
+
+    off          only CRITICAL records: the cost of the logging calls alone
+    debug        LOG_MODE = "debug": every record at DEBUG, with the full
+                 documents, prompt and graph state (what every request
+                 logged before the production mode)
+    production   LOG_MODE = "production": INFO, debug payloads sampled at
+                 LOG_DEBUG_SAMPLE_RATE and cut to LOG_PAYLOAD_MAX_CHARS
+
+Each run ends by waiting for the background writer, so the time includes
+writing the records. Reported: time per request, the overhead over "off",
+and the bytes logged per request.
+
+Usage:
+    python -m benchmarks.logging_bench
+    python -m benchmarks.logging_bench --requests 2000 --documents 20
+"""
+
+from benchmarks.common import static_retriever
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from src.bot.graph import GraphBuilder
+from src.bot.router import build_router
+from src.common import config
+from src.common.logger import log, setup_logger
+from src.common.utils import convert_to_documents, load_json_from_file
+from src.rag.llms import FakeLLM
+from src.rag.rag_executor import RAGExecutor
+import argparse
+import os
+import tempfile
+import time
+
+
+MODES = {
+    "off": {"mode": "production", "level": "CRITICAL"},
+    "debug": {"mode": "debug"},
+    "production": {"mode": "production"},
+}
+
+
+def build_graph(documents: list):
+    llm = FakeLLM().get_llm()
+    return GraphBuilder.build_graph(
+        chat_model=llm,
+        rag_agent=RAGExecutor(retriever=static_retriever(documents), llm=llm),
+        router=build_router("llm", chat_model=llm),
+        speculative_retrieval=False,
+        checkpointer=MemorySaver(),
+    )
+
+
+def run(name: str, directory: str, documents: list, requests: int) -> dict:
+    setup_logger(file_name=f"{name}.log", dir=directory, **MODES[name])
+    # Built after the logger: the RAG chain checks the debug level once
+    graph = build_graph(documents)
+
+    def chat(i: int):
+        graph.invoke(
+            {"messages": [HumanMessage(content=f"What do reviewers say about sprints? #{i}")]},
+            {"configurable": {"thread_id": f"{name}-{i % 50}"}},
+        )
+
+    for i in range(20):
+        chat(i)
+    log.complete()
+    path = os.path.join(directory, f"{name}.log")
+    size_before = os.path.getsize(path)
+    start = time.perf_counter()
+    for i in range(requests):
+        chat(i)
+    log.complete()
+    elapsed = time.perf_counter() - start
+    return {
+        "ms_per_request": elapsed / requests * 1000,
+        "bytes_per_request": (os.path.getsize(path) - size_before) / requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--documents", type=int, default=config.FUSED_RETRIEVED_DOCUMENTS)
+    args = parser.parse_args()
+
+    reviews = load_json_from_file(config.REVIEW_DATA_PATH)[: args.documents]
+    documents = convert_to_documents(reviews)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="logging_bench_") as directory:
+        for name in MODES:
+            results[name] = run(name, directory, documents, args.requests)
+        setup_logger()
+
+    off = results["off"]["ms_per_request"]
+    for name, result in results.items():
+        overhead = result["ms_per_request"] - off
+        print(
+            f"{name:<11} {result['ms_per_request']:.3f} ms/request  "
+            f"overhead {overhead * 1000:+8.1f} us ({overhead / off:+.1%})  "
+            f"{result['bytes_per_request'] / 1024:8.1f} KB logged/request"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Chatbot prompt size and build time per turn: window vs rolling-summary memory.
+
+A long conversation of synthetic turns is replayed through
+ChatbotNode.conversation_history/build_prompt. "window" trims and re-renders
+the messages every turn (CONVERSATION_MEMORY = "window"); "summary" appends
+the new messages to the thread's cached window and folds older ones into a
+running summary in the background (the fake LLM, with --summary-latency
+seconds per call, writes a summary of --summary-words words).
+
+Usage:
+    python -m benchmarks.memory_bench --turns 50
+"""
+
+from benchmarks.common import summarize
+from langchain_core.messages import AIMessage, HumanMessage
+from src.bot.graph import ChatbotNode
+from src.bot.memory import RollingSummaryMemory
+from src.rag.context import estimate_tokens
+from src.rag.llms import FakeStreamingChatModel
+import argparse
+import time
+
+
+def replay(node: ChatbotNode, turns: int) -> tuple:
+    config = {"configurable": {"thread_id": "bench"}}
+    messages, timings, tokens = [], [], []
+    for turn in range(turns):
+        messages.append(
+            HumanMessage(content=f"Question {turn}: how do Jira boards handle sprints?", id=f"h{turn}")
+        )
+        state = {"messages": list(messages)}
+        start = time.perf_counter()
+        prompt = node.build_prompt(messages, node.conversation_history(state, config))
+        timings.append(time.perf_counter() - start)
+        tokens.append(sum(estimate_tokens(str(m.content)) for m in prompt))
+        messages.append(
+            AIMessage(
+                content=f"Answer {turn}: boards show each sprint's issues by status.",
+                id=f"a{turn}",
+            )
+        )
+    return timings, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--summary-latency", type=float, default=0.0)
+    parser.add_argument("--summary-words", type=int, default=60)
+    args = parser.parse_args()
+
+    summarizer = FakeStreamingChatModel(
+        response=" ".join(["summary"] * args.summary_words), latency=args.summary_latency
+    )
+    for name, memory in [
+        ("window", None),
+        ("summary", RollingSummaryMemory(summarizer)),
+    ]:
+        timings, tokens = replay(ChatbotNode(chat_model=summarizer, memory=memory), args.turns)
+        checkpoints = [tokens[i] for i in (0, 4, 9, len(tokens) // 2, len(tokens) - 1)]
+        print(summarize(name, timings) + f"  prompt tokens at turns 1/5/10/mid/last: {checkpoints}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Quantized dense index: memory, throughput and recall per quantization mode.
+
+Each mode indexes the same synthetic, clustered unit vectors as
+dense_bench.py. Memory is the size of the arrays scanned for every query
+(the full-precision matrix for float32, the codes otherwise); quantized modes
+only read `k * rescore multiplier` full-precision rows per query, to rescore
+the candidates. Recall@k is measured against the exact float32 ranking.
+
+Usage:
+    python -m benchmarks.quantization_bench
+    python -m benchmarks.quantization_bench --size 100000 --rescore 4,10
+"""
+
+from benchmarks.common import summarize
+from benchmarks.dense_bench import clustered_vectors
+from src.rag.dense_index import DenseIndex
+import argparse
+import numpy as np
+import tempfile
+import time
+
+
+MODES = ["float32", "float16", "int8", "binary"]
+
+
+def recall(ids: np.ndarray, truth: np.ndarray) -> float:
+    found = [len(set(a) & set(b)) for a, b in zip(ids.tolist(), truth.tolist())]
+    return sum(found) / truth.size
+
+
+def time_index(index: DenseIndex, queries: np.ndarray, truth: np.ndarray, args) -> str:
+    timings, ids = [], []
+    for query in queries:
+        start = time.perf_counter()
+        ids.append(index.search(query, args.k)[0])
+        timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    for i in range(0, len(queries), args.batch_size):
+        index.search_batch(queries[i : i + args.batch_size], args.k)
+    qps = len(queries) / (time.perf_counter() - start)
+    label = f"x{index.rescore_multiplier}" if index.quantizer else "exact"
+    return (
+        summarize(label, timings)
+        + f"  batch {qps:.0f} q/s  recall@{args.k}={recall(np.array(ids), truth):.3f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--rescore", default="10", help="Rescore multipliers to try")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.size)
+    vectors = clustered_vectors(args.size, args.dim, rng)
+    rows = rng.integers(0, args.size, size=args.queries)
+    queries = DenseIndex.normalize(
+        vectors[rows] + rng.normal(scale=0.05, size=(args.queries, args.dim))
+    )
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, : args.k]
+    print(f"{args.size} documents x {args.dim} dims, {args.queries} queries, k={args.k}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in MODES:
+            path = f"{directory}/{mode}"
+            start = time.perf_counter()
+            DenseIndex.write([vectors], args.size, args.dim, path, quantization=mode)
+            build = time.perf_counter() - start
+            index = DenseIndex.load(path)
+            scanned = index.embeddings if index.codes is None else index.codes
+            print(
+                f"\n{mode}: {scanned.nbytes / 2**20:.1f} MiB scanned "
+                f"(1/{index.embeddings.nbytes / scanned.nbytes:.0f} of float32), "
+                f"built in {build:.1f} s"
+            )
+            multipliers = [0] if mode == "float32" else map(int, args.rescore.split(","))
+            for multiplier in multipliers:
+                index.rescore_multiplier = multiplier
+                print("  " + time_index(index, queries, truth, args))
+
+
+if __name__ == "__main__":
+    main()
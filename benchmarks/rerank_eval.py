@@ -0,0 +1,93 @@
+"""
+Offline evaluation of cross-encoder reranking against the fused order.
+
+For each query of the fusion evaluation set (`data/fusion_eval.jsonl`), the
+dense and sparse retrievers fetch --candidates documents each, the fused
+list is reranked by the cross-encoder, and the top --top-n of both orders
+are compared on recall, MRR and context size (words sent to the LLM). The
+reranking latency is reported against the RERANK_TIMEOUT_SECONDS budget.
+
+Usage:
+    python -m benchmarks.rerank_eval
+    python -m benchmarks.rerank_eval --candidates 20 --top-n 3
+"""
+
+from benchmarks.common import percentile
+from benchmarks.fusion_eval import EVAL_SET_PATH, load_eval_set
+from src.common import config
+from src.rag.fusion import get_fusion, scored_results
+from src.rag.reranker import CrossEncoderReranker
+from src.rag.retriever import Bm25Retriever, ChromaRetriever
+from src.rag.vector_stores import load_vector_store
+import argparse
+import statistics
+import time
+
+
+def metrics(documents: list, relevant_ids: list) -> tuple:
+    ids = [doc.metadata.get("review_id") for doc in documents]
+    relevant = set(relevant_ids)
+    recall = len(relevant.intersection(ids)) / len(relevant)
+    ranks = [rank for rank, i in enumerate(ids, start=1) if i in relevant]
+    words = sum(len(doc.page_content.split()) for doc in documents)
+    return recall, 1 / ranks[0] if ranks else 0.0, words
+
+
+def report(label: str, rows: list):
+    recall, mrr, words = zip(*rows)
+    print(
+        f"  {label:<9} recall {statistics.mean(recall):.3f}  "
+        f"MRR {statistics.mean(mrr):.3f}  "
+        f"context {statistics.mean(words):.0f} words/query"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--eval-set", default=EVAL_SET_PATH)
+    parser.add_argument("--candidates", type=int, default=config.RERANK_CANDIDATES)
+    parser.add_argument("--top-n", type=int, default=config.RERANK_TOP_N)
+    args = parser.parse_args()
+
+    examples = load_eval_set(args.eval_set)
+    dense = ChromaRetriever().get_retriever(load_vector_store(), k=args.candidates)
+    sparse = Bm25Retriever().get_retriever(k=args.candidates)
+    fusion = get_fusion(config.FUSION_METHOD, config.ENSEMBLE_RETRIEVER_WEIGHTS)
+    reranker = CrossEncoderReranker()
+    reranker.load()
+
+    baseline, fused_rows, reranked_rows, latencies_ms = [], [], [], []
+    for example in examples:
+        query = example["query"]
+        candidates = fusion.fuse(
+            scored_results([dense.invoke(query), sparse.invoke(query)]),
+            args.candidates,
+        )
+        start = time.perf_counter()
+        scores = reranker.score(query, candidates)
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+        order = sorted(range(len(candidates)), key=lambda i: -scores[i])
+        reranked = [candidates[i] for i in order[: args.top_n]]
+
+        relevant_ids = example["relevant_ids"]
+        # Without reranking, FUSED_RETRIEVED_DOCUMENTS reviews are sent
+        baseline.append(metrics(candidates[: config.FUSED_RETRIEVED_DOCUMENTS], relevant_ids))
+        fused_rows.append(metrics(candidates[: args.top_n], relevant_ids))
+        reranked_rows.append(metrics(reranked, relevant_ids))
+
+    over_budget = sum(ms > config.RERANK_TIMEOUT_SECONDS * 1000 for ms in latencies_ms)
+    print(
+        f"queries: {len(examples)}  candidates: {args.candidates}  top-n: {args.top_n}"
+    )
+    report(f"fused@{config.FUSED_RETRIEVED_DOCUMENTS}", baseline)
+    report(f"fused@{args.top_n}", fused_rows)
+    report(f"rerank@{args.top_n}", reranked_rows)
+    print(
+        f"  rerank latency p50 {statistics.median(latencies_ms):.1f} ms  "
+        f"p95 {percentile(latencies_ms, 0.95):.1f} ms  "
+        f"over the {config.RERANK_TIMEOUT_SECONDS * 1000:.0f} ms budget: {over_budget}"
+    )
+
+
+if __name__ == "__main__":
+    main()
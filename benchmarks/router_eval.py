@@ -0,0 +1,105 @@
+"""
+Offline evaluation of the local query router against the LLM router's labels.
+
+Reads `data/router_eval.jsonl` ({"query", "label"} per line) and reports the
+accuracy, the share of queries decided by each stage and the decision latency
+of the cascade router (keyword rules -> embedding centroids -> LLM fallback).
+
+By default no LLM is called: queries the cascade would send to the LLM are
+counted as "llm fallbacks" and scored with the centroid's best guess.
+
+Usage:
+    python -m benchmarks.router_eval
+    python -m benchmarks.router_eval --keywords-only
+    python -m benchmarks.router_eval --relabel   # refresh labels with the LLM router
+"""
+
+from benchmarks.common import percentile
+from collections import defaultdict
+from langchain.chat_models import init_chat_model
+from src.bot.router import CascadeRouter, KeywordRouter, LlmRouter, build_router
+from src.common import config
+from dotenv import load_dotenv
+import argparse
+import json
+import statistics
+
+
+EVAL_SET_PATH = "data/router_eval.jsonl"
+LLM_MODEL = "google_genai:gemini-1.5-flash"
+
+
+def load_eval_set(fp: str) -> list:
+    with open(fp, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def relabel(examples: list, fp: str):
+    """Overwrites the labels with the decisions of the current LLM router."""
+    router = LlmRouter(init_chat_model(LLM_MODEL))
+    with open(fp, "w", encoding="utf-8") as f:
+        for example in examples:
+            example["label"] = router.route(example["query"]).route
+            f.write(json.dumps(example) + "\n")
+    print(f"Relabelled {len(examples)} queries in {fp}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--eval-set", default=EVAL_SET_PATH)
+    parser.add_argument("--keywords-only", action="store_true")
+    parser.add_argument(
+        "--with-llm", action="store_true", help="Call the LLM router on low confidence."
+    )
+    parser.add_argument("--relabel", action="store_true")
+    args = parser.parse_args()
+
+    load_dotenv()
+    examples = load_eval_set(args.eval_set)
+    if args.relabel:
+        relabel(examples, args.eval_set)
+        return
+
+    if args.keywords_only:
+        router = CascadeRouter(
+            keyword_router=KeywordRouter(
+                config.ROUTER_RAG_KEYWORDS, config.ROUTER_CHAT_KEYWORDS
+            )
+        )
+    else:
+        chat_model = init_chat_model(LLM_MODEL) if args.with_llm else None
+        # Without a chat model the cascade keeps the centroid's best guess
+        router = build_router("cascade", chat_model=chat_model)
+
+    correct = 0
+    stages = defaultdict(lambda: {"count": 0, "correct": 0, "latency_ms": []})
+    low_confidence = 0
+    for example in examples:
+        decision = router.route(example["query"])
+        if (
+            decision.stage == "centroid"
+            and decision.confidence < config.ROUTER_CENTROID_MIN_MARGIN
+        ):
+            low_confidence += 1
+        stage = stages[decision.stage]
+        stage["count"] += 1
+        stage["latency_ms"].append(decision.latency_ms)
+        if decision.route == example["label"]:
+            correct += 1
+            stage["correct"] += 1
+
+    total = len(examples)
+    print(f"queries: {total}  accuracy: {correct / total:.1%}")
+    for name, stage in sorted(stages.items()):
+        print(
+            f"  {name:<9} decided {stage['count']:>3} ({stage['count'] / total:.0%})  "
+            f"accuracy {stage['correct'] / stage['count']:.1%}  "
+            f"latency p50 {statistics.median(stage['latency_ms']):.2f} ms  "
+            f"p95 {percentile(stage['latency_ms'], 0.95):.2f} ms"
+        )
+    if not args.keywords_only and not args.with_llm:
+        print(f"  llm fallbacks (centroid margin below threshold): {low_confidence}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Throughput of the pre-fork chat server (serve.py) with 1, 2, 4 and 8 workers.
+
+A synthetic corpus is ingested once into a temporary directory. For each
+worker count, the server is started in a fresh process (instant fake LLM, so
+the numbers measure the CPU-bound work of the workers; --embedder as in
+e2e_bench; the memory-mapped "numpy" vector store) and --sessions
+conversations of --turns turns are sent to POST /chat, --concurrency at a
+time. Turns of one conversation land on whichever worker accepts the
+connection, so they also exercise the shared SQLite conversation state.
+
+Reported per worker count: turns per second, turn latency and time to the
+first streamed line, and the memory of the server processes: the sum of
+their resident sizes (RSS) next to their proportional set size (PSS), which
+counts the pages they share (model weights, mapped indexes) once.
+
+Usage:
+    python -m benchmarks.serve_bench
+    python -m benchmarks.serve_bench --workers 1,2,4,8 --sessions 400 --concurrency 64
+"""
+
+# Only the standard library at module level: the server processes run this
+# module too, and should not import what they do not use
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def server(directory: str, workers: int, port: int, embedder: str):
+    """Runs in the server process: serve.py's serve() on the benchmark corpus."""
+    from benchmarks.e2e_bench import PATH_SETTINGS, load_embedder
+    from src.common import config
+    from src.rag.embeddings import HfEmbedder
+
+    for name, path in PATH_SETTINGS.items():
+        setattr(config, name, os.path.join(directory, path))
+    config.CHECKPOINT_DB_PATH = os.path.join(directory, f"checkpoints-{workers}.sqlite")
+    config.VECTOR_STORE_TYPE = "numpy"
+    config.LLM_TYPE = "fake"
+    if embedder == "fake":
+        HfEmbedder._model = load_embedder("fake")
+    else:
+        config.EMBEDDING_MODEL_NAME = embedder
+
+    from src.bot.server import serve
+
+    serve(workers=workers, host="127.0.0.1", port=port)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def memory_kb(pid: int) -> dict:
+    """RSS and PSS of a process and its children, in kB."""
+    pids = [pid]
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        pids += [int(child) for child in f.read().split()]
+    totals = {"rss_kb": 0, "pss_kb": 0}
+    for p in pids:
+        with open(f"/proc/{p}/smaps_rollup") as f:
+            for line in f:
+                name, value = line.split(":", 1)
+                if name in ("Rss", "Pss"):
+                    totals[f"{name.lower()}_kb"] += int(value.split()[0])
+    return totals
+
+
+async def load(url: str, sessions: int, turns: int, concurrency: int, queries: list) -> dict:
+    import asyncio
+    import httpx
+    import uuid
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, first_lines, errors = [], [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+
+    async with httpx.AsyncClient(base_url=url, timeout=None, limits=limits) as client:
+
+        async def session(i: int):
+            nonlocal errors
+            thread_id = str(uuid.uuid4())
+            async with semaphore:
+                for turn in range(turns):
+                    body = {"thread_id": thread_id, "message": queries[(i + turn) % len(queries)]}
+                    start = time.perf_counter()
+                    first = None
+                    async with client.stream("POST", "/chat", json=body) as response:
+                        async for line in response.aiter_lines():
+                            if first is None:
+                                first = time.perf_counter() - start
+                            if "Sorry, an error occurred" in line:
+                                errors += 1
+                    latencies.append(time.perf_counter() - start)
+                    first_lines.append(first or latencies[-1])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(session(i) for i in range(sessions)))
+        elapsed = time.perf_counter() - start
+    return {
+        "turns_per_second": sessions * turns / elapsed,
+        "latencies": latencies,
+        "first_lines": first_lines,
+        "errors": errors,
+    }
+
+
+def wait_until_up(url: str, timeout: float = 120.0):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"The server at {url} did not start")
+
+
+def run(directory: str, workers: int, args, queries: list) -> dict:
+    import asyncio
+    from benchmarks.common import latency_stats
+
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.serve_bench", "--server", directory,
+         "--workers", str(workers), "--port", str(port), "--embedder", args.embedder],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(url)
+        # Warm-up: every worker builds its graph and maps the indexes
+        asyncio.run(load(url, 4 * workers, 1, 2 * workers, queries))
+        result = asyncio.run(load(url, args.sessions, args.turns, args.concurrency, queries))
+        memory = memory_kb(process.pid)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+    return {
+        "workers": workers,
+        "turns_per_second": round(result["turns_per_second"], 1),
+        "turn": latency_stats(result["latencies"]),
+        "first_line": latency_stats(result["first_lines"]),
+        "errors": result["errors"],
+        **memory,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--embedder",
+        default="fake",
+        help='"fake" (deterministic hashing) or a sentence-transformers model name',
+    )
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--server", metavar="DIRECTORY", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.server:
+        server(args.server, int(args.workers), args.port, args.embedder)
+        return
+
+    from benchmarks.e2e_bench import PATH_SETTINGS, load_embedder, overridden
+    from benchmarks.synthetic import ReviewModel, write_corpus
+    from ingest import ingest_data
+    import numpy as np
+
+    model = ReviewModel.from_dataset()
+    rng = np.random.default_rng(0)
+    queries = [f"What do reviews say about {model.sample_query(rng)}?" for _ in range(100)]
+    print(f"{os.cpu_count()} CPUs, {args.size} reviews")
+    with tempfile.TemporaryDirectory(prefix="serve_bench_") as directory:
+        settings = {name: os.path.join(directory, path) for name, path in PATH_SETTINGS.items()}
+        embeddings = load_embedder(args.embedder)
+        with overridden(settings, embeddings):
+            write_corpus(settings["REVIEW_DATA_PATH"], args.size, model, seed=0)
+            ingest_data(embeddings=embeddings)
+
+        baseline = None
+        for workers in map(int, args.workers.split(",")):
+            result = run(directory, workers, args, queries)
+            baseline = baseline or result["turns_per_second"]
+            print(
+                f"workers={workers}  {result['turns_per_second']:>7.1f} turns/s "
+                f"(x{result['turns_per_second'] / baseline:.2f})  "
+                f"turn p50={result['turn']['p50_ms']:.1f} ms p95={result['turn']['p95_ms']:.1f} ms  "
+                f"first line p50={result['first_line']['p50_ms']:.1f} ms  "
+                f"RSS {result['rss_kb'] / 1024:.0f} MB, PSS {result['pss_kb'] / 1024:.0f} MB  "
+                f"errors={result['errors']}"
+            )
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Startup benchmark: import time and time-to-first-response of a cold and of a
+warm process.
+
+A synthetic corpus is ingested once into a temporary directory, then every
+run is a fresh Python process pointed at it (fake LLM, --embedder as in
+e2e_bench):
+
+    import        time to import src.bot.service (what app.py imports)
+    cold          first chat answered right after the import: the graph, the
+                  embedding model and the indexes are built by that request
+    warm          warm_up() first (as app.py runs after the UI starts), then
+                  the first chat
+
+Time to first response is the time until the first answer token is
+streamed, as in app.py.
+
+Usage:
+    python -m benchmarks.startup_bench
+    python -m benchmarks.startup_bench --size 10000 --repeats 5
+    python -m benchmarks.startup_bench --embedder BAAI/bge-small-en-v1.5
+"""
+
+# Only the standard library at module level: the measured child processes
+# run this module, and must import the app's modules on the clock
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+QUERY = "What do reviewers say about Jira sprint boards?"
+
+
+def child(mode: str, directory: str, embedder: str) -> dict:
+    """Runs in the measured process; returns its timings in seconds."""
+    start = time.perf_counter()
+    from src.bot import service
+
+    result = {"import": time.perf_counter() - start}
+
+    # Paths are read from config when the components are built, not at import
+    from benchmarks.e2e_bench import PATH_SETTINGS, load_embedder
+    from src.common import config
+
+    for name, path in PATH_SETTINGS.items():
+        setattr(config, name, os.path.join(directory, path))
+    config.CHECKPOINT_DB_PATH = os.path.join(directory, f"checkpoints-{os.getpid()}.sqlite")
+    config.LLM_TYPE = "fake"
+    if embedder == "fake":
+        from src.rag.embeddings import HfEmbedder
+
+        HfEmbedder._embeddings = load_embedder("fake")
+    else:
+        config.EMBEDDING_MODEL_NAME = embedder
+
+    if mode == "warm":
+        start = time.perf_counter()
+        service.warm_up(QUERY)
+        result["warm_up"] = time.perf_counter() - start
+    result["first_response"] = first_response(service)
+    result["second_response"] = first_response(service)
+    return result
+
+
+def first_response(service) -> float:
+    """Seconds until the first answer token of a new chat."""
+    from langchain_core.messages import HumanMessage
+    import uuid
+
+    start = time.perf_counter()
+    graph = service.get_chatbot_graph()
+    for _, metadata in graph.stream(
+        {"messages": [HumanMessage(content=QUERY)]},
+        {"configurable": {"thread_id": str(uuid.uuid4())}},
+        stream_mode="messages",
+    ):
+        if metadata.get("langgraph_node") in ("rag_search", "chatbot"):
+            break
+    return time.perf_counter() - start
+
+
+def measure(mode: str, directory: str, embedder: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup_bench", "--child", mode,
+         "--directory", directory, "--embedder", embedder],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--embedder",
+        default="fake",
+        help='"fake" (deterministic hashing) or a sentence-transformers model name',
+    )
+    parser.add_argument("--child", choices=("cold", "warm"), help=argparse.SUPPRESS)
+    parser.add_argument("--directory", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.directory, args.embedder)))
+        return
+
+    from benchmarks.common import latency_stats
+    from benchmarks.e2e_bench import PATH_SETTINGS, load_embedder, overridden
+    from benchmarks.synthetic import ReviewModel, write_corpus
+    from ingest import ingest_data
+
+    with tempfile.TemporaryDirectory(prefix="startup_bench_") as directory:
+        settings = {name: os.path.join(directory, path) for name, path in PATH_SETTINGS.items()}
+        embeddings = load_embedder(args.embedder)
+        with overridden(settings, embeddings):
+            write_corpus(settings["REVIEW_DATA_PATH"], args.size, ReviewModel.from_dataset(), seed=0)
+            ingest_data(embeddings=embeddings)
+
+        for mode in ("cold", "warm"):
+            runs = [measure(mode, directory, args.embedder) for _ in range(args.repeats)]
+            print(f"\n{mode} process ({args.size} reviews, {args.repeats} runs):")
+            for name in runs[0]:
+                stats = latency_stats([run[name] for run in runs])
+                print(f"  {name:<16} p50={stats['p50_ms']:>9.1f} ms  max={stats['max_ms']:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Synthetic review corpus for benchmarks at sizes beyond the real dataset.
+
+Reviews are sampled from a unigram model of the real reviews (their
+vocabulary, word frequencies and review lengths), so term statistics, and
+with them BM25 posting lengths, look like the real corpus at any scale.
+"""
+
+from collections import Counter
+from src.common import config
+from src.common.utils import load_json_from_file
+from typing import Iterator
+import json
+import numpy as np
+
+
+SECTIONS = ("title", "review_detail", "pros", "cons")
+SECTION_SHARES = np.array([0.08, 0.32, 0.3, 0.3])
+MONTHS = (
+    "January February March April May June July August September October "
+    "November December"
+).split()
+
+
+class ReviewModel:
+    """Unigram model of the real reviews."""
+
+    def __init__(self, reviews: list):
+        texts = [review["review_detail"] for review in reviews]
+        counts = Counter(token for text in texts for token in text.split())
+        self.words = np.array(list(counts.keys()), dtype=object)
+        frequencies = np.array(list(counts.values()), dtype=np.float64)
+        self.probabilities = frequencies / frequencies.sum()
+        self.lengths = np.array([len(text.split()) for text in texts])
+        self.ratings = np.array([review.get("rating", 0) for review in reviews])
+
+    @classmethod
+    def from_dataset(cls, fp: str = config.REVIEW_DATA_PATH) -> "ReviewModel":
+        return cls(load_json_from_file(fp))
+
+    def sample_query(self, rng: np.random.Generator, n_words: int = 3) -> str:
+        """A query of mid-frequency words, like the words users search for."""
+        order = np.argsort(-self.probabilities)
+        mid_frequency = self.words[order[50:2000]]
+        return " ".join(rng.choice(mid_frequency, size=n_words))
+
+    def generate(
+        self, n: int, seed: int = 0, chunk_size: int = 10_000
+    ) -> Iterator[dict]:
+        """Yields `n` reviews in the schema of the reviews dataset."""
+        rng = np.random.default_rng(seed)
+        for chunk_start in range(0, n, chunk_size):
+            size = min(chunk_size, n - chunk_start)
+            lengths = rng.choice(self.lengths, size=size)
+            words = self.words[
+                rng.choice(len(self.words), size=lengths.sum(), p=self.probabilities)
+            ]
+            ratings = rng.choice(self.ratings, size=size)
+            months = rng.integers(0, len(MONTHS), size=size)
+            years = rng.integers(2015, 2026, size=size)
+            position = 0
+            for i in range(size):
+                review_words = words[position : position + lengths[i]]
+                position += lengths[i]
+                bounds = np.cumsum(
+                    np.round(SECTION_SHARES * lengths[i]).astype(int)
+                )[:-1]
+                detail = "".join(
+                    f"{section}: {' '.join(part)}\n"
+                    for section, part in zip(SECTIONS, np.split(review_words, bounds))
+                )
+                yield {
+                    "rating": float(ratings[i]),
+                    "review_date": f"{MONTHS[months[i]]} {years[i]}",
+                    "review_detail": detail,
+                    "author": f"Synthetic {chunk_start + i}",
+                }
+
+
+def write_corpus(fp: str, n: int, model: ReviewModel = None, seed: int = 0) -> str:
+    """
+    Writes `n` synthetic reviews to `fp` as a JSON array, in the schema of
+    the reviews dataset, one review at a time so 1M reviews fit in memory.
+    """
+    model = model or ReviewModel.from_dataset()
+    with open(fp, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, review in enumerate(model.generate(n, seed=seed)):
+            f.write(("," if i else "") + "\n" + json.dumps(review, ensure_ascii=False))
+        f.write("\n]\n")
+    return fp
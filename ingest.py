@@ -1,44 +1,133 @@
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
 from src.common import config
-from src.common.utils import load_reviews_documents
-from src.common.logger import setup_logger
+from src.common.logger import log, setup_logger
 from src.common.utils import measure_time
+from src.ingestion.pipeline import (
+    EmbeddingPipeline,
+    IngestCheckpoint,
+    iter_review_documents,
+    open_collection,
+    update_metadata,
+)
+from src.rag.bm25_index import build_bm25_index
+from src.rag.dense_index import build_dense_index
+from src.rag.embedding_cache import EmbeddingCache
+from src.rag.metadata_index import build_metadata_index
+from src.rag.manifest import METADATA_VERSION, IngestManifest, corpus_version
+import os
 
 
-log = setup_logger(file_name="ingest.log")
+def stored_review_ids(manifest: IngestManifest, collection) -> set:
+    """
+    Ids already in the vector store. Without a manifest (first run, or a store
+    written before ingestion was incremental) they are read from Chroma, so
+    entries with random ids from older runs get deleted.
+    """
+    if manifest.exists():
+        return manifest.review_ids
+    return set(collection.get(include=[])["ids"])
 
 
-def ingest_data():
+def ingest_data(embeddings=None, workers=None):
     """
-    Main function to load data, create documents, and build the vector store.
+    Main function to stream the reviews into the vector store and the BM25 index.
+
+    Ingestion is incremental: only reviews missing from the manifest are
+    embedded (in batches, by a pool of worker processes) and upserted, reviews
+    no longer in the data are deleted, and the BM25 index is rebuilt only when
+    the corpus changed, as are the rating/date metadata index and the dense
+    index exported from Chroma for the "numpy" vector store. A rerun on
+    unchanged data does not load the embedding model, and a run interrupted
+    midway resumes after its last committed batch.
+
+    `embeddings` injects an in-process embedding model (e.g. a fake for tests).
     """
     log.info("Starting data ingestion process...")
+    reviews_path = config.REVIEW_DATA_PATH
+    if embeddings is not None:
+        pipeline = EmbeddingPipeline(lambda: embeddings, workers=0)
+    else:
+        cache = EmbeddingCache.from_config() if config.EMBEDDING_CACHE_ENABLED else None
+        pipeline = EmbeddingPipeline(workers=workers, cache=cache)
 
-    log.info(f"Initializing embedding model: {config.EMBEDDING_MODEL_NAME}")
+    manifest = IngestManifest.load(config.INGEST_MANIFEST_PATH)
+    collection = open_collection(config.DB_PERSIST_DIRECTORY)
+    stored_ids = stored_review_ids(manifest, collection)
+    # Keyed on the stored ids: when they are read back from Chroma, batches
+    # committed before a crash are already among them and nothing is skipped
+    checkpoint = IngestCheckpoint(
+        config.INGEST_CHECKPOINT_PATH,
+        IngestCheckpoint.run_key_for(reviews_path, corpus_version(stored_ids)),
+    )
+    resumed = checkpoint.committed
 
-    with measure_time("Embedding model loading", log):
-        embeddings = HuggingFaceEmbeddings(
-            model_name=config.EMBEDDING_MODEL_NAME,
-            model_kwargs=config.MODEL_KWARGS,
-            encode_kwargs=config.ENCODE_KWARGS,
-        )
-    with measure_time("Load reveiws data", log):
-        reviews_documents = load_reviews_documents()
+    incoming_ids = set()
+
+    def new_documents():
+        for doc in iter_review_documents(reviews_path):
+            incoming_ids.add(doc.id)
+            if doc.id not in stored_ids:
+                yield doc
 
+    log.info(f"Updating vector store at {config.DB_PERSIST_DIRECTORY}...")
+    with measure_time("Data ingestion in Chroma Vector DB", log):
+        added = pipeline.run(new_documents(), collection, checkpoint=checkpoint)
+
+    to_delete = sorted(stored_ids - incoming_ids)
+    with measure_time("Deleting removed reviews from Chroma Vector DB", log):
+        for i in range(0, len(to_delete), config.INGEST_BATCH_SIZE):
+            collection.delete(ids=to_delete[i : i + config.INGEST_BATCH_SIZE])
     log.info(
-        f"Creating and persisting vector store at {config.DB_PERSIST_DIRECTORY}..."
+        f"{added + resumed} new or changed reviews, {len(to_delete)} removed, "
+        f"{len(incoming_ids) - added - resumed} unchanged"
     )
 
-    with measure_time("Data ingestion in Chroma Vector DB", log):
-        Chroma.from_documents(
-            documents=reviews_documents,
-            embedding=embeddings,
-            persist_directory=config.DB_PERSIST_DIRECTORY,
+    if manifest.metadata_version < METADATA_VERSION:
+        # Reviews stored by an older version lack metadata that filters need
+        with measure_time("Updating the metadata of stored reviews", log):
+            updated = update_metadata(
+                (
+                    doc
+                    for doc in iter_review_documents(reviews_path)
+                    if doc.id in stored_ids
+                ),
+                collection,
+                config.INGEST_BATCH_SIZE,
+            )
+        log.info(f"Metadata of {updated} stored reviews updated")
+
+    changed = bool(added or resumed or to_delete)
+    if changed or not os.path.exists(config.BM25_INDEX_DIRECTORY):
+        log.info(f"Persisting BM25 index at {config.BM25_INDEX_DIRECTORY}...")
+        build_bm25_index(
+            iter_review_documents(reviews_path),
+            index_dir=config.BM25_INDEX_DIRECTORY,
+            docstore_dir=config.DOCSTORE_DIRECTORY,
         )
+        changed = True
+    if changed or not os.path.exists(config.METADATA_INDEX_DIRECTORY):
+        log.info(f"Persisting metadata index at {config.METADATA_INDEX_DIRECTORY}...")
+        build_metadata_index(
+            docstore_dir=config.DOCSTORE_DIRECTORY,
+            index_dir=config.METADATA_INDEX_DIRECTORY,
+        )
+    if changed or not os.path.exists(config.DENSE_INDEX_DIRECTORY):
+        log.info(f"Exporting dense index to {config.DENSE_INDEX_DIRECTORY}...")
+        build_dense_index(
+            collection,
+            docstore_dir=config.DOCSTORE_DIRECTORY,
+            index_dir=config.DENSE_INDEX_DIRECTORY,
+        )
+
+    # Written last: an interrupted run is resumed from its checkpoint
+    manifest.review_ids = incoming_ids
+    manifest.metadata_version = METADATA_VERSION
+    manifest.save()
+    checkpoint.clear()
 
-    log.info("Data ingestion complete. Vector store is ready.")
+    log.info("Data ingestion complete. Vector store and BM25 index are ready.")
 
 
 if __name__ == "__main__":
+    # Only when run as a script: importing ingest_data keeps the log file
+    setup_logger(file_name="ingest.log")
     ingest_data()
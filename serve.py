@@ -0,0 +1,33 @@
+"""
+Serves the chat API from several worker processes behind one port.
+
+The embedding model is loaded once, before the workers are forked, and its
+weights are shared copy-on-write; the indexes are memory-mapped files shared
+through the page cache. Conversations are kept in the SQLite checkpointer, so
+any worker can serve any turn. Point app.py at it with CHAT_SERVER_URL.
+
+Usage:
+    python serve.py
+    python serve.py --workers 8 --host 0.0.0.0 --port 8000
+"""
+
+from src.common import config
+from src.common.logger import setup_logger
+from src.bot.server import serve
+from dotenv import load_dotenv
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=config.SERVE_WORKERS)
+    parser.add_argument("--host", default=config.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVE_PORT)
+    args = parser.parse_args()
+    setup_logger(file_name="serve.log")
+    load_dotenv()
+    serve(workers=args.workers, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
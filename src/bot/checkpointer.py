@@ -0,0 +1,683 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Event, Lock, Thread
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence, Tuple
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from src.common import config
+from src.common.logger import log
+from src.common.utils import LatencyStats
+import asyncio
+import atexit
+import os
+import random
+import sqlite3
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_last_access ON threads (last_access);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+def _entry_bytes(entry: dict) -> int:
+    return (
+        len(entry["checkpoint"][1])
+        + len(entry["metadata"][1])
+        + sum(len(blob) for _, _, blob, _ in entry["writes"].values())
+    )
+
+
+class SqliteCheckpointer(BaseCheckpointSaver[str]):
+    """
+    Conversation checkpointer on a local SQLite file, bounded in memory and
+    on disk.
+
+    - Writes are queued and committed by a background thread, in one
+      transaction per `flush_interval` (or every `flush_batch_size` queued
+      writes), so a turn does not wait on the disk. The database runs in WAL
+      mode, which lets other processes read it while it is written.
+    - The latest checkpoint of the `max_cached_threads` most recently used
+      threads is kept in memory (at most `max_memory_bytes` of it), so a turn
+      reads its thread without touching the database.
+    - Stored checkpoints keep the last `max_messages` messages, and only the
+      last `keep_checkpoints` checkpoints of each thread are kept.
+    - Threads idle for `thread_ttl` seconds are deleted, as are the least
+      recently used ones beyond `max_threads` or while the database holds
+      more than `max_disk_bytes`.
+
+    Read and write latencies are recorded in `stats()`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_messages: Optional[int] = config.CONVERSATION_MAX_TURNS,
+        keep_checkpoints: int = config.CHECKPOINT_KEEP_PER_THREAD,
+        thread_ttl: float = config.CHECKPOINT_THREAD_TTL_SECONDS,
+        max_threads: int = config.CHECKPOINT_MAX_THREADS,
+        max_cached_threads: int = config.CHECKPOINT_MAX_CACHED_THREADS,
+        max_memory_bytes: int = config.CHECKPOINT_MAX_MEMORY_BYTES,
+        max_disk_bytes: int = config.CHECKPOINT_MAX_DISK_BYTES,
+        flush_interval: float = config.CHECKPOINT_FLUSH_INTERVAL_SECONDS,
+        flush_batch_size: int = config.CHECKPOINT_FLUSH_BATCH_SIZE,
+        sweep_interval: float = config.CHECKPOINT_SWEEP_INTERVAL_SECONDS,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.max_messages = max_messages
+        self.keep_checkpoints = max(1, keep_checkpoints)
+        self.thread_ttl = thread_ttl
+        self.max_threads = max_threads
+        self.max_cached_threads = max_cached_threads
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self.sweep_interval = sweep_interval
+        self.latencies = LatencyStats(["get", "put", "flush", "sweep"])
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Transactions are opened explicitly, one per flush
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db_lock = Lock()
+        with self._db_lock:
+            # auto_vacuum only applies to a new file, before any table exists
+            self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.execute("PRAGMA busy_timeout = 5000")
+            self._conn.executescript(SCHEMA)
+
+        # (thread_id, checkpoint_ns) -> latest checkpoint, least recently used first
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_lock = Lock()
+        self._checkpoints, self._writes, self._touched = [], [], {}
+        self._queue_lock = Lock()
+        self._flush_lock = Lock()
+        self._wake = Event()
+        self._closed = False
+        self._last_sweep = time.monotonic()
+        self._flusher = Thread(target=self._flush_loop, name="checkpoint-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_config(cls, max_cached_threads: Optional[int] = None) -> "SqliteCheckpointer":
+        return cls(
+            config.CHECKPOINT_DB_PATH,
+            max_cached_threads=(
+                config.CHECKPOINT_MAX_CACHED_THREADS
+                if max_cached_threads is None
+                else max_cached_threads
+            ),
+        )
+
+    @contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        yield
+        self.latencies.record(name, (time.perf_counter() - start) * 1000)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same scheme as MemorySaver: sortable, and unique across processes
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- In-memory cache ---
+
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[dict]:
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+            return entry
+
+    def _cache_put(self, key: Tuple[str, str], entry: dict):
+        if self.max_cached_threads <= 0:
+            return
+        with self._cache_lock:
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._cache_bytes -= previous["bytes"]
+            entry["bytes"] = _entry_bytes(entry)
+            self._cache[key] = entry
+            self._cache_bytes += entry["bytes"]
+            while self._cache and (
+                len(self._cache) > self.max_cached_threads
+                or self._cache_bytes > self.max_memory_bytes
+            ):
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= evicted["bytes"]
+
+    def _cache_drop(self, thread_ids: set):
+        with self._cache_lock:
+            for key in [key for key in self._cache if key[0] in thread_ids]:
+                self._cache_bytes -= self._cache.pop(key)["bytes"]
+
+    # --- Write queue ---
+
+    def _enqueue(self, thread_id: str, checkpoint_row=None, write_rows=None):
+        with self._queue_lock:
+            if checkpoint_row is not None:
+                self._checkpoints.append(checkpoint_row)
+            if write_rows:
+                self._writes.extend(write_rows)
+            self._touched[thread_id] = time.time()
+            queued = len(self._checkpoints) + len(self._writes)
+        if queued >= self.flush_batch_size:
+            self._wake.set()
+        if queued >= 4 * self.flush_batch_size:
+            # The flusher is behind: bound the queue by writing in the caller
+            self.flush()
+
+    def flush(self):
+        """Commits the queued writes in one transaction."""
+        with self._flush_lock:
+            with self._queue_lock:
+                checkpoints, self._checkpoints = self._checkpoints, []
+                writes, self._writes = self._writes, []
+                touched, self._touched = self._touched, {}
+            if not (checkpoints or writes or touched):
+                return
+            with self._timed("flush"), self._db_lock:
+                try:
+                    self._conn.execute("BEGIN")
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        checkpoints,
+                    )
+                    # The flag decides between first and last write of a key
+                    for replace in (False, True):
+                        self._conn.executemany(
+                            f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO writes "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            [row[:-1] for row in writes if row[-1] == replace],
+                        )
+                    self._conn.executemany(
+                        "INSERT INTO threads VALUES (?, ?) ON CONFLICT (thread_id) "
+                        "DO UPDATE SET last_access = max(last_access, excluded.last_access)",
+                        list(touched.items()),
+                    )
+                    for thread_id, checkpoint_ns in {row[:2] for row in checkpoints}:
+                        self._compact_thread(thread_id, checkpoint_ns)
+                    self._conn.execute("COMMIT")
+                except Exception as e:
+                    self._conn.execute("ROLLBACK")
+                    log.error(f"Failed to write {len(checkpoints)} checkpoints: {e}")
+                    # Retried by the next flush
+                    with self._queue_lock:
+                        self._checkpoints[:0] = checkpoints
+                        self._writes[:0] = writes
+                        for thread_id, last_access in touched.items():
+                            self._touched.setdefault(thread_id, last_access)
+                    raise
+
+    def _compact_thread(self, thread_id: str, checkpoint_ns: str):
+        """Deletes all but the last `keep_checkpoints` checkpoints of a thread."""
+        oldest_kept = (
+            "(SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?)"
+        )
+        args = (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.keep_checkpoints - 1)
+        for table in ("writes", "checkpoints"):
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? "
+                f"AND checkpoint_id < {oldest_kept}",
+                args,
+            )
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() - self._last_sweep >= self.sweep_interval:
+                    self.sweep()
+            except Exception as e:
+                log.error(f"Checkpoint flush failed: {e}")
+
+    # --- Retention ---
+
+    def _disk_bytes(self) -> int:
+        page_count, free_pages, page_size = (
+            self._conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+            for pragma in ("page_count", "freelist_count", "page_size")
+        )
+        return (page_count - free_pages) * page_size
+
+    def _delete_threads(self, thread_ids: List[str]):
+        for table in ("writes", "checkpoints", "threads"):
+            self._conn.executemany(
+                f"DELETE FROM {table} WHERE thread_id = ?", [(t,) for t in thread_ids]
+            )
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Deletes the threads idle for longer than `thread_ttl`, then the least
+        recently used ones beyond `max_threads` and `max_disk_bytes`. Returns
+        the number of threads deleted.
+        """
+        self._last_sweep = time.monotonic()
+        now = time.time() if now is None else now
+        self.flush()
+        deleted = set()
+        with self._timed("sweep"), self._db_lock:
+            self._conn.execute("BEGIN")
+            expired = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT thread_id FROM threads WHERE last_access < ?",
+                    (now - self.thread_ttl,),
+                )
+            ]
+            self._delete_threads(expired)
+            deleted.update(expired)
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM threads").fetchone()
+            if count > self.max_threads:
+                excess = [
+                    row[0]
+                    for row in self._conn.execute(
+                        "SELECT thread_id FROM threads ORDER BY last_access LIMIT ?",
+                        (count - self.max_threads,),
+                    )
+                ]
+                self._delete_threads(excess)
+                deleted.update(excess)
+                count -= len(excess)
+            while count and self._disk_bytes() > self.max_disk_bytes:
+                oldest = [
+                    row[0]
+                    for row in self._conn.execute(
+                        "SELECT thread_id FROM threads ORDER BY last_access LIMIT ?",
+                        (max(1, count // 10),),
+                    )
+                ]
+                self._delete_threads(oldest)
+                deleted.update(oldest)
+                count -= len(oldest)
+            self._conn.execute("COMMIT")
+            if deleted:
+                self._conn.execute("PRAGMA incremental_vacuum")
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._cache_drop(deleted)
+        if deleted:
+            log.info(f"Checkpointer evicted {len(deleted)} idle conversation threads")
+        return len(deleted)
+
+    def _compact(self, checkpoint: Checkpoint) -> Checkpoint:
+        """Keeps the last `max_messages` messages of the checkpoint."""
+        messages = checkpoint.get("channel_values", {}).get("messages")
+        if not self.max_messages or not isinstance(messages, list):
+            return checkpoint
+        if len(messages) <= self.max_messages:
+            return checkpoint
+        return {
+            **checkpoint,
+            "channel_values": {
+                **checkpoint["channel_values"],
+                "messages": messages[-self.max_messages :],
+            },
+        }
+
+    # --- Reads ---
+
+    def _load(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]
+    ) -> Optional[dict]:
+        query = (
+            "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, "
+            "metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        args: tuple = (thread_id, checkpoint_ns)
+        if checkpoint_id:
+            query += " AND checkpoint_id = ?"
+            args += (checkpoint_id,)
+        with self._db_lock:
+            row = self._conn.execute(
+                query + " ORDER BY checkpoint_id DESC LIMIT 1", args
+            ).fetchone()
+            if row is None:
+                return None
+            return self._entry(row, self._load_writes(thread_id, checkpoint_ns, row[0]))
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> dict:
+        return {
+            (task_id, idx): (channel, type_, value, task_path)
+            for task_id, idx, channel, type_, value, task_path in self._conn.execute(
+                "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        }
+
+    @staticmethod
+    def _entry(row: tuple, writes: dict) -> dict:
+        checkpoint_id, parent_id, type_, blob, metadata_type, metadata = row
+        return {
+            "checkpoint_id": checkpoint_id,
+            "parent_id": parent_id,
+            "checkpoint": (type_, blob),
+            "metadata": (metadata_type, metadata),
+            "writes": writes,
+        }
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, entry: dict) -> CheckpointTuple:
+        def config_of(checkpoint_id: str) -> RunnableConfig:
+            return {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            }
+
+        return CheckpointTuple(
+            config=config_of(entry["checkpoint_id"]),
+            checkpoint=self.serde.loads_typed(entry["checkpoint"]),
+            metadata=self.serde.loads_typed(entry["metadata"]),
+            parent_config=config_of(entry["parent_id"]) if entry["parent_id"] else None,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((type_, value)))
+                for (task_id, _), (channel, type_, value, _) in sorted(
+                    entry["writes"].items()
+                )
+            ],
+        )
+
+    @staticmethod
+    def _key(config: RunnableConfig) -> Tuple[str, str]:
+        configurable = config["configurable"]
+        return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+
+    def _get_cached(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key = self._key(config)
+        entry = self._cache_get(key)
+        checkpoint_id = get_checkpoint_id(config)
+        if entry is None or (checkpoint_id and checkpoint_id != entry["checkpoint_id"]):
+            return None
+        self._enqueue(key[0])
+        return self._tuple(*key, entry)
+
+    def _get_stored(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key = self._key(config)
+        with self._queue_lock:
+            queued = key[0] in self._touched
+        if queued:
+            # Committed first, so they are read back
+            self.flush()
+        else:
+            # Waits for a flush in progress
+            with self._flush_lock:
+                pass
+        checkpoint_id = get_checkpoint_id(config)
+        entry = self._load(*key, checkpoint_id)
+        if entry is None:
+            return None
+        if not checkpoint_id:
+            self._cache_put(key, entry)
+        self._enqueue(key[0])
+        return self._tuple(*key, entry)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._timed("get"):
+            return self._get_cached(config) or self._get_stored(config)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._timed("get"):
+            return self._get_cached(config) or await asyncio.to_thread(
+                self._get_stored, config
+            )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        self.flush()
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, "
+            "checkpoint, metadata_type, metadata FROM checkpoints"
+        )
+        clauses, args = [], []
+        if config is not None:
+            configurable = config["configurable"]
+            for column in ("thread_id", "checkpoint_ns", "checkpoint_id"):
+                if configurable.get(column) is not None:
+                    clauses.append(f"{column} = ?")
+                    args.append(configurable[column])
+        if before is not None:
+            clauses.append("checkpoint_id < ?")
+            args.append(get_checkpoint_id(before))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self._db_lock:
+            rows = self._conn.execute(query + " ORDER BY checkpoint_id DESC", args).fetchall()
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                return
+            with self._db_lock:
+                writes = self._load_writes(thread_id, checkpoint_ns, row[0])
+            result = self._tuple(thread_id, checkpoint_ns, self._entry(tuple(row), writes))
+            if filter and any(result.metadata.get(k) != v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield result
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for result in results:
+            yield result
+
+    # --- Writes ---
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with self._timed("put"):
+            thread_id, checkpoint_ns = self._key(config)
+            entry = {
+                "checkpoint_id": checkpoint["id"],
+                "parent_id": get_checkpoint_id(config),
+                "checkpoint": self.serde.dumps_typed(self._compact(checkpoint)),
+                "metadata": self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+                "writes": {},
+            }
+            self._enqueue(
+                thread_id,
+                checkpoint_row=(
+                    thread_id,
+                    checkpoint_ns,
+                    entry["checkpoint_id"],
+                    entry["parent_id"],
+                    *entry["checkpoint"],
+                    *entry["metadata"],
+                ),
+            )
+            self._cache_put((thread_id, checkpoint_ns), entry)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with self._timed("put"):
+            thread_id, checkpoint_ns = self._key(config)
+            checkpoint_id = get_checkpoint_id(config)
+            # Special writes (errors, interrupts) replace earlier ones
+            replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+            rows = []
+            for i, (channel, value) in enumerate(writes):
+                type_, blob = self.serde.dumps_typed(value)
+                rows.append(
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint_id,
+                        task_id,
+                        WRITES_IDX_MAP.get(channel, i),
+                        channel,
+                        type_,
+                        blob,
+                        task_path,
+                        replace,
+                    )
+                )
+            self._enqueue(thread_id, write_rows=rows)
+            key = (thread_id, checkpoint_ns)
+            entry = self._cache_get(key)
+            if entry is not None and entry["checkpoint_id"] == checkpoint_id:
+                entry = {**entry, "writes": dict(entry["writes"])}
+                for row in rows:
+                    write_key = (task_id, row[4])
+                    if replace or write_key not in entry["writes"]:
+                        entry["writes"][write_key] = (row[5], row[6], row[7], task_path)
+                self._cache_put(key, entry)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        # Only queues the write: nothing here waits on the disk
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.flush()
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            self._delete_threads([thread_id])
+            self._conn.execute("COMMIT")
+        self._cache_drop({thread_id})
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def stats(self) -> dict:
+        with self._cache_lock:
+            cached_threads, cache_bytes = len(self._cache), self._cache_bytes
+        with self._queue_lock:
+            queued = len(self._checkpoints) + len(self._writes)
+        with self._db_lock:
+            (threads,) = self._conn.execute("SELECT COUNT(*) FROM threads").fetchone()
+            disk_bytes = self._disk_bytes()
+        return {
+            "threads": threads,
+            "cached_threads": cached_threads,
+            "cache_bytes": cache_bytes,
+            "disk_bytes": disk_bytes,
+            "queued_writes": queued,
+            "latencies": self.latencies.summary(),
+        }
+
+    def close(self):
+        """Stops the flusher and commits the queued writes."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._flusher.join()
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+
+def build_checkpointer(
+    checkpointer_type: Optional[str] = None, max_cached_threads: Optional[int] = None
+):
+    """
+    Creates the conversation checkpointer: "sqlite" (SqliteCheckpointer, at
+    CHECKPOINT_DB_PATH) or "memory" (LangGraph's unbounded MemorySaver).
+    `max_cached_threads` overrides CHECKPOINT_MAX_CACHED_THREADS for SQLite,
+    e.g. 0 when several processes share the database.
+    """
+    checkpointer_type = checkpointer_type or config.CHECKPOINTER_TYPE
+    if checkpointer_type == "sqlite":
+        return SqliteCheckpointer.from_config(max_cached_threads=max_cached_threads)
+    elif checkpointer_type == "memory":
+        return MemorySaver()
+    raise ValueError(f"Unknown checkpointer type: {checkpointer_type}")
@@ -1,39 +1,77 @@
-from langchain.chat_models import init_chat_model
 from langgraph.graph import StateGraph, START, END
 from src.bot.states import State
-from pydantic import BaseModel, Field
-from langgraph.checkpoint.memory import MemorySaver
-from src.rag.rag_executor import jira_rag_agent
+from src.bot.router import build_router
+from src.bot.checkpointer import build_checkpointer
+from src.bot.memory import RollingSummaryMemory
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from src.rag.rag_executor import get_rag_agent
 from langchain_core.messages import AIMessage
 from langchain_core.messages.utils import get_buffer_string
 from src.common import config
 from src.common.utils import measure_time
-from src.common.logger import log
+from src.common.logger import debug_payload, log
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from dotenv import load_dotenv
+import asyncio
+import threading
+import time
+import uuid
 
 
 load_dotenv(override=True)
 
 
-class QueryRouter(BaseModel):
-    """Router for selecting the next node."""
+class PrefetchedDocuments:
+    """
+    Hands the documents prefetched by SpeculativeDispatchNode to RAGNode.
+
+    The documents stay in process memory; only a short id goes into the graph
+    state, so they are never written to the conversation checkpointer. At most
+    `max_entries` hand-offs are kept, dropping the oldest ones left behind by
+    turns that failed before RAGNode ran.
+    """
 
-    route: str = Field(
-        description=config.ROUTER_PROMPT,
-        enum=["rag", "chat"],
-    )
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, documents) -> str:
+        prefetch_id = uuid.uuid4().hex
+        with self._lock:
+            self._entries[prefetch_id] = documents
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return prefetch_id
+
+    def pop(self, prefetch_id):
+        if prefetch_id is None:
+            return None
+        with self._lock:
+            return self._entries.pop(prefetch_id, None)
 
 
 class RAGNode:
-    def __init__(self):
-        pass
+    def __init__(self, rag_agent, prefetched: PrefetchedDocuments = None):
+        self.rag_agent = rag_agent
+        self.prefetched = prefetched
 
-    def execute(self, state: State) -> dict:
+    def _documents(self, state: State):
+        """Documents prefetched for this turn, or None to retrieve them."""
+        if self.prefetched is None:
+            return None
+        return self.prefetched.pop(state.get("prefetch_id"))
+
+    def execute(self, state: State, config: RunnableConfig) -> dict:
         """
-        Executes the RAG logic.
+        Executes the RAG logic. The answer is generated as a token stream so
+        that, when the graph is streamed with `stream_mode="messages"`, every
+        LLM token reaches the caller as soon as it is produced.
         """
-        log.debug(f"Executing ChatbotNode with state: {state}")
+        debug_payload("Executing RAGNode with state", lambda: state)
         try:
+            documents = self._documents(state)
             query = state["messages"][-1].content
             if not query:
                 return {
@@ -41,8 +79,12 @@ class RAGNode:
                 }
 
             with measure_time("RAG answer generation", log):
-                rag_response = jira_rag_agent.get_response(query=query)
-            log.debug("rag_response langGraph bot: ", rag_response)
+                rag_response = "".join(
+                    self.rag_agent.stream_response(
+                        query=query, config=config, documents=documents
+                    )
+                )
+            debug_payload("rag_response langGraph bot", lambda: rag_response)
             return {"messages": [AIMessage(content=rag_response)]}
         except Exception as e:
             log.error(f"Error in RAGNode execution: {e}")
@@ -50,14 +92,48 @@ class RAGNode:
                 "messages": [AIMessage(content="Failed to generate desired results")]
             }
 
+    async def aexecute(self, state: State, config: RunnableConfig) -> dict:
+        """
+        Async variant of `execute`, used when the graph is driven with
+        `ainvoke`/`astream`.
+        """
+        debug_payload("Executing async RAGNode with state", lambda: state)
+        try:
+            documents = self._documents(state)
+            query = state["messages"][-1].content
+            if not query:
+                return {
+                    "messages": [AIMessage(content="Please provide a valid question.")]
+                }
+
+            with measure_time("Async RAG answer generation", log):
+                tokens = [
+                    token
+                    async for token in self.rag_agent.astream_response(
+                        query=query, config=config, documents=documents
+                    )
+                ]
+            return {"messages": [AIMessage(content="".join(tokens))]}
+        except Exception as e:
+            log.error(f"Error in async RAGNode execution: {e}")
+            return {
+                "messages": [AIMessage(content="Failed to generate desired results")]
+            }
+
 
 class ChatbotNode:
     """
     Generates a response based on the conversation history.
+
+    With a RollingSummaryMemory, the history is the thread's cached window of
+    recent messages after a running summary of the older ones; otherwise the
+    messages are trimmed to a window on every turn (`trim_messages`).
     """
 
-    def __init__(self, chat_model):
+    def __init__(self, chat_model, memory=None):
         self.chat_model = chat_model
+        self.memory = memory
+        self.prompt_template = config.CHATBOT_TEMPLATE
         self.history_turns = config.CONVERSATION_HISTORY_TURNS
         self.max_turns = config.CONVERSATION_MAX_TURNS
 
@@ -71,25 +147,49 @@ class ChatbotNode:
             else messages[:-1]
         )
 
-    def execute(self, state: State) -> dict:
-        """
-        Executes the chatbot logic. they are used as previous conversation history.
-        """
-        log.debug(f"Executing ChatbotNode with state: {state}")
-        messages = state["messages"]
-        conversation_history = self.trim_messages(messages)
-        prompt = config.CHATBOT_TEMPLATE.invoke(
+    def conversation_history(self, state: State, config: RunnableConfig) -> str:
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        if self.memory is None or thread_id is None:
+            return self.trim_messages(state["messages"])
+        return self.memory.history(
+            thread_id,
+            state["messages"],
+            state.get("summary"),
+            state.get("summary_through"),
+        )
+
+    def _summary_update(self, config: RunnableConfig) -> dict:
+        """The thread's latest summary, saved in the state for other processes."""
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        if self.memory is None or thread_id is None:
+            return {}
+        return self.memory.state_update(thread_id)
+
+    def build_prompt(self, messages, conversation_history=None):
+        """Builds the LLM prompt from the trimmed conversation history."""
+        if conversation_history is None:
+            conversation_history = self.trim_messages(messages)
+        prompt = self.prompt_template.invoke(
             {
                 "conversation_history": conversation_history,
                 "user_query": messages[-1].content,
             }
         )
-        messages = prompt.to_messages()
-        log.debug(f"LLM prompt messages with context: {messages}")
+        return prompt.to_messages()
+
+    def execute(self, state: State, config: RunnableConfig) -> dict:
+        """
+        Executes the chatbot logic. they are used as previous conversation history.
+        """
+        debug_payload("Executing ChatbotNode with state", lambda: state)
+        messages = self.build_prompt(
+            state["messages"], self.conversation_history(state, config)
+        )
+        debug_payload("LLM prompt messages with context", lambda: messages)
         try:
-            response = self.chat_model.invoke(messages)
-            log.debug(f"ChatbotNode response: {response}")
-            return {"messages": [response]}
+            response = self.chat_model.invoke(messages, config=config)
+            debug_payload("ChatbotNode response", lambda: response)
+            return {"messages": [response], **self._summary_update(config)}
 
         except Exception as e:
             log.error(f"Error in ChatbotNode execution: {e}")
@@ -97,6 +197,132 @@ class ChatbotNode:
                 "messages": [AIMessage(content="Failed to generate desired results")]
             }
 
+    async def aexecute(self, state: State, config: RunnableConfig) -> dict:
+        """
+        Async variant of `execute`, used when the graph is driven with
+        `ainvoke`/`astream`.
+        """
+        debug_payload("Executing async ChatbotNode with state", lambda: state)
+        messages = self.build_prompt(
+            state["messages"], self.conversation_history(state, config)
+        )
+        debug_payload("LLM prompt messages with context", lambda: messages)
+        try:
+            response = await self.chat_model.ainvoke(messages, config=config)
+            debug_payload("ChatbotNode response", lambda: response)
+            return {"messages": [response], **self._summary_update(config)}
+
+        except Exception as e:
+            log.error(f"Error in async ChatbotNode execution: {e}")
+            return {
+                "messages": [AIMessage(content="Failed to generate desired results")]
+            }
+
+
+class SpeculativeDispatchNode:
+    """
+    Routes the latest query and, at the same time, retrieves documents for it.
+
+    Retrieval starts before the routing decision is known. If the router picks
+    "rag", RAGNode answers from the prefetched documents; if it picks "chat",
+    the retrieval result is discarded. For Jira questions this hides the
+    retrieval latency behind the router call.
+
+    The documents are handed over through `prefetched`, not the graph state,
+    so they are not checkpointed. A retrieval that is already running cannot
+    be interrupted: on the sync path `cancel()` only drops one still queued
+    behind the SPECULATIVE_RETRIEVAL_WORKERS threads, and on the async path
+    cancelling stops the coroutine but not a retriever running in a thread.
+    Such a retrieval finishes in the background and its result is discarded.
+    """
+
+    def __init__(self, router, rag_agent, prefetched: PrefetchedDocuments):
+        self.router = router
+        self.rag_agent = rag_agent
+        self.prefetched = prefetched
+        self.executor = ThreadPoolExecutor(
+            max_workers=config.SPECULATIVE_RETRIEVAL_WORKERS,
+            thread_name_prefix="speculative-retrieval",
+        )
+
+    @staticmethod
+    def _timed(fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        return result, (time.perf_counter() - start) * 1000
+
+    @staticmethod
+    async def _atimed(coro):
+        start = time.perf_counter()
+        result = await coro
+        return result, (time.perf_counter() - start) * 1000
+
+    def _result(self, route, documents, route_ms, retrieval_ms, wall_ms) -> dict:
+        timings = {
+            "route_ms": route_ms,
+            "retrieval_ms": retrieval_ms,
+            "dispatch_ms": wall_ms,
+            # time hidden by running both stages concurrently
+            "overlap_saved_ms": max(0.0, route_ms + (retrieval_ms or 0.0) - wall_ms),
+        }
+        log.info(
+            f"Speculative dispatch: route={route} route {route_ms:.1f} ms, "
+            f"retrieval {retrieval_ms or 0.0:.1f} ms, wall {wall_ms:.1f} ms, "
+            f"saved {timings['overlap_saved_ms']:.1f} ms"
+        )
+        prefetch_id = self.prefetched.put(documents) if documents is not None else None
+        return {"route": route, "prefetch_id": prefetch_id, "timings": timings}
+
+    def execute(self, state: State) -> dict:
+        start = time.perf_counter()
+        query = state["messages"][-1].content
+        retrieval = self.executor.submit(self._timed, self.rag_agent.retrieve, query)
+        try:
+            decision, route_ms = self._timed(self.router.route, query)
+            route = decision.route
+        except Exception as e:
+            log.error(f"Error in speculative router execution: {e}")
+            # Default to chatbot on error
+            route, route_ms = "chat", (time.perf_counter() - start) * 1000
+
+        documents, retrieval_ms = None, None
+        if route == "rag":
+            try:
+                documents, retrieval_ms = retrieval.result()
+            except Exception as e:
+                # RAGNode retrieves again when no documents were prefetched
+                log.error(f"Speculative retrieval failed: {e}")
+        elif not retrieval.cancel():
+            log.debug("Speculative retrieval already running, discarding its result")
+        wall_ms = (time.perf_counter() - start) * 1000
+        return self._result(route, documents, route_ms, retrieval_ms, wall_ms)
+
+    async def aexecute(self, state: State) -> dict:
+        start = time.perf_counter()
+        query = state["messages"][-1].content
+        retrieval = asyncio.create_task(
+            self._atimed(self.rag_agent.aretrieve(query))
+        )
+        try:
+            decision, route_ms = await self._atimed(self.router.aroute(query))
+            route = decision.route
+        except Exception as e:
+            log.error(f"Error in speculative router execution: {e}")
+            # Default to chatbot on error
+            route, route_ms = "chat", (time.perf_counter() - start) * 1000
+
+        documents, retrieval_ms = None, None
+        if route == "rag":
+            try:
+                documents, retrieval_ms = await retrieval
+            except Exception as e:
+                # RAGNode retrieves again when no documents were prefetched
+                log.error(f"Speculative retrieval failed: {e}")
+        else:
+            retrieval.cancel()
+        wall_ms = (time.perf_counter() - start) * 1000
+        return self._result(route, documents, route_ms, retrieval_ms, wall_ms)
+
 
 class GraphBuilder:
     """
@@ -104,59 +330,143 @@ class GraphBuilder:
     """
 
     @staticmethod
-    def router_function(state: State, structured_llm):
+    def router_function(state: State, router):
         """
         Determines the next step in the graph.
         """
         log.info("Executing router.")
         query = state["messages"][-1].content
         try:
-            router_result = structured_llm.invoke(query)
-            log.debug(f"Router decision: {router_result.route}")
-            return router_result.route
+            decision = router.route(query)
+            log.info(
+                f"Router decision: {decision.route} by {decision.stage} stage "
+                f"(confidence {decision.confidence:.3f}) in {decision.latency_ms:.1f} ms"
+            )
+            return decision.route
         except Exception as e:
             log.error(f"Error in router execution: {e}")
             # Default to chatbot on error
             return "chat"
 
     @staticmethod
-    def build_graph(model_name: str = "google_genai:gemini-1.5-flash"):
+    async def arouter_function(state: State, router):
+        """
+        Async variant of `router_function`.
+        """
+        log.info("Executing async router.")
+        query = state["messages"][-1].content
+        try:
+            decision = await router.aroute(query)
+            log.info(
+                f"Router decision: {decision.route} by {decision.stage} stage "
+                f"(confidence {decision.confidence:.3f}) in {decision.latency_ms:.1f} ms"
+            )
+            return decision.route
+        except Exception as e:
+            log.error(f"Error in async router execution: {e}")
+            # Default to chatbot on error
+            return "chat"
+
+    @staticmethod
+    def build_graph(
+        model_name: str = "google_genai:gemini-1.5-flash",
+        chat_model=None,
+        rag_agent=None,
+        router=None,
+        speculative_retrieval=None,
+        checkpointer=None,
+    ):
         """
         Builds and compiles the LangGraph.
+
+        Every node and the router have a sync and an async implementation, so
+        the compiled graph can be driven with `stream`/`invoke` or with
+        `astream`/`ainvoke`. `chat_model`, `rag_agent` and `router` can be
+        injected (e.g. offline fakes); by default they are created from
+        `model_name`, the process-wide RAGExecutor and `config.ROUTER_TYPE`.
+
+        With `speculative_retrieval` (default `config.SPECULATIVE_RETRIEVAL`)
+        the entry point is a dispatch node that retrieves documents for the
+        query while the router decides, instead of routing first.
+
+        Conversations are saved by `checkpointer`, by default the one of
+        `config.CHECKPOINTER_TYPE` (see build_checkpointer).
         """
-        chat_model = init_chat_model(model_name)
+        if speculative_retrieval is None:
+            speculative_retrieval = config.SPECULATIVE_RETRIEVAL
+        if chat_model is None:
+            from langchain.chat_models import init_chat_model
+
+            chat_model = init_chat_model(model_name)
+        if rag_agent is None:
+            rag_agent = get_rag_agent()
 
-        # LLM with function calling for the router
-        structured_llm = chat_model.with_structured_output(QueryRouter)
+        if router is None:
+            # Local keyword/centroid routing, with the LLM router as fallback
+            router = build_router(config.ROUTER_TYPE, chat_model=chat_model)
 
         # Initialize nodes
-        chatbot_node = ChatbotNode(chat_model=chat_model)
-        rag_node = RAGNode()
+        memory = (
+            RollingSummaryMemory(chat_model)
+            if config.CONVERSATION_MEMORY == "summary"
+            else None
+        )
+        chatbot_node = ChatbotNode(chat_model=chat_model, memory=memory)
+        prefetched = PrefetchedDocuments()
+        rag_node = RAGNode(rag_agent=rag_agent, prefetched=prefetched)
 
         bot_graph = StateGraph(State)
 
         # Add nodes to the graph
-        bot_graph.add_node("chatbot", chatbot_node.execute)
-        bot_graph.add_node("rag_search", rag_node.execute)
-
-        # The entry point is now a conditional router
-        bot_graph.add_conditional_edges(
-            START,
-            lambda state: GraphBuilder.router_function(state, structured_llm),
-            {
-                "rag": "rag_search",
-                "chat": "chatbot",
-            },
+        bot_graph.add_node(
+            "chatbot", RunnableLambda(chatbot_node.execute, afunc=chatbot_node.aexecute)
         )
+        bot_graph.add_node(
+            "rag_search", RunnableLambda(rag_node.execute, afunc=rag_node.aexecute)
+        )
+
+        if speculative_retrieval:
+            # Route and retrieve concurrently, then branch on the stored route
+            dispatch_node = SpeculativeDispatchNode(
+                router=router, rag_agent=rag_agent, prefetched=prefetched
+            )
+            bot_graph.add_node(
+                "dispatch",
+                RunnableLambda(dispatch_node.execute, afunc=dispatch_node.aexecute),
+            )
+            bot_graph.add_edge(START, "dispatch")
+            bot_graph.add_conditional_edges(
+                "dispatch",
+                lambda state: state["route"],
+                {
+                    "rag": "rag_search",
+                    "chat": "chatbot",
+                },
+            )
+        else:
+            # The entry point is now a conditional router
+            bot_graph.add_conditional_edges(
+                START,
+                RunnableLambda(
+                    lambda state: GraphBuilder.router_function(state, router),
+                    afunc=lambda state: GraphBuilder.arouter_function(state, router),
+                    name="router",
+                ),
+                {
+                    "rag": "rag_search",
+                    "chat": "chatbot",
+                },
+            )
 
         bot_graph.add_edge("rag_search", END)
         bot_graph.add_edge("chatbot", END)
         log.info("Graph nodes and edges defined.")
 
-        memory = MemorySaver()
+        if checkpointer is None:
+            checkpointer = build_checkpointer()
 
-        # Compile the graph with a memory saver
-        compiled_graph = bot_graph.compile(checkpointer=memory)
+        # Compile the graph with the conversation checkpointer
+        compiled_graph = bot_graph.compile(checkpointer=checkpointer)
         log.info("Graph compiled successfully.")
 
         return compiled_graph
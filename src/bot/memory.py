@@ -0,0 +1,200 @@
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import List, Optional
+from langchain_core.messages import BaseMessage
+from langchain_core.messages.utils import get_buffer_string
+from src.common import config
+from src.common.logger import log
+
+
+class _ThreadMemory:
+    """Rendered window and running summary of one conversation thread."""
+
+    def __init__(self, summary: str = "", summary_through: Optional[str] = None):
+        self.lock = Lock()
+        self.lines: deque = deque()  # (message id, rendered line), oldest first
+        self.last_id: Optional[str] = None
+        self.summary = summary
+        self.summary_through = summary_through  # Last message the summary covers
+        # (message id, line) that left the window, not yet summarized
+        self.pending: List[tuple] = []
+        self.future: Optional[Future] = None
+
+
+class RollingSummaryMemory:
+    """
+    Conversation history for the chatbot prompt: the last `window` messages
+    verbatim, after a running summary of everything older.
+
+    Each thread's rendered window is cached, so a turn renders only the
+    messages added since the previous one. Messages that leave the window are
+    folded into the summary by the LLM on a background thread; the prompt
+    uses the summary as it stands, so no turn waits on summarization and the
+    prompt stays about `window` messages plus `max_summary_words` long.
+
+    The summary is also returned to the graph state (see ChatbotNode), with
+    the id of the last message it covers, so a thread evicted from the cache,
+    or handled by another process, continues from it. As summarization runs
+    in the background, the saved summary can lag behind the window; the
+    messages between the two are then summarized again from the state, not
+    lost. A failed summary update keeps its messages and is retried on the
+    next turn.
+    """
+
+    def __init__(
+        self,
+        chat_model,
+        window: int = config.CONVERSATION_HISTORY_TURNS,
+        max_summary_words: int = config.CONVERSATION_SUMMARY_MAX_WORDS,
+        max_threads: int = config.CONVERSATION_MEMORY_MAX_THREADS,
+        workers: int = config.CONVERSATION_SUMMARY_WORKERS,
+    ):
+        self.chat_model = chat_model
+        self.window = window
+        self.max_summary_words = max_summary_words
+        self.max_threads = max_threads
+        self.prompt = config.CONVERSATION_SUMMARY_PROMPT
+        self._threads: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="conversation-summary"
+        )
+
+    def _thread(
+        self, thread_id: str, summary: Optional[str], summary_through: Optional[str]
+    ) -> _ThreadMemory:
+        with self._lock:
+            thread = self._threads.get(thread_id)
+            if thread is None:
+                thread = self._threads[thread_id] = _ThreadMemory(
+                    summary or "", summary_through
+                )
+                while len(self._threads) > self.max_threads:
+                    self._threads.popitem(last=False)
+            else:
+                self._threads.move_to_end(thread_id)
+            return thread
+
+    def _new_messages(
+        self, thread: _ThreadMemory, history: List[BaseMessage]
+    ) -> List[BaseMessage]:
+        """The messages of `history` after the last one already rendered."""
+        if thread.last_id is not None:
+            for i in range(len(history) - 1, -1, -1):
+                if history[i].id == thread.last_id:
+                    return history[i + 1 :]
+        # First turn seen by this process, or the history was rewritten: the
+        # messages older than the window that the saved summary does not
+        # cover yet are summarized again
+        thread.lines.clear()
+        older = history[: max(0, len(history) - self.window)]
+        if thread.summary_through is None:
+            # Without an id, the summary was saved before it was recorded and
+            # covers everything older than the window
+            unsummarized = [] if thread.summary else older
+        else:
+            ids = [m.id for m in history]
+            if thread.summary_through in ids:
+                unsummarized = older[ids.index(thread.summary_through) + 1 :]
+            else:
+                # Trimmed from the state: every message left is newer
+                unsummarized = older
+        thread.pending = [(m.id, get_buffer_string([m])) for m in unsummarized]
+        return history[-self.window :]
+
+    def history(
+        self,
+        thread_id: str,
+        messages: List[BaseMessage],
+        summary: Optional[str] = None,
+        summary_through: Optional[str] = None,
+    ) -> str:
+        """
+        The conversation history before the latest message of `messages`.
+        `summary` and `summary_through` (the id of the last message it
+        covers) are the ones saved in the graph state, used when the thread
+        is not cached.
+        """
+        history = messages[:-1]
+        thread = self._thread(thread_id, summary, summary_through)
+        with thread.lock:
+            new = self._new_messages(thread, history)
+            thread.lines.extend((m.id, get_buffer_string([m])) for m in new)
+            if history:
+                thread.last_id = history[-1].id
+            while len(thread.lines) > self.window:
+                thread.pending.append(thread.lines.popleft())
+            # Also retries the lines of a failed update
+            if thread.pending and thread.future is None:
+                thread.future = self._executor.submit(self._summarize, thread)
+            buffer = "\n".join(line for _, line in thread.lines)
+            current_summary = thread.summary
+        if not current_summary:
+            return buffer
+        return f"Summary of the earlier conversation: {current_summary}\n{buffer}"
+
+    def summary(self, thread_id: str) -> Optional[str]:
+        with self._lock:
+            thread = self._threads.get(thread_id)
+        return thread.summary if thread is not None else None
+
+    def state_update(self, thread_id: str) -> dict:
+        """The thread's summary and the last message it covers, for the state."""
+        with self._lock:
+            thread = self._threads.get(thread_id)
+        if thread is None:
+            return {}
+        with thread.lock:
+            if not thread.summary:
+                return {}
+            update = {"summary": thread.summary}
+            if thread.summary_through is not None:
+                update["summary_through"] = thread.summary_through
+            return update
+
+    def wait(self, thread_id: str):
+        """
+        Blocks until the thread's summary includes every dropped message, or
+        an update failed (its messages are retried on the next turn).
+        """
+        with self._lock:
+            thread = self._threads.get(thread_id)
+        while thread is not None:
+            with thread.lock:
+                future = thread.future
+            if future is None:
+                return
+            future.result()
+
+    def _summarize(self, thread: _ThreadMemory):
+        while True:
+            with thread.lock:
+                entries, thread.pending = thread.pending, []
+                summary = thread.summary
+                if not entries:
+                    thread.future = None
+                    return
+            try:
+                prompt = self.prompt.invoke(
+                    {
+                        "summary": summary or "(none)",
+                        "new_lines": "\n".join(line for _, line in entries),
+                        "max_words": self.max_summary_words,
+                    }
+                )
+                response = self.chat_model.invoke(prompt)
+                words = str(response.content).split()
+                summary = " ".join(words[: self.max_summary_words])
+            except Exception as e:
+                log.error(
+                    f"Failed to update the conversation summary, retrying on the "
+                    f"next turn: {e}"
+                )
+                with thread.lock:
+                    thread.pending[:0] = entries
+                    thread.future = None
+                return
+            with thread.lock:
+                thread.summary = summary
+                thread.summary_through = entries[-1][0]
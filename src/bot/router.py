@@ -0,0 +1,232 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+from langgraph.constants import TAG_NOSTREAM
+from src.common import config
+from src.common.logger import log
+from src.rag.embeddings import HfEmbedder
+import asyncio
+import numpy as np
+import re
+import time
+
+
+ROUTES = ["rag", "chat"]
+
+
+class QueryRouter(BaseModel):
+    """Router for selecting the next node."""
+
+    route: str = Field(
+        description=config.ROUTER_PROMPT,
+        enum=ROUTES,
+    )
+
+
+class RouteDecision(BaseModel):
+    """Outcome of routing one query."""
+
+    route: Optional[str] = None  # None when the stage could not decide
+    stage: str  # "keyword", "centroid", "llm" or "fallback"
+    confidence: float = 0.0
+    latency_ms: float = 0.0
+
+
+class Router(ABC):
+    def __init__(self):
+        super().__init__()
+
+    @abstractmethod
+    def route(self, query: str) -> RouteDecision:
+        return
+
+    async def aroute(self, query: str) -> RouteDecision:
+        # Local stages are CPU bound; keep them off the event loop
+        return await asyncio.to_thread(self.route, query)
+
+
+class KeywordRouter(Router):
+    """Decides on whole-word keyword matches; undecided when nothing or both match."""
+
+    def __init__(self, rag_keywords: List[str], chat_keywords: List[str]):
+        super().__init__()
+        self.patterns = {
+            "rag": self._compile(rag_keywords),
+            "chat": self._compile(chat_keywords),
+        }
+
+    @staticmethod
+    def _compile(keywords: List[str]):
+        alternatives = "|".join(re.escape(k) for k in sorted(keywords, key=len)[::-1])
+        return re.compile(rf"\b(?:{alternatives})\b", re.IGNORECASE)
+
+    def route(self, query: str) -> RouteDecision:
+        start = time.perf_counter()
+        matched = [r for r, pattern in self.patterns.items() if pattern.search(query)]
+        route = matched[0] if len(matched) == 1 else None
+        return RouteDecision(
+            route=route,
+            stage="keyword",
+            confidence=1.0 if route else 0.0,
+            latency_ms=(time.perf_counter() - start) * 1000,
+        )
+
+    async def aroute(self, query: str) -> RouteDecision:
+        return self.route(query)
+
+
+class CentroidRouter(Router):
+    """
+    Nearest-centroid classifier over the embedding model that is already loaded
+    for dense retrieval. The confidence is the cosine margin between the best
+    and the second-best route centroid.
+    """
+
+    def __init__(self, embeddings, examples: Dict[str, List[str]]):
+        super().__init__()
+        self.embeddings = embeddings
+        self.routes = list(examples)
+        centroids = []
+        for route in self.routes:
+            vectors = self._normalize(
+                np.asarray(embeddings.embed_documents(examples[route]), np.float32)
+            )
+            centroids.append(vectors.mean(axis=0))
+        self.centroids = self._normalize(np.stack(centroids))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def route(self, query: str) -> RouteDecision:
+        start = time.perf_counter()
+        vector = self._normalize(
+            np.asarray(self.embeddings.embed_query(query), np.float32)
+        )
+        similarities = self.centroids @ vector
+        ranked = np.argsort(similarities)[::-1]
+        margin = float(similarities[ranked[0]] - similarities[ranked[1]])
+        return RouteDecision(
+            route=self.routes[ranked[0]],
+            stage="centroid",
+            confidence=margin,
+            latency_ms=(time.perf_counter() - start) * 1000,
+        )
+
+
+class LlmRouter(Router):
+    """The structured-output LLM router (one LLM round-trip per query)."""
+
+    def __init__(self, chat_model):
+        super().__init__()
+        # Its output is internal, so keep it out of the "messages" stream
+        self.structured_llm = chat_model.with_structured_output(
+            QueryRouter
+        ).with_config(tags=[TAG_NOSTREAM])
+
+    def route(self, query: str) -> RouteDecision:
+        start = time.perf_counter()
+        result = self.structured_llm.invoke(query)
+        return RouteDecision(
+            route=result.route,
+            stage="llm",
+            confidence=1.0,
+            latency_ms=(time.perf_counter() - start) * 1000,
+        )
+
+    async def aroute(self, query: str) -> RouteDecision:
+        start = time.perf_counter()
+        result = await self.structured_llm.ainvoke(query)
+        return RouteDecision(
+            route=result.route,
+            stage="llm",
+            confidence=1.0,
+            latency_ms=(time.perf_counter() - start) * 1000,
+        )
+
+
+class CascadeRouter(Router):
+    """
+    Keyword rules first, then the centroid classifier, then the LLM router only
+    when the centroid margin is below `min_margin`. Without an LLM router the
+    centroid's best guess is used.
+    """
+
+    def __init__(
+        self,
+        keyword_router: KeywordRouter,
+        centroid_router: Optional[CentroidRouter] = None,
+        llm_router: Optional[LlmRouter] = None,
+        min_margin: float = 0.0,
+    ):
+        super().__init__()
+        self.keyword_router = keyword_router
+        self.centroid_router = centroid_router
+        self.llm_router = llm_router
+        self.min_margin = min_margin
+
+    def _finish(self, decision: RouteDecision, start: float) -> RouteDecision:
+        # report the latency of the whole cascade, not only the deciding stage
+        decision.latency_ms = (time.perf_counter() - start) * 1000
+        return decision
+
+    def _local_decision(self, query: str) -> Optional[RouteDecision]:
+        decision = self.keyword_router.route(query)
+        if decision.route:
+            return decision
+        if self.centroid_router is None:
+            return None
+        decision = self.centroid_router.route(query)
+        if decision.confidence >= self.min_margin or self.llm_router is None:
+            return decision
+        log.debug("Low centroid router confidence: {:.3f}", decision.confidence)
+        return None
+
+    def route(self, query: str) -> RouteDecision:
+        start = time.perf_counter()
+        decision = self._local_decision(query)
+        if decision is None:
+            if self.llm_router is None:
+                return self._finish(RouteDecision(route="chat", stage="fallback"), start)
+            decision = self.llm_router.route(query)
+        return self._finish(decision, start)
+
+    async def aroute(self, query: str) -> RouteDecision:
+        start = time.perf_counter()
+        decision = await asyncio.to_thread(self._local_decision, query)
+        if decision is None:
+            if self.llm_router is None:
+                return self._finish(RouteDecision(route="chat", stage="fallback"), start)
+            decision = await self.llm_router.aroute(query)
+        return self._finish(decision, start)
+
+
+def build_router(router_type="cascade", chat_model=None, embeddings=None) -> Router:
+    """
+    Creates the query router.
+
+    Args:
+        router_type: "cascade" for the local keyword/centroid router with LLM
+            fallback, or "llm" for the LLM router alone.
+        chat_model: Chat model used by the LLM (fallback) router.
+        embeddings: Embedding model for the centroid stage; the shared
+            HfEmbedder instance when not given.
+    """
+    llm_router = LlmRouter(chat_model) if chat_model is not None else None
+    if router_type == "llm":
+        if llm_router is None:
+            raise ValueError("The 'llm' router needs a chat model.")
+        return llm_router
+    elif router_type == "cascade":
+        if embeddings is None:
+            embeddings = HfEmbedder().get_embeder()
+        return CascadeRouter(
+            keyword_router=KeywordRouter(
+                config.ROUTER_RAG_KEYWORDS, config.ROUTER_CHAT_KEYWORDS
+            ),
+            centroid_router=CentroidRouter(embeddings, config.ROUTER_EXAMPLES),
+            llm_router=llm_router,
+            min_margin=config.ROUTER_CENTROID_MIN_MARGIN,
+        )
+    raise ValueError(f"Unknown router type: {router_type}")
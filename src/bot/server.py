@@ -0,0 +1,170 @@
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from src.bot.checkpointer import build_checkpointer
+from src.bot.service import (
+    astream_reply,
+    delete_conversation,
+    get_chatbot_graph,
+    preload,
+    readiness,
+    start_warm_up,
+    use_checkpointer,
+)
+from src.common import config
+from src.common.logger import log
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import time
+
+
+class ChatRequest(BaseModel):
+    thread_id: str
+    message: str
+
+
+async def save_conversations():
+    """
+    Commits the queued checkpoints before a turn's response ends, so the next
+    turn of the conversation can be served by any worker.
+    """
+    checkpointer = get_chatbot_graph().checkpointer
+    if hasattr(checkpointer, "flush"):
+        await asyncio.to_thread(checkpointer.flush)
+
+
+def create_app() -> FastAPI:
+    """
+    The chat API of a worker: POST /chat streams the answer as JSON lines of
+    {"text", "replace"} (see astream_reply), DELETE /threads/{id} deletes a
+    conversation and GET /health reports the warm-up of the worker.
+    """
+    app = FastAPI(title="Jira Reviews ChatBot")
+
+    @app.post("/chat")
+    async def chat(request: ChatRequest):
+        async def events():
+            try:
+                async for text, replace in astream_reply(request.message, request.thread_id):
+                    yield json.dumps({"text": text, "replace": replace}) + "\n"
+                await save_conversations()
+            except Exception as e:
+                log.error(f"Error during chatbot stream for thread '{request.thread_id}': {e}")
+                yield json.dumps(
+                    {"text": "Sorry, an error occurred. Please try again.", "replace": True}
+                ) + "\n"
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    @app.delete("/threads/{thread_id}")
+    async def delete_thread(thread_id: str):
+        await asyncio.to_thread(delete_conversation, thread_id)
+        return {"deleted": thread_id}
+
+    @app.get("/health")
+    async def health():
+        return {**readiness(), "pid": os.getpid()}
+
+    return app
+
+
+def _run_worker(sock: socket.socket, workers: int):
+    """Serves the chat API on the inherited socket, in a forked worker."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if "torch" in sys.modules:
+        # The cores are split between the workers
+        import torch
+
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    import uvicorn
+
+    if workers > 1:
+        # Every worker reads and writes the same database: no per-process cache
+        use_checkpointer(build_checkpointer(max_cached_threads=0))
+    server = uvicorn.Server(
+        uvicorn.Config(create_app(), log_level="warning", access_log=False)
+    )
+    start_warm_up()
+    try:
+        server.run(sockets=[sock])
+    finally:
+        if get_chatbot_graph.loaded():
+            checkpointer = get_chatbot_graph().checkpointer
+            if hasattr(checkpointer, "close"):
+                checkpointer.close()
+
+
+def serve(
+    workers: int = config.SERVE_WORKERS,
+    host: str = config.SERVE_HOST,
+    port: int = config.SERVE_PORT,
+):
+    """
+    Pre-fork server: binds the port and loads the shared models (see
+    preload), then forks `workers` processes that accept connections on the
+    same socket, each with its own graph, retrievers and checkpointer
+    connection. Workers that die are restarted; SIGTERM or SIGINT stops them.
+
+    Conversations live in the SQLite checkpointer, which every worker reads
+    and writes: with several workers its per-process cache is disabled and
+    each turn is committed before its response ends, so consecutive turns of
+    a conversation can land on different workers.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    preload()
+
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(sock, workers)
+            except BaseException as e:
+                log.critical(f"Worker {os.getpid()} failed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+    log.info(f"Serving on http://{host}:{port} with {workers} workers: {list(children)}")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        log.error(f"Worker {pid} exited with code {os.waitstatus_to_exitcode(status)}")
+        # A worker failing right after its start is not restarted in a tight loop
+        time.sleep(max(0.0, 1.0 - (time.monotonic() - started)))
+        spawn()
+    sock.close()
+    log.info("Server stopped.")
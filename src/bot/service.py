@@ -0,0 +1,162 @@
+from threading import Event, Thread
+from typing import AsyncIterator, Optional, Tuple
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from src.bot.graph import GraphBuilder
+from src.common import config
+from src.common.logger import log
+from src.common.utils import lazy, measure_time
+from src.rag.embeddings import HfEmbedder
+from src.rag.llms import load_llm
+from src.rag.rag_executor import get_rag_agent
+import asyncio
+import json
+import time
+
+
+# Graph nodes whose LLM output is streamed to the user
+ANSWER_NODES = ("rag_search", "chatbot")
+
+
+# Checkpointer of the process-wide graph, when not the configured default
+_graph_checkpointer = []
+
+
+def use_checkpointer(checkpointer):
+    """
+    Makes the process-wide chatbot graph save conversations in `checkpointer`
+    (e.g. serve.py's workers). Must be called before the graph is built.
+    """
+    if get_chatbot_graph.loaded():
+        raise RuntimeError("The chatbot graph is already built.")
+    _graph_checkpointer[:] = [checkpointer]
+
+
+@lazy
+def get_chatbot_graph():
+    """
+    Returns the process-wide chatbot graph, building it (and the RAG agent,
+    the router and the shared embedding model) on first use.
+    """
+    log.info("Initializing LangGraph chatbot graph...")
+    with measure_time("chatbot graph initialization", log):
+        return GraphBuilder.build_graph(
+            chat_model=load_llm(config.LLM_TYPE),
+            checkpointer=_graph_checkpointer[0] if _graph_checkpointer else None,
+        )
+
+
+def preload():
+    """
+    Loads the parts of the app that forked worker processes can share: the
+    embedding model, whose weights are then shared copy-on-write. The
+    indexes and the docstore need no preloading: they are memory-mapped
+    files, shared through the page cache by every process mapping them.
+    Nothing here starts a thread or opens a connection, which would not
+    survive a fork.
+    """
+    with measure_time("preloading the shared models", log):
+        HfEmbedder().get_model()
+
+
+_ready = Event()
+_status = {"status": "cold", "seconds": None, "error": None}
+
+
+def warm_up(query: str = config.WARM_UP_QUERY):
+    """
+    Builds the chatbot graph and runs one retrieval, so the first user does
+    not wait for model loading, index reads or the first forward pass. Sets
+    the readiness flag when done; raises if a component fails to load.
+    """
+    _status.update(status="warming", error=None)
+    start = time.perf_counter()
+    try:
+        get_chatbot_graph()
+        get_rag_agent().ensemble_retriever.invoke(query)
+    except Exception as e:
+        _status.update(status="failed", error=str(e))
+        log.critical(f"Warm-up failed: {e}")
+        raise
+    _status.update(status="ready", seconds=time.perf_counter() - start)
+    _ready.set()
+    log.info(f"Warm-up took {_status['seconds']:.2f} seconds, ready to answer.")
+
+
+def start_warm_up() -> Optional[Thread]:
+    """Runs `warm_up` on a daemon thread (unless WARM_UP_ENABLED is off)."""
+    if not config.WARM_UP_ENABLED:
+        return None
+    thread = Thread(target=_warm_up_in_background, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def _warm_up_in_background():
+    try:
+        warm_up()
+    except Exception:
+        # Logged by warm_up; the first chat retries loading the components
+        pass
+
+
+def is_ready() -> bool:
+    """Whether the warm-up finished and chats are answered without delay."""
+    return _ready.is_set()
+
+
+def readiness() -> dict:
+    """Status of the warm-up ("cold", "warming", "ready" or "failed") and its duration."""
+    return dict(_status, ready=is_ready())
+
+
+async def astream_reply(message: str, thread_id: str) -> AsyncIterator[Tuple[str, bool]]:
+    """
+    Streams the chatbot's answer to `message` in the conversation `thread_id`
+    as (text, replace) pairs: `text` extends the answer, or replaces it when
+    `replace` is set (a node's complete or fallback answer).
+
+    With CHAT_SERVER_URL set, the answer comes from the chat server (see
+    serve.py); otherwise from this process's graph.
+    """
+    if config.CHAT_SERVER_URL:
+        async for event in _astream_remote_reply(config.CHAT_SERVER_URL, message, thread_id):
+            yield event
+        return
+    # Waits for the warm-up (or builds the graph) off the event loop
+    chatbot_graph = await asyncio.to_thread(get_chatbot_graph)
+    async for msg, metadata in chatbot_graph.astream(
+        {"messages": [HumanMessage(content=message.strip())]},
+        {"configurable": {"thread_id": thread_id}},
+        stream_mode="messages",
+    ):
+        if metadata.get("langgraph_node") not in ANSWER_NODES:
+            continue
+        if isinstance(msg, AIMessageChunk):
+            yield msg.content, False
+        elif isinstance(msg, AIMessage):
+            yield msg.content, True
+
+
+async def _astream_remote_reply(url: str, message: str, thread_id: str):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+        async with client.stream(
+            "POST", "/chat", json={"message": message, "thread_id": thread_id}
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    event = json.loads(line)
+                    yield event["text"], event["replace"]
+
+
+def delete_conversation(thread_id: str):
+    """Deletes a finished conversation, on the chat server if there is one."""
+    if config.CHAT_SERVER_URL:
+        import httpx
+
+        httpx.delete(f"{config.CHAT_SERVER_URL}/threads/{thread_id}").raise_for_status()
+    elif get_chatbot_graph.loaded():
+        # Before the graph is built, this process has no conversation to delete
+        get_chatbot_graph().checkpointer.delete_thread(thread_id)
@@ -1,8 +1,20 @@
-from typing import Annotated
-from typing_extensions import TypedDict
+from typing import Annotated, Optional
+from typing_extensions import NotRequired, TypedDict
 from langgraph.graph.message import add_messages
 
 
 # Define the state for LangGraph
 class State(TypedDict):
     messages: Annotated[list, add_messages]
+    # Written by the speculative dispatch node (config.SPECULATIVE_RETRIEVAL):
+    # the router's decision, the id under which the documents prefetched for
+    # the latest query are kept in memory (see PrefetchedDocuments; they are
+    # not checkpointed) and the per-stage timings in milliseconds.
+    route: NotRequired[str]
+    prefetch_id: NotRequired[Optional[str]]
+    timings: NotRequired[dict]
+    # Running summary of the messages older than the chatbot's history window
+    # (config.CONVERSATION_MEMORY = "summary"), and the id of the last message
+    # it covers
+    summary: NotRequired[str]
+    summary_through: NotRequired[str]
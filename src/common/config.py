@@ -1,21 +1,89 @@
 from langchain_core.prompts import ChatPromptTemplate
+import os
 
 # --- Paths and Directories ---
 REVIEW_DATA_PATH = "data/all_reviews.json"
 DB_PERSIST_DIRECTORY = "chroma_db"
+# Read-only indexes written by ingest.py and memory-mapped at query time
+INDEX_DIRECTORY = "indexes"
+DOCSTORE_DIRECTORY = f"{INDEX_DIRECTORY}/docstore"
+BM25_INDEX_DIRECTORY = f"{INDEX_DIRECTORY}/bm25"
+DENSE_INDEX_DIRECTORY = f"{INDEX_DIRECTORY}/dense"
+# Rating and review month of every review, for metadata-filtered retrieval
+METADATA_INDEX_DIRECTORY = f"{INDEX_DIRECTORY}/metadata"
+# Ids of the ingested reviews; ingest.py diffs new data against it
+INGEST_MANIFEST_PATH = f"{INDEX_DIRECTORY}/manifest.json"
+INGEST_BATCH_SIZE = 256  # Reviews embedded and upserted per Chroma call
+INGEST_ENCODE_BATCH_SIZE = 64  # sentence-transformers batch size inside a worker
+INGEST_WORKERS = 2  # Embedding worker processes; 0 encodes in the ingest process
+# Progress of an interrupted ingestion run, resumed on the next run
+INGEST_CHECKPOINT_PATH = f"{INDEX_DIRECTORY}/ingest_checkpoint.json"
 
 # --- Embedding Model Configuration ---
 EMBEDDING_MODEL_NAME = "BAAI/bge-base-en-v1.5"
 MODEL_KWARGS = {"device": "cpu"}  # Use "cuda" for GPU
 ENCODE_KWARGS = {"normalize_embeddings": False}
+# On-disk cache of computed embeddings, shared by ingestion and queries
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_DIRECTORY = f"{INDEX_DIRECTORY}/embedding_cache"
+EMBEDDING_CACHE_DTYPE = "float16"  # or "float32" for exact vectors
+EMBEDDING_CACHE_MAX_ENTRIES = 500_000  # Least recently used entries are evicted
+# Cache hits record their last-used time in memory; written in batches this often
+EMBEDDING_CACHE_RECENCY_FLUSH_SECONDS = 30.0
 
 # --- Retriever Configuration ---
+# "chroma" (HNSW) or "numpy" (exact search over DENSE_INDEX_DIRECTORY, which
+# is faster for a corpus of a few thousand reviews)
+VECTOR_STORE_TYPE = "chroma"
+# Codes scanned by the "numpy" store: "float32" (exact), "float16", "int8" or
+# "binary"; the best k * DENSE_INDEX_RESCORE_MULTIPLIER candidates are then
+# rescored at full precision
+DENSE_INDEX_QUANTIZATION = "float32"
+DENSE_INDEX_RESCORE_MULTIPLIER = 10
 ENSEMBLE_RETRIEVER_WEIGHTS = [0.5, 0.5]  # [dense, sparse]
 DENSE_RETRIEVED_DOCUMENTS = 3
 SPARSE_RETRIEVED_DOCUMENTS = 3
+# Fusion of the dense and sparse results, keyed by review id so a review
+# found twice fills one slot: "rrf" (weighted reciprocal rank), "minmax"
+# (weighted sum of min-max normalized scores) or "convex" (weighted sum of
+# the raw scores, which puts cosine and BM25 scores on one scale)
+FUSION_METHOD = "rrf"
+FUSION_RRF_C = 60
+FUSED_RETRIEVED_DOCUMENTS = 6  # Distinct reviews kept after fusion
+# Optional cross-encoder reranking: each retriever over-fetches
+# RERANK_CANDIDATES, the fused candidates are scored in one batch and the best
+# RERANK_TOP_N are sent to the LLM. When scoring takes longer than
+# RERANK_TIMEOUT_SECONDS, the top RERANK_TOP_N in fused order are used instead.
+RERANK_ENABLED = False
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_MAX_LENGTH = 256  # Tokens per (query, review) pair
+RERANK_CANDIDATES = 50
+RERANK_TOP_N = 4
+RERANK_TIMEOUT_SECONDS = 0.3
+# Rating and date constraints in the query ("negative reviews from 2024",
+# "5-star reviewers") restrict both retrievers to the matching reviews
+METADATA_FILTERING = True
+# Dense and sparse retrievers run concurrently; one that takes longer than
+# this is left out of the fused results (None waits for both)
+RETRIEVER_TIMEOUT_SECONDS = 2.0
+
+# --- Query Cache Configuration ---
+# Tier 1: normalized query -> query embedding and retrieved documents
+QUERY_CACHE_ENABLED = True
+RETRIEVAL_CACHE_MAX_ENTRIES = 1024
+RETRIEVAL_CACHE_TTL_SECONDS = 3600
+# Tier 2: answers returned for queries within a cosine similarity threshold
+# (and with the same rating/date filter). Off: no evaluation backs the
+# threshold yet, and close embeddings can still ask opposite questions
+# ("like" vs "dislike")
+ANSWER_CACHE_ENABLED = False
+ANSWER_CACHE_MAX_ENTRIES = 512
+ANSWER_CACHE_TTL_SECONDS = 3600
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95
 
 # --- LLM and Prompt Configuration ---
 LLM_MODEL_NAME = "gemini-1.5-flash"
+LLM_TYPE = "google_genai"  # "google_genai" or "fake" (offline, for tests/benchmarks)
 
 ROUTER_PROMPT = """You are router who is responsible to select either 'rag' or 'chat'. \
 If user ask query specifically related to Jira (a project managment tool) or ask related project management related things \
@@ -23,6 +91,85 @@ without specifically mentioning name of 'Jira' name, select 'rag' for answering
 otherwise select 'chat'.
 """
 
+# --- Query Router Configuration ---
+ROUTER_TYPE = "cascade"  # "cascade" (keywords -> centroids -> LLM) or "llm"
+# Minimum cosine margin between the best and second-best route centroid for the
+# centroid stage to decide on its own; below it the LLM router is asked.
+ROUTER_CENTROID_MIN_MARGIN = 0.04
+# Whole-word (or whole-phrase) matches that decide the route without a model call
+ROUTER_RAG_KEYWORDS = [
+    "jira",
+    "atlassian",
+    "confluence",
+    "sprint",
+    "sprints",
+    "scrum",
+    "kanban",
+    "backlog",
+    "backlogs",
+    "agile",
+    "epic",
+    "epics",
+    "story points",
+    "user stories",
+    "issue tracking",
+    "bug tracking",
+    "project management",
+    "project manager",
+    "workflow",
+    "workflows",
+    "roadmap",
+    "reviewers",
+    "reviews",
+]
+ROUTER_CHAT_KEYWORDS = [
+    "hi",
+    "hello",
+    "hey",
+    "thanks",
+    "thank you",
+    "good morning",
+    "good evening",
+    "bye",
+    "goodbye",
+    "who are you",
+    "how are you",
+    "what is your name",
+]
+# Example queries whose embeddings form the per-route centroids
+ROUTER_EXAMPLES = {
+    "rag": [
+        "What do users like most about the tool?",
+        "What are the main complaints from users?",
+        "Is it easy to learn for new team members?",
+        "How well does it handle task tracking for software teams?",
+        "Is it worth the price for a small team?",
+        "How good is the reporting and dashboards feature?",
+        "Does it integrate well with other developer tools?",
+        "How do teams plan and track their work with it?",
+        "What do people say about its performance and speed?",
+        "Is the customer support helpful?",
+    ],
+    "chat": [
+        "Tell me a joke.",
+        "What is the capital of France?",
+        "Write a short poem about the sea.",
+        "How do I cook pasta?",
+        "What is 12 times 7?",
+        "Translate good night into Spanish.",
+        "What's the weather usually like in summer?",
+        "Can you recommend a good movie?",
+        "Explain what photosynthesis is.",
+        "How are you doing today?",
+    ],
+}
+
+# --- Speculative Retrieval Configuration ---
+# Start ensemble retrieval for the latest query while the router decides; the
+# documents are discarded when the router picks "chat".
+SPECULATIVE_RETRIEVAL = False
+SPECULATIVE_RETRIEVAL_WORKERS = 8  # threads for speculative retrieval (sync path)
+
 RAG_SYSTEM_PROMPT = (
     "You are a helpful assistant. Given Jira reviews, your task is to answer the user's query "
     "based *only* on the provided review context.\n"
@@ -59,6 +206,84 @@ CHATBOT_TEMPLATE = ChatPromptTemplate.from_messages(
     ]
 )
 
+# --- Context Packing Configuration ---
+# Retrieved reviews are cut to their most query-relevant sentences and packed
+# into CONTEXT_TOKEN_BUDGET prompt tokens, counted with the Hugging Face
+# tokenizer CONTEXT_TOKENIZER (None: a local word/punctuation estimate)
+CONTEXT_COMPRESSION = True
+CONTEXT_TOKEN_BUDGET = 1200
+CONTEXT_MAX_SENTENCES_PER_REVIEW = 4
+CONTEXT_TOKENIZER = None
+
 # TRIM MESSAGE CONFIGS
 CONVERSATION_HISTORY_TURNS = 5
 CONVERSATION_MAX_TURNS = 10
+# "window": the last CONVERSATION_HISTORY_TURNS messages once the conversation
+# exceeds CONVERSATION_MAX_TURNS; older ones are dropped. "summary": the last
+# CONVERSATION_HISTORY_TURNS messages after a running summary of the older
+# ones, updated in the background by an extra LLM call
+CONVERSATION_MEMORY = "window"
+CONVERSATION_SUMMARY_MAX_WORDS = 120
+CONVERSATION_SUMMARY_WORKERS = 4  # Threads summarizing in the background
+CONVERSATION_MEMORY_MAX_THREADS = 2000  # Conversations cached in memory
+CONVERSATION_SUMMARY_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You maintain a running summary of a conversation between a user and an "
+            "assistant about Jira reviews. Update the summary with the new lines. Keep "
+            "names, facts, preferences and open questions; drop small talk. Reply with "
+            "the updated summary only, in at most {max_words} words.",
+        ),
+        ("user", "Current summary:\n{summary}\n\nNew lines:\n{new_lines}"),
+    ]
+)
+
+# --- Conversation Checkpointer ---
+# "sqlite" (bounded and persistent, at CHECKPOINT_DB_PATH) or "memory"
+# (LangGraph's MemorySaver: unbounded, lost on restart)
+CHECKPOINTER_TYPE = "sqlite"
+CHECKPOINT_DB_PATH = "conversations/checkpoints.sqlite"
+CHECKPOINT_FLUSH_INTERVAL_SECONDS = 0.05  # Queued writes are committed together
+CHECKPOINT_FLUSH_BATCH_SIZE = 256  # ...or as soon as this many are queued
+CHECKPOINT_KEEP_PER_THREAD = 2  # Older checkpoints of a thread are deleted
+CHECKPOINT_THREAD_TTL_SECONDS = 24 * 3600  # Idle threads are deleted
+CHECKPOINT_MAX_THREADS = 100_000  # Least recently used threads beyond it are deleted
+CHECKPOINT_MAX_DISK_BYTES = 1024**3
+CHECKPOINT_MAX_CACHED_THREADS = 2000  # Latest checkpoints kept in memory...
+CHECKPOINT_MAX_MEMORY_BYTES = 64 * 1024**2  # ...up to this many bytes
+CHECKPOINT_SWEEP_INTERVAL_SECONDS = 60
+
+# --- Batch Question Answering (batch_qa.py) ---
+BATCH_QA_BATCH_SIZE = 64  # Queries embedded and retrieved together
+BATCH_QA_CONCURRENCY = 8  # LLM calls in flight
+BATCH_QA_REQUESTS_PER_SECOND = 1.0  # LLM calls started per second (None: unlimited)
+
+# --- Serving Configuration ---
+CHAT_CONCURRENCY_LIMIT = 200  # concurrent chat events handled by the Gradio app
+# Components (embedding model, indexes, graph) are built on first use; after
+# the UI starts, a background warm-up builds them and runs this query once
+WARM_UP_ENABLED = True
+WARM_UP_QUERY = "What do reviewers like about Jira boards?"
+WARM_UP_MESSAGE = "The assistant is starting up, your answer will follow in a moment..."
+
+# --- Multi-worker Serving (serve.py) ---
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8000
+SERVE_WORKERS = 4  # Worker processes sharing the port, about one per CPU core
+# When set (e.g. "http://127.0.0.1:8000"), app.py sends the chats to serve.py
+# instead of answering them in its own process
+CHAT_SERVER_URL = None
+
+# --- Logging ---
+# "production": LOG_LEVEL and up, sampled and size-capped debug payloads;
+# "debug": every record at DEBUG, payloads in full, variable values in tracebacks
+LOG_MODE = "production"
+LOG_LEVEL = "INFO"
+# Directory of the log files; the LOG_DIR environment variable overrides it,
+# also for the worker processes a run starts
+LOG_DIR = os.environ.get("LOG_DIR", "logs")
+# Levels of single modules (or packages), e.g. {"src.rag.retriever": "DEBUG"}
+LOG_MODULE_LEVELS = {}
+LOG_DEBUG_SAMPLE_RATE = 0.01  # Fraction of the debug payloads logged (documents, prompts, state)
+LOG_PAYLOAD_MAX_CHARS = 2000  # Longer payloads are cut
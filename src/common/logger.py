@@ -1,33 +1,123 @@
+from typing import Any, Callable, Dict, Optional
 from loguru import logger
+from src.common import config
 import os
+import random
+import sys
 
 
-def setup_logger(file_name="app.log", dir="logs"):
+# Set by setup_logger, read by debug_payload
+_settings = {"sample_rate": 1.0, "max_chars": None, "levels": {"": "DEBUG"}}
+# Whether each module logs DEBUG records, filled in as modules log
+_debug_modules: Dict[str, bool] = {}
+# The handler setup_logger added, and what it was added with
+_handler = {"id": 0, "key": None}
+
+
+def setup_logger(
+    file_name="app.log",
+    dir: Optional[str] = None,
+    mode: Optional[str] = None,
+    level: Optional[str] = None,
+    module_levels: Optional[Dict[str, str]] = None,
+):
     """
     Configures a standardized logger for the application.
 
-    This function sets up a default logger and adds a file handler for
-    structured, rotating log files. It's designed to be called once
-    at the start of the application or module.
+    Records go to a rotating file in `dir` (LOG_DIR), written by a background thread
+    (`enqueue=True`), so logging does not wait on the disk. In LOG_MODE
+    "production", records below `level` (LOG_LEVEL) are dropped, except for
+    the modules listed in `module_levels` (LOG_MODULE_LEVELS), and debug
+    payloads (see debug_payload) are sampled and cut to LOG_PAYLOAD_MAX_CHARS;
+    in "debug" mode everything is logged in full, with variable values in
+    tracebacks.
+
+    Calling it again with another file replaces the file handler it added
+    before (e.g. ingest.py writes to ingest.log); with the same file and
+    settings it does nothing. Handlers added by other code are left alone.
     """
-    # Remove the default handler to avoid duplicate logs in the console
-    logger.remove()
+    dir = dir or config.LOG_DIR
+    mode = mode or config.LOG_MODE
+    debug = mode == "debug"
+    levels = {"": "DEBUG" if debug else (level or config.LOG_LEVEL)}
+    if not debug:
+        levels.update(
+            config.LOG_MODULE_LEVELS if module_levels is None else module_levels
+        )
+    _settings.update(
+        sample_rate=1.0 if debug else config.LOG_DEBUG_SAMPLE_RATE,
+        max_chars=None if debug else config.LOG_PAYLOAD_MAX_CHARS,
+        levels=levels,
+    )
+
+    _debug_modules.clear()
 
     fp = os.path.join(dir, file_name)
-    logger.add(
+    key = (fp, mode, tuple(sorted(levels.items())))
+    if key == _handler["key"]:
+        return logger
+    # Removes loguru's default stderr handler (or the file handler added
+    # before), to avoid duplicate logs
+    try:
+        logger.remove(_handler["id"])
+    except ValueError:
+        pass
+    _handler["key"] = key
+    _handler["id"] = logger.add(
         fp,
         rotation="10 MB",  # Rotate the log file when it reaches 10 MB
         retention="7 days",  # Keep logs for up to 7 days
-        level="DEBUG",  # Log all messages from DEBUG level and above
+        # The lowest level of any module; the filter applies each module's
+        level=min(levels.values(), key=lambda name: logger.level(name).no),
+        filter=levels,
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | {level} | {file}: {function}: {line} - [{message}]",
-        enqueue=True,  # Make logging thread-safe (important for Streamlit)
-        backtrace=True,  # Show the full stack trace on exceptions
-        diagnose=True,  # Add exception variable values for debugging
+        enqueue=True,  # Written by a background thread, safe across threads and processes
+        backtrace=debug,  # Show the full stack trace on exceptions
+        diagnose=debug,  # Add exception variable values for debugging
     )
 
-    logger.info("Logger has been successfully configured.")
+    logger.info(f"Logger has been successfully configured ({mode} mode).")
     return logger
 
 
+def _truncate(text: str) -> str:
+    max_chars = _settings["max_chars"]
+    if max_chars is None or len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [{len(text) - max_chars} more characters]"
+
+
+def debug_enabled(module: str) -> bool:
+    """Whether DEBUG records of `module` (a module __name__) are logged."""
+    enabled = _debug_modules.get(module)
+    if enabled is None:
+        levels = _settings["levels"]
+        name = module
+        while name not in levels:
+            name = name.rpartition(".")[0]
+        enabled = _debug_modules[module] = (
+            logger.level(levels[name]).no <= logger.level("DEBUG").no
+            and _settings["sample_rate"] > 0
+        )
+    return enabled
+
+
+def debug_payload(label: str, payload: Callable[[], Any]):
+    """
+    Logs a large debug payload (documents, prompts, graph state) for a
+    LOG_DEBUG_SAMPLE_RATE fraction of the calls, cut to LOG_PAYLOAD_MAX_CHARS.
+    `payload` is only called, and its result only formatted, when the record
+    is logged.
+    """
+    if not debug_enabled(sys._getframe(1).f_globals["__name__"]):
+        return
+    sample_rate = _settings["sample_rate"]
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return
+    logger.opt(lazy=True, depth=1).debug(
+        "{}: {}", lambda: label, lambda: _truncate(str(payload()))
+    )
+
+
 # Create a logger instance to be imported by other modules
 log = setup_logger()
@@ -1,18 +1,47 @@
+from collections import deque
 from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
 from typing import List, Dict, Any
 from src.common.logger import log
 from src.common import config
 from langchain.docstore.document import Document
+import hashlib
 import json
 import time
 
 
 @contextmanager
 def measure_time(label, log):
-    start = time.time()
-    yield
-    end = time.time()
-    log.info(f"{label} took {end - start:.2f} seconds")
+    """Logs the duration of the block; the yielded dict receives it as "seconds"."""
+    timing = {}
+    start = time.perf_counter()
+    yield timing
+    timing["seconds"] = time.perf_counter() - start
+    log.info(f"{label} took {timing['seconds']:.2f} seconds")
+
+
+def lazy(factory):
+    """
+    Decorator for a component factory without arguments: the component is
+    built on the first call, once even when several threads ask for it at the
+    same time, and returned by every later call. The wrapper has `loaded()`,
+    and `cache_clear()` to build it again on the next call.
+    """
+    lock = Lock()
+    instance = []
+
+    @wraps(factory)
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    get.loaded = lambda: bool(instance)
+    get.cache_clear = instance.clear
+    return get
 
 
 def load_json_from_file(fp: str) -> List[Dict[str, Any]]:
@@ -28,22 +57,44 @@ def load_json_from_file(fp: str) -> List[Dict[str, Any]]:
         return []
 
 
+def review_id(review: dict) -> str:
+    """
+    Stable id of a review: a SHA-256 of its stored fields. Identical reviews
+    share an id, and any edit to a review gives it a new one.
+    """
+    content = json.dumps(
+        {
+            "review_detail": review.get("review_detail", ""),
+            "author": review.get("author", "Unknown"),
+            "review_date": review.get("review_date", "Unknown"),
+            "rating": review.get("rating", 0),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
 def convert_to_documents(data: list[dict]):
     if not data:
         log.error("No data found. Exiting.")
         raise ValueError("No dataset found.")
 
-    documents = [
-        Document(
-            page_content=d.get("review_detail", ""),
-            metadata={
-                "author": d.get("author", "Unknown"),
-                "review_date": d.get("review_date", "Unknown"),
-                "rating": d.get("rating", 0),
-            },
+    documents = []
+    for d in data:
+        doc_id = review_id(d)
+        documents.append(
+            Document(
+                id=doc_id,
+                page_content=d.get("review_detail", ""),
+                metadata={
+                    "review_id": doc_id,
+                    "author": d.get("author", "Unknown"),
+                    "review_date": d.get("review_date", "Unknown"),
+                    "rating": d.get("rating", 0),
+                },
+            )
         )
-        for d in data
-    ]
     return documents
 
 
@@ -53,3 +104,50 @@ def load_reviews_documents():
     reviews_docs = convert_to_documents(reviews)
     log.info(f"Total reveiws documents: {len(reviews_docs)}")
     return reviews_docs
+
+
+class LatencyStats:
+    """Thread-safe latency, timeout and error counters per named operation."""
+
+    WINDOW = 1000  # latencies kept per operation for the percentiles
+
+    def __init__(self, names: List[str]):
+        self._lock = Lock()
+        self._stats = {
+            name: {
+                "calls": 0,
+                "timeouts": 0,
+                "errors": 0,
+                "latencies_ms": deque(maxlen=self.WINDOW),
+            }
+            for name in names
+        }
+
+    def record(self, name: str, latency_ms: float, outcome: str = "ok"):
+        with self._lock:
+            stats = self._stats[name]
+            stats["calls"] += 1
+            if outcome != "ok":
+                stats[outcome] += 1
+            stats["latencies_ms"].append(latency_ms)
+
+    def summary(self) -> Dict[str, dict]:
+        with self._lock:
+            summary = {}
+            for name, stats in self._stats.items():
+                latencies = sorted(stats["latencies_ms"])
+                summary[name] = {
+                    "calls": stats["calls"],
+                    "timeouts": stats["timeouts"],
+                    "errors": stats["errors"],
+                    "last_ms": None,
+                    "p50_ms": None,
+                    "p95_ms": None,
+                }
+                if latencies:
+                    summary[name].update(
+                        last_ms=stats["latencies_ms"][-1],
+                        p50_ms=latencies[len(latencies) // 2],
+                        p95_ms=latencies[int(len(latencies) * 0.95)],
+                    )
+            return summary
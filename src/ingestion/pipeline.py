@@ -0,0 +1,295 @@
+from collections import deque
+from itertools import islice
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from src.common import config
+from src.common.logger import log
+from src.common.utils import convert_to_documents
+from src.rag.embedding_cache import EmbeddingCache
+from src.rag.embeddings import build_hf_embeddings
+from src.rag.metadata_index import chroma_metadata
+import chromadb
+import json
+import multiprocessing
+import numpy as np
+import os
+import time
+
+
+def iter_json_array(fp: str, block_size: int = 1 << 20) -> Iterator[dict]:
+    """
+    Yields the items of a top-level JSON array one at a time, reading the file
+    in blocks, so memory does not grow with the file size.
+    """
+    decoder = json.JSONDecoder()
+    with open(fp, encoding="utf-8") as f:
+        buffer, eof, started = "", False, False
+        while True:
+            position = 0
+            while True:
+                # Skip whitespace and separators up to the next item
+                while position < len(buffer) and buffer[position] in " \t\r\n,[":
+                    started = started or buffer[position] == "["
+                    position += 1
+                if position < len(buffer) and buffer[position] == "]":
+                    return
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        if buffer[position:].strip():
+                            raise
+                        return
+                    break  # The item continues in the next block
+                if not started:
+                    raise ValueError(f"{fp} does not contain a JSON array")
+                yield item
+                position = end
+            block = f.read(block_size)
+            eof = not block
+            buffer = buffer[position:] + block
+
+
+def iter_review_documents(fp: str) -> Iterator[Document]:
+    """Streams the reviews file as Documents, skipping repeated reviews."""
+    seen = set()
+    duplicates = 0
+    for review in iter_json_array(fp):
+        doc = convert_to_documents([review])[0]
+        if doc.id in seen:
+            duplicates += 1
+            continue
+        seen.add(doc.id)
+        yield doc
+    if duplicates:
+        log.info(f"Skipped {duplicates} duplicate reviews")
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def open_collection(persist_directory: str):
+    """
+    The Chroma collection used by the app's vector store. The client is
+    created with the same settings as langchain's Chroma, so both can be used
+    in one process.
+    """
+    settings = chromadb.config.Settings(is_persistent=True)
+    settings.persist_directory = persist_directory
+    client = chromadb.Client(settings)
+    return client.get_or_create_collection(Chroma._LANGCHAIN_DEFAULT_COLLECTION_NAME)
+
+
+def update_metadata(documents: Iterable[Document], collection, batch_size: int) -> int:
+    """
+    Rewrites the Chroma metadata of already stored `documents` (see
+    chroma_metadata) without embedding them again; returns how many.
+    """
+    updated = 0
+    for batch in batched(documents, batch_size):
+        collection.update(
+            ids=[doc.id for doc in batch],
+            metadatas=[chroma_metadata(doc.metadata) for doc in batch],
+        )
+        updated += len(batch)
+    return updated
+
+
+def default_embeddings_factory():
+    """The ingestion embedding model, built inside each worker process."""
+    return build_hf_embeddings(batch_size=config.INGEST_ENCODE_BATCH_SIZE)
+
+
+# Per-process embedding model of the pool workers
+_worker_embeddings = None
+
+
+def _init_worker(embeddings_factory: Callable, torch_threads: Optional[int]):
+    global _worker_embeddings
+    if torch_threads:
+        try:
+            import torch
+
+            # Avoid oversubscribing the CPU with one torch pool per worker
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+    _worker_embeddings = embeddings_factory()
+
+
+def _embed_batch(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_embeddings.embed_documents(texts), dtype=np.float32)
+
+
+class IngestCheckpoint:
+    """
+    Number of documents of an ingestion run already committed to Chroma.
+
+    A run is identified by its source file and the ids it diffs against, so a
+    checkpoint is only resumed by the same run restarted after a crash.
+    """
+
+    def __init__(self, path: str, run_key: dict):
+        self.path = path
+        self.run_key = run_key
+        self.committed = 0
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("run_key") == run_key:
+                self.committed = state["committed"]
+
+    @staticmethod
+    def run_key_for(source_path: str, stored_version: str) -> dict:
+        stat = os.stat(source_path)
+        return {
+            "source": os.path.abspath(source_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "stored_version": stored_version,
+        }
+
+    def commit(self, committed: int):
+        self.committed = committed
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"run_key": self.run_key, "committed": committed}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class EmbeddingPipeline:
+    """
+    Streams documents through batched embedding and into Chroma.
+
+    Batches are encoded by a pool of worker processes, each with its own copy
+    of the model; with `workers=0` they are encoded on one background thread.
+    Encoded batches are written to Chroma in order by the calling thread while
+    the next ones are being encoded. At most `max_in_flight` batches are held
+    in memory, so peak memory does not depend on the corpus size.
+
+    With an EmbeddingCache, the calling thread serves cached vectors and only
+    sends the misses to the workers, then caches what they computed.
+    """
+
+    def __init__(
+        self,
+        embeddings_factory: Optional[Callable] = None,
+        batch_size: int = None,
+        workers: int = None,
+        max_in_flight: int = None,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.embeddings_factory = embeddings_factory or default_embeddings_factory
+        self.cache = cache
+        self.batch_size = batch_size or config.INGEST_BATCH_SIZE
+        self.workers = config.INGEST_WORKERS if workers is None else workers
+        self.max_in_flight = max_in_flight or max(2, 2 * self.workers)
+
+    def _executor(self) -> Executor:
+        if self.workers > 0:
+            torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+            # Forking would copy the ingest process's Chroma and logging
+            # threads in an undefined state
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.embeddings_factory, torch_threads),
+            )
+        return ThreadPoolExecutor(
+            max_workers=1,
+            initializer=_init_worker,
+            initargs=(self.embeddings_factory, None),
+        )
+
+    def run(
+        self,
+        documents: Iterable[Document],
+        collection,
+        checkpoint: Optional[IngestCheckpoint] = None,
+    ) -> int:
+        """
+        Embeds and upserts `documents`; returns how many were written. With a
+        checkpoint, documents committed by an interrupted run are skipped.
+        """
+        skip = checkpoint.committed if checkpoint else 0
+        if skip:
+            log.info(f"Resuming ingestion after {skip} committed documents")
+        committed, written = skip, 0
+        progress = Progress()
+        pending = deque()
+
+        def commit_oldest():
+            nonlocal committed, written
+            batch, vectors, future = pending.popleft()
+            if future is not None:
+                missing = [i for i, vector in enumerate(vectors) if vector is None]
+                computed = future.result()
+                for i, vector in zip(missing, computed):
+                    vectors[i] = vector
+                if self.cache:
+                    self.cache.put_many([batch[i].page_content for i in missing], computed)
+            collection.upsert(
+                ids=[doc.id for doc in batch],
+                embeddings=np.asarray(vectors, dtype=np.float32),
+                documents=[doc.page_content for doc in batch],
+                metadatas=[chroma_metadata(doc.metadata) for doc in batch],
+            )
+            committed += len(batch)
+            written += len(batch)
+            if checkpoint:
+                checkpoint.commit(committed)
+            progress.update(written)
+
+        with self._executor() as executor:
+            for batch in batched(islice(documents, skip, None), self.batch_size):
+                if len(pending) >= self.max_in_flight:
+                    commit_oldest()
+                texts = [doc.page_content for doc in batch]
+                vectors = self.cache.get_many(texts) if self.cache else [None] * len(texts)
+                missing = [text for text, vector in zip(texts, vectors) if vector is None]
+                future = executor.submit(_embed_batch, missing) if missing else None
+                pending.append((batch, vectors, future))
+            while pending:
+                commit_oldest()
+
+        progress.update(written, final=True)
+        if self.cache:
+            self.cache.flush()
+            log.info(f"Embedding cache: {self.cache.stats()}")
+        return written
+
+
+class Progress:
+    """Logs the ingestion throughput at most every few seconds."""
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self.start = self.last_report = time.perf_counter()
+
+    def update(self, count: int, final: bool = False):
+        now = time.perf_counter()
+        if not final and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        elapsed = now - self.start
+        rate = count / elapsed if elapsed > 0 else 0.0
+        log.info(
+            f"{'Embedded' if final else 'Embedding'}: {count} documents "
+            f"in {elapsed:.1f} s ({rate:.1f} docs/sec)"
+        )
@@ -0,0 +1,306 @@
+from typing import Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from src.common import config
+from src.common.logger import log
+from src.rag.chain import LcGeneration
+from src.rag.dense_index import DenseIndexVectorStore
+from src.rag.embedding_cache import embed_queries
+from src.rag.embeddings import HfEmbedder
+from src.rag.fusion import ScoreFusion, get_fusion, scored_results, with_score
+from src.rag.llms import load_llm
+from src.rag.metadata_index import MetadataFilter, MetadataIndex, load_metadata_index
+from src.rag.retriever import Bm25Retriever
+from src.rag.vector_stores import load_vector_store
+import asyncio
+import json
+import os
+import time
+
+
+def read_queries(fp: str) -> Iterator[dict]:
+    """
+    Yields {"id", "query"} records of a JSONL file. Lines may hold a bare
+    JSON string; records without an id are numbered by line.
+    """
+    with open(fp, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"query": record}
+            record.setdefault("id", str(line_number))
+            yield record
+
+
+def answered_ids(fp: str) -> set:
+    """
+    Ids already answered in an output file. Failed queries are not counted,
+    so a rerun retries them, and a line cut short by a crash is ignored.
+    """
+    if not os.path.exists(fp):
+        return set()
+    ids = set()
+    with open(fp, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if result.get("error") is None:
+                ids.add(result["id"])
+    return ids
+
+
+def end_partial_line(fp: str):
+    """Ends a last line cut short by a crash, so appended results stay readable."""
+    if not os.path.exists(fp) or os.path.getsize(fp) == 0:
+        return
+    with open(fp, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+class BatchQuestionAnswering:
+    """
+    Answers a JSONL file of questions offline.
+
+    Questions are taken `batch_size` at a time: each batch is embedded in one
+    call, searched with one dense matrix product (one Chroma query) and one
+    sparse BM25 matrix product, and the two lists of each question are fused.
+    With a `metadata_index`, rating and date constraints are applied as in
+    chat: questions with a filter are searched densely one by one, on the
+    reviews passing it.
+    Answers are generated concurrently, at most `concurrency` LLM calls in
+    flight and `requests_per_second` started, while the next batch is
+    retrieved. Results are appended to the output JSONL as they complete,
+    with per-question timings; a rerun skips the questions already answered.
+    """
+
+    def __init__(
+        self,
+        generator: LcGeneration,
+        embeddings,
+        vector_store,
+        sparse_retriever,
+        metadata_index: Optional[MetadataIndex] = None,
+        fusion: Optional[ScoreFusion] = None,
+        dense_k: int = config.DENSE_RETRIEVED_DOCUMENTS,
+        final_k: int = config.FUSED_RETRIEVED_DOCUMENTS,
+        batch_size: int = config.BATCH_QA_BATCH_SIZE,
+        concurrency: int = config.BATCH_QA_CONCURRENCY,
+        requests_per_second: Optional[float] = config.BATCH_QA_REQUESTS_PER_SECOND,
+    ):
+        self.generator = generator
+        self.embeddings = embeddings
+        self.vector_store = vector_store
+        self.sparse_retriever = sparse_retriever
+        self.metadata_index = metadata_index
+        self.fusion = fusion or get_fusion(
+            config.FUSION_METHOD, config.ENSEMBLE_RETRIEVER_WEIGHTS
+        )
+        self.dense_k = dense_k
+        self.final_k = final_k
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.rate_limiter = (
+            InMemoryRateLimiter(
+                requests_per_second=requests_per_second,
+                max_bucket_size=max(1, concurrency),
+            )
+            if requests_per_second
+            else None
+        )
+
+    @classmethod
+    def from_config(cls, llm_type: str = config.LLM_TYPE, **kwargs) -> "BatchQuestionAnswering":
+        sparse_retriever = Bm25Retriever().get_retriever()
+        return cls(
+            # Documents are always passed in, so the chain's retriever is unused
+            generator=LcGeneration(retriever=sparse_retriever, llm=load_llm(llm_type)),
+            embeddings=HfEmbedder().get_embeder(),
+            vector_store=load_vector_store(),
+            sparse_retriever=sparse_retriever,
+            metadata_index=(
+                load_metadata_index(config.METADATA_INDEX_DIRECTORY)
+                if config.METADATA_FILTERING
+                else None
+            ),
+            **kwargs,
+        )
+
+    def _search_vectors(
+        self,
+        vectors: List[List[float]],
+        metadata_filter: Optional[MetadataFilter] = None,
+        rows=None,
+    ) -> List[List[Document]]:
+        """Dense results of `vectors`, all restricted by the same filter."""
+        if isinstance(self.vector_store, DenseIndexVectorStore):
+            if rows is None:
+                results = self.vector_store.similarity_search_with_score_batch_by_vector(
+                    vectors, self.dense_k
+                )
+            else:
+                results = [
+                    self.vector_store.similarity_search_with_score_by_vector(
+                        vector, self.dense_k, rows
+                    )
+                    for vector in vectors
+                ]
+            return [[with_score(doc, score) for doc, score in row] for row in results]
+        result = self.vector_store._collection.query(
+            query_embeddings=vectors,
+            n_results=self.dense_k,
+            where=(
+                self.metadata_index.where_clause(metadata_filter)
+                if metadata_filter is not None
+                else None
+            ),
+            include=["documents", "metadatas", "distances"],
+        )
+        relevance = self.vector_store._select_relevance_score_fn()
+        return [
+            [
+                with_score(
+                    Document(page_content=text, metadata=metadata or {}),
+                    relevance(distance),
+                )
+                for text, metadata, distance in zip(*row)
+            ]
+            for row in zip(result["documents"], result["metadatas"], result["distances"])
+        ]
+
+    def _dense_search(
+        self, vectors: List[List[float]], restrictions: list
+    ) -> List[List[Document]]:
+        """
+        Dense results of each query vector: the unfiltered ones in one
+        search, the ones with a (filter, rows) restriction one by one.
+        """
+        results = [None] * len(vectors)
+        unfiltered = [
+            i for i, (metadata_filter, _) in enumerate(restrictions) if metadata_filter is None
+        ]
+        if unfiltered:
+            found = self._search_vectors([vectors[i] for i in unfiltered])
+            for i, docs in zip(unfiltered, found):
+                results[i] = docs
+        for i, (metadata_filter, rows) in enumerate(restrictions):
+            if metadata_filter is not None:
+                results[i] = self._search_vectors([vectors[i]], metadata_filter, rows)[0]
+        return results
+
+    def retrieve_batch(self, queries: List[str]) -> Tuple[List[List[Document]], dict]:
+        """Fused documents of each query, and the batch's timings in ms."""
+        start = time.perf_counter()
+        restricted = [
+            self.metadata_index.restrict(query)
+            if self.metadata_index is not None
+            else (query, None, None)
+            for query in queries
+        ]
+        # Like the chat's dense retriever, embeds what is left of the query
+        vectors = embed_queries(self.embeddings, [query for query, _, _ in restricted])
+        embedded = time.perf_counter()
+        dense = self._dense_search(
+            vectors, [(metadata_filter, rows) for _, metadata_filter, rows in restricted]
+        )
+        sparse = self.sparse_retriever.search_batch(queries)
+        documents = [
+            self.fusion.fuse(scored_results([dense_docs, sparse_docs]), self.final_k)
+            for dense_docs, sparse_docs in zip(dense, sparse)
+        ]
+        retrieved = time.perf_counter()
+        return documents, {
+            "embedding_ms": (embedded - start) * 1000,
+            "retrieval_ms": (retrieved - embedded) * 1000,
+        }
+
+    async def _answer(
+        self, record: dict, documents: List[Document], timings: dict, semaphore, out
+    ) -> bool:
+        async with semaphore:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire()
+            start = time.perf_counter()
+            try:
+                answer, error = (
+                    await self.generator.ainvoke(record["query"], documents=documents),
+                    None,
+                )
+            except Exception as e:
+                log.error(f"Failed to answer query {record['id']}: {e}")
+                answer, error = None, repr(e)
+            generation_ms = (time.perf_counter() - start) * 1000
+        result = {
+            "id": record["id"],
+            "query": record["query"],
+            "answer": answer,
+            "review_ids": [doc.metadata.get("review_id") for doc in documents],
+            "timings_ms": {
+                **{name: round(ms, 2) for name, ms in timings.items()},
+                "generation_ms": round(generation_ms, 2),
+            },
+            "error": error,
+        }
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+        return error is None
+
+    async def arun(self, input_path: str, output_path: str) -> dict:
+        done = answered_ids(output_path)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending, outcomes = set(), []
+        start = time.perf_counter()
+
+        def batches():
+            batch = []
+            for record in read_queries(input_path):
+                if record["id"] in done:
+                    continue
+                batch.append(record)
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        end_partial_line(output_path)
+        with open(output_path, "a", encoding="utf-8") as out:
+            for batch in batches():
+                queries = [record["query"] for record in batch]
+                # Retrieval runs on a thread, so earlier answers keep streaming
+                documents, timings = await asyncio.to_thread(self.retrieve_batch, queries)
+                # Batch timings, shared out per query
+                per_query = {name: ms / len(batch) for name, ms in timings.items()}
+                for record, docs in zip(batch, documents):
+                    pending.add(
+                        asyncio.create_task(
+                            self._answer(record, docs, per_query, semaphore, out)
+                        )
+                    )
+                # At most about two batches are held in memory
+                while len(pending) > self.batch_size:
+                    finished, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    outcomes.extend(task.result() for task in finished)
+            if pending:
+                outcomes.extend(await asyncio.gather(*pending))
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            "answered": sum(outcomes),
+            "failed": len(outcomes) - sum(outcomes),
+            "skipped": len(done),
+            "seconds": round(elapsed, 2),
+            "queries_per_second": round(len(outcomes) / elapsed, 2) if elapsed else 0.0,
+        }
+        log.info(f"Batch question answering finished: {summary}")
+        return summary
+
+    def run(self, input_path: str, output_path: str) -> dict:
+        return asyncio.run(self.arun(input_path, output_path))
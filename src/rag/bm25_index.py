@@ -0,0 +1,424 @@
+from array import array
+from collections import Counter
+from threading import Lock
+from typing import Callable, Iterable, List, Optional
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+from scipy.sparse import csr_matrix
+from src.common.logger import log
+from src.common.utils import measure_time
+from src.rag.docstore import DocStore, InMemoryDocStore, replace_directory
+from src.rag.fusion import with_score
+from src.rag.metadata_index import MetadataIndex, load_metadata_index
+import json
+import numpy as np
+import os
+import shutil
+
+
+def default_preprocessing_func(text: str) -> List[str]:
+    # Same tokenization as langchain's BM25Retriever
+    return text.split()
+
+
+def _bm25_weights(arrays: dict, meta: dict, chunk_size: int = 2**22) -> np.ndarray:
+    """
+    BM25 weight idf * tf * (k1 + 1) / (tf + k1 * length_norm) of every posting,
+    computed in chunks to bound the float64 temporaries.
+    """
+    k1, b, avgdl = meta["k1"], meta["b"], meta["avgdl"]
+    indptr = arrays["postings_indptr"]
+    doc_ids = arrays["postings_doc_ids"]
+    weights = np.zeros(len(doc_ids), dtype=np.float32)
+    if meta["n_docs"] == 0:
+        return weights
+    length_norm = k1 * (1 - b + b * np.asarray(arrays["doc_lengths"], np.float64) / avgdl)
+    for start in range(0, len(doc_ids), chunk_size):
+        positions = np.arange(start, min(start + chunk_size, len(doc_ids)))
+        term_ids = np.searchsorted(indptr, positions, side="right") - 1
+        tfs = np.asarray(arrays["postings_tfs"][positions], dtype=np.float64)
+        weights[positions] = (
+            arrays["idf"][term_ids]
+            * tfs
+            * (k1 + 1)
+            / (tfs + length_norm[doc_ids[positions]])
+        )
+    return weights
+
+
+class Bm25Index:
+    """
+    Okapi BM25 index persisted as memory-mappable NumPy arrays.
+
+    Files in the index directory:
+        terms.bin / term_offsets.npy  sorted vocabulary (UTF-8 blob + offsets)
+        postings_indptr.npy           per-term slice into the postings arrays
+        postings_doc_ids.npy          document ids, grouped by term
+        postings_tfs.npy              term frequency of each posting
+        postings_weights.npy          precomputed BM25 weight of each posting
+        doc_lengths.npy               number of tokens per document
+        idf.npy                       per-term IDF (float64)
+        meta.json                     k1, b, avgdl and corpus size
+
+    The postings form a CSR term x document matrix of BM25 weights, so a query
+    is scored with one sparse vector-matrix product over the postings of its
+    terms, and many queries with one sparse matrix product.
+
+    Scoring matches `rank_bm25.BM25Okapi` (the engine behind langchain's
+    BM25Retriever), including its epsilon floor for negative IDFs. Document ids
+    are positions in the DocStore written alongside the index.
+    """
+
+    ARRAY_NAMES = [
+        "term_offsets",
+        "postings_indptr",
+        "postings_doc_ids",
+        "postings_tfs",
+        "postings_weights",
+        "doc_lengths",
+        "idf",
+    ]
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.term_blob = arrays["terms"]
+        self.term_offsets = arrays["term_offsets"]
+        self.postings_indptr = arrays["postings_indptr"]
+        self.postings_doc_ids = arrays["postings_doc_ids"]
+        self.postings_tfs = arrays["postings_tfs"]
+        self.doc_lengths = arrays["doc_lengths"]
+        self.idf = arrays["idf"]
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self.avgdl = meta["avgdl"]
+        self.n_docs = meta["n_docs"]
+        self.postings_weights = arrays.get("postings_weights")
+        if self.postings_weights is None:
+            log.warning("BM25 index has no precomputed weights; computing them.")
+            self.postings_weights = _bm25_weights(arrays, meta)
+        # Wraps the (possibly memory-mapped) arrays without copying them
+        self.matrix = csr_matrix(
+            (self.postings_weights, self.postings_doc_ids, self.postings_indptr),
+            shape=(self.n_terms, self.n_docs),
+            copy=False,
+        )
+
+    @property
+    def n_terms(self) -> int:
+        return len(self.term_offsets) - 1
+
+    def _term(self, term_id: int) -> str:
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return self.term_blob[start:end].tobytes().decode("utf-8")
+
+    def term_id(self, term: str) -> Optional[int]:
+        """Binary search in the sorted, memory-mapped vocabulary."""
+        low, high = 0, self.n_terms
+        while low < high:
+            mid = (low + high) // 2
+            if self._term(mid) < term:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.n_terms and self._term(low) == term:
+            return low
+        return None
+
+    def query_matrix(self, queries: List[List[str]]) -> csr_matrix:
+        """
+        Sparse query x term matrix of token counts. A token repeated in the
+        query counts once per occurrence, like in rank_bm25.
+        """
+        indptr, term_ids, counts = [0], [], []
+        for tokens in queries:
+            query_terms = Counter(
+                term_id
+                for term_id in map(self.term_id, tokens)
+                if term_id is not None
+            )
+            term_ids.extend(query_terms.keys())
+            counts.extend(query_terms.values())
+            indptr.append(len(term_ids))
+        return csr_matrix(
+            (
+                np.array(counts, dtype=np.float32),
+                np.array(term_ids, dtype=self.postings_indptr.dtype),
+                np.array(indptr, dtype=self.postings_indptr.dtype),
+            ),
+            shape=(len(queries), self.n_terms),
+        )
+
+    def score_batch(self, queries: List[List[str]]) -> csr_matrix:
+        """
+        Scores every query in one sparse matrix product. Row i holds the BM25
+        scores of the documents matching at least one term of query i.
+        """
+        return (self.query_matrix(queries) @ self.matrix).tocsr()
+
+    def get_scores(self, query_tokens: List[str]) -> np.ndarray:
+        """BM25 score of every document for the tokenized query."""
+        return self.score_batch([query_tokens]).toarray()[0].astype(np.float64)
+
+    @staticmethod
+    def _top_k_row(
+        doc_ids: np.ndarray, scores: np.ndarray, k: int, mask: Optional[np.ndarray] = None
+    ) -> tuple:
+        if mask is not None:
+            keep = mask[doc_ids]
+            doc_ids, scores = doc_ids[keep], scores[keep]
+        if len(scores) > k:
+            selected = np.argpartition(-scores, k - 1)[:k]
+            doc_ids, scores = doc_ids[selected], scores[selected]
+        # Highest score first; ties go to the higher document id, like the
+        # reversed argsort of rank_bm25
+        order = np.lexsort((-doc_ids, -scores))
+        return doc_ids[order], scores[order]
+
+    def top_k_batch(
+        self,
+        queries: List[List[str]],
+        k: int,
+        mask: Optional[np.ndarray] = None,
+        masks: Optional[List[Optional[np.ndarray]]] = None,
+    ) -> List[tuple]:
+        """
+        (doc_ids, scores) of the best `k` documents for each query. Documents
+        sharing no term with a query are never returned, so fewer than `k`
+        results come back for queries with few matches. With a boolean `mask`
+        over the documents, only the matches it selects compete for the top k;
+        `masks` gives each query its own mask (or None).
+        """
+        scores = self.score_batch(queries)
+        if masks is None:
+            masks = [mask] * len(queries)
+        results = []
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            results.append(
+                self._top_k_row(
+                    scores.indices[start:end], scores.data[start:end], k, masks[row]
+                )
+            )
+        return results
+
+    def top_k(
+        self, query_tokens: List[str], k: int, mask: Optional[np.ndarray] = None
+    ) -> List[int]:
+        doc_ids, _ = self.top_k_batch([query_tokens], k, mask)[0]
+        return doc_ids.tolist()
+
+    @classmethod
+    def build(
+        cls,
+        texts: Iterable[str],
+        preprocess_func: Callable[[str], List[str]] = default_preprocessing_func,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> "Bm25Index":
+        # Postings are collected in compact arrays rather than per-document
+        # dicts, so a million reviews can be indexed in a few GB
+        vocabulary = {}
+        posting_terms, posting_tfs = array("q"), array("f")
+        doc_lengths, doc_unique_terms = array("f"), array("q")
+        for text in texts:
+            tokens = preprocess_func(text)
+            term_counts = Counter(tokens)
+            doc_lengths.append(len(tokens))
+            doc_unique_terms.append(len(term_counts))
+            for term, count in term_counts.items():
+                posting_terms.append(vocabulary.setdefault(term, len(vocabulary)))
+                posting_tfs.append(count)
+
+        terms = sorted(vocabulary)
+        sorted_term_ids = np.empty(len(terms), dtype=np.int64)
+        sorted_term_ids[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+        del vocabulary
+        encoded_terms = [term.encode("utf-8") for term in terms]
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        term_offsets[1:] = np.cumsum([len(t) for t in encoded_terms])
+
+        n_docs = len(doc_lengths)
+        doc_lengths = np.frombuffer(doc_lengths, dtype=np.float32)
+        posting_terms = sorted_term_ids[np.frombuffer(posting_terms, dtype=np.int64)]
+        # scipy needs the same dtype for indptr and indices; int32 halves the
+        # size of the postings as long as they fit
+        index_dtype = np.int32 if len(posting_terms) < 2**31 else np.int64
+        posting_docs = np.repeat(
+            np.arange(n_docs, dtype=index_dtype),
+            np.frombuffer(doc_unique_terms, dtype=np.int64),
+        )
+        # A stable sort keeps the documents of each term in ascending order
+        order = np.argsort(posting_terms, kind="stable")
+        postings_doc_ids = posting_docs[order]
+        postings_tfs = np.frombuffer(posting_tfs, dtype=np.float32)[order]
+        postings_indptr = np.zeros(len(terms) + 1, dtype=index_dtype)
+        postings_indptr[1:] = np.cumsum(np.bincount(posting_terms, minlength=len(terms)))
+        del posting_terms, posting_docs, order
+
+        # IDF exactly as rank_bm25.BM25Okapi computes it
+        doc_freqs = np.diff(postings_indptr).astype(np.float64)
+        idf = np.log(n_docs - doc_freqs + 0.5) - np.log(doc_freqs + 0.5)
+        average_idf = idf.mean() if len(idf) else 0.0
+        idf[idf < 0] = epsilon * average_idf
+
+        arrays = {
+            "terms": np.frombuffer(b"".join(encoded_terms), dtype=np.uint8),
+            "term_offsets": term_offsets,
+            "postings_indptr": postings_indptr,
+            "postings_doc_ids": postings_doc_ids,
+            "postings_tfs": postings_tfs,
+            "doc_lengths": doc_lengths,
+            "idf": idf,
+        }
+        meta = {
+            "k1": k1,
+            "b": b,
+            "avgdl": float(doc_lengths.sum() / n_docs) if n_docs else 0.0,
+            "n_docs": n_docs,
+        }
+        arrays["postings_weights"] = _bm25_weights(arrays, meta)
+        return cls(arrays, meta)
+
+    def save(self, directory: str):
+        """Writes the index to `directory`, replacing it atomically."""
+        tmp_dir = f"{directory}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        with open(os.path.join(tmp_dir, "terms.bin"), "wb") as f:
+            f.write(np.asarray(self.term_blob).tobytes())
+        for name in self.ARRAY_NAMES:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(
+                {"k1": self.k1, "b": self.b, "avgdl": self.avgdl, "n_docs": self.n_docs},
+                f,
+            )
+        replace_directory(tmp_dir, directory)
+
+    @classmethod
+    def load(cls, directory: str) -> "Bm25Index":
+        """Memory-maps the index; nothing is read until it is queried."""
+        terms_path = os.path.join(directory, "terms.bin")
+        arrays = {
+            "terms": (
+                np.memmap(terms_path, dtype=np.uint8, mode="r")
+                if os.path.getsize(terms_path)
+                else np.zeros(0, dtype=np.uint8)
+            )
+        }
+        for name in cls.ARRAY_NAMES:
+            path = os.path.join(directory, f"{name}.npy")
+            # Indexes written before the weights were precomputed lack them
+            if os.path.exists(path):
+                arrays[name] = np.load(path, mmap_mode="r")
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(arrays, meta)
+
+
+class Bm25IndexRetriever(BaseRetriever):
+    """
+    Sparse retriever over the persisted BM25 index and DocStore.
+
+    The index and the document store are opened lazily on the first query.
+    `from_documents` builds both in memory instead.
+
+    With a metadata index, rating and date constraints in the query ("5-star",
+    "reviews from 2024", ...) restrict the candidates to the matching reviews;
+    a filter no review passes is ignored.
+    """
+
+    index_directory: Optional[str] = None
+    docstore_directory: Optional[str] = None
+    metadata_index_directory: Optional[str] = None
+    k: int = 4
+    preprocess_func: Callable[[str], List[str]] = default_preprocessing_func
+
+    _index: Optional[Bm25Index] = PrivateAttr(default=None)
+    _docstore: Optional[DocStore] = PrivateAttr(default=None)
+    _metadata_index: Optional[MetadataIndex] = PrivateAttr(default=None)
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    @classmethod
+    def from_documents(
+        cls, documents: List[Document], metadata_filtering: bool = True, **kwargs
+    ) -> "Bm25IndexRetriever":
+        retriever = cls(**kwargs)
+        with measure_time("BM25 in-memory index build", log):
+            retriever._index = Bm25Index.build(
+                [doc.page_content for doc in documents], retriever.preprocess_func
+            )
+        retriever._docstore = InMemoryDocStore(documents)
+        if metadata_filtering:
+            retriever._metadata_index = MetadataIndex.build(documents)
+        return retriever
+
+    def _load(self):
+        with self._lock:
+            if self._index is None:
+                with measure_time("BM25 index loading", log):
+                    self._docstore = DocStore(self.docstore_directory)
+                    self._index = Bm25Index.load(self.index_directory)
+                    if self.metadata_index_directory is not None:
+                        self._metadata_index = load_metadata_index(
+                            self.metadata_index_directory
+                        )
+        return self._index, self._docstore
+
+    def _filter(self, query: str) -> tuple:
+        """
+        The query left for scoring, and the mask of its metadata filter (None
+        without a filter, or when no review passes it).
+        """
+        if self._metadata_index is None:
+            return query, None
+        query, _, positions = self._metadata_index.restrict(query)
+        if positions is None:
+            return query, None
+        mask = np.zeros(len(self._metadata_index), dtype=bool)
+        mask[positions] = True
+        return query, mask
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        index, docstore = self._load()
+        query, mask = self._filter(query)
+        doc_ids, scores = index.top_k_batch([self.preprocess_func(query)], self.k, mask)[0]
+        return [
+            with_score(doc, score)
+            for doc, score in zip(docstore.get_many(doc_ids), scores.tolist())
+        ]
+
+    def search_batch(self, queries: List[str]) -> List[List[Document]]:
+        """
+        Retrieves the top `k` documents of many queries with one matrix
+        product, each restricted by its own metadata filter as in `invoke`.
+        """
+        index, docstore = self._load()
+        queries, masks = zip(*map(self._filter, queries)) if queries else ((), ())
+        results = index.top_k_batch(
+            [self.preprocess_func(q) for q in queries], self.k, masks=list(masks)
+        )
+        return [
+            [
+                with_score(doc, score)
+                for doc, score in zip(docstore.get_many(doc_ids), scores.tolist())
+            ]
+            for doc_ids, scores in results
+        ]
+
+
+def build_bm25_index(documents: Iterable[Document], index_dir: str, docstore_dir: str):
+    """
+    Persists `documents` and their BM25 index for `Bm25IndexRetriever`. The
+    documents are streamed into the DocStore and read back from it, so they
+    are never all held in memory.
+    """
+    with measure_time("BM25 index build", log):
+        DocStore.write(documents, docstore_dir)
+        docstore = DocStore(docstore_dir)
+        Bm25Index.build(doc.page_content for doc in docstore).save(index_dir)
+    log.info(f"BM25 index written to {index_dir}")
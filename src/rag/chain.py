@@ -1,47 +1,85 @@
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.runnables import (
+    RunnableConfig,
+    RunnableLambda,
+    RunnablePassthrough,
+)
 from langchain_core.documents import Document
 from operator import itemgetter
-from typing import List
+from typing import AsyncIterator, Iterator, List
 from src.common import config
-from src.common.logger import log
+from src.common.logger import debug_enabled, debug_payload, log
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
 from src.common.utils import measure_time
+from src.rag.llms import load_llm
+from src.rag.context import ContextBuilder
 from abc import ABC, abstractmethod
 
 load_dotenv()
 
 
+# Returned when the LLM gives no answer
+FALLBACK_ANSWER = "Sorry I am unable to answer from Jira Knowledge base"
+
+
 class Generation(ABC):
     def __init__(self):
         super().__init__()
 
     @abstractmethod
-    def generate_response(self, query, retriever) -> str:
+    def invoke(self, query: str) -> str:
+        return
+
+    @abstractmethod
+    async def ainvoke(self, query: str) -> str:
+        return
+
+    @abstractmethod
+    def batch(self, queries: List[str]) -> List[str]:
+        return
+
+    @abstractmethod
+    def stream(self, query: str) -> Iterator[str]:
+        return
+
+    @abstractmethod
+    def astream(self, query: str) -> AsyncIterator[str]:
         return
 
 
 class LcGeneration(Generation):
-    """generation using Langchain module"""
+    """
+    generation using Langchain module.
 
-    def __init__(self):
+    The LLM client and the RAG chain are built once, when the generator is
+    created, and reused for every query.
+    """
+
+    def __init__(self, retriever, llm=None):
         super().__init__()
+        self.llm = llm if llm is not None else load_llm(config.LLM_TYPE)
+        self.context_builder = (
+            ContextBuilder.from_config() if config.CONTEXT_COMPRESSION else None
+        )
+        with measure_time("RAG chain initialization", log):
+            self.rag_chain = self.build_chain(retriever)
 
-    def format_retrieved_document(self, docs: List[Document]) -> str:
-        log.debug(f"--- Inspecting Retrieved Documents ---: {docs}")
-        formated_docs = []
-        for i, doc in enumerate(docs):
-            formated_doc = f"Document-{i}:\n"
-            for k, v in doc.metadata.items():
-                formated_doc += f"{k}: {v}\n"
-            formated_doc += f"**Review detail**:\n{doc.page_content}"
-            formated_docs.append(formated_doc)
-
-        formatted_str_docs = "\n\n".join(formated_docs)
-        log.debug(
-            f"Updated Document after merging metadata: {formatted_str_docs[:500]}..."
+    def format_retrieved_document(self, docs: List[Document], query: str = None) -> str:
+        """
+        With CONTEXT_COMPRESSION, the reviews' most `query`-relevant sentences
+        are packed into the context token budget under compact headers (see
+        ContextBuilder); otherwise every metadata key and the full review are
+        concatenated.
+        """
+        debug_payload("--- Inspecting Retrieved Documents ---", lambda: docs)
+        if self.context_builder is not None:
+            return self.context_builder.build(docs, query).text
+        formatted_str_docs = "\n\n".join(
+            ContextBuilder.original_format(i, doc) for i, doc in enumerate(docs)
+        )
+        debug_payload(
+            "Updated Document after merging metadata", lambda: formatted_str_docs
         )
         return formatted_str_docs
 
@@ -49,17 +87,18 @@ class LcGeneration(Generation):
         """
         A function to debug the final prompt object before it goes to the LLM.
         """
-        log.debug("--- Final Prompt Sent to LLM ---", prompt.to_string())
+        debug_payload("--- Final Prompt Sent to LLM ---", prompt.to_string)
         return prompt  # Pass the prompt through unchanged
 
-    def generate_response(self, query, retriever) -> str:
+    def build_chain(self, retriever):
         """
         Creates and returns the main RAG chain. This chain:
         1. Retrieves documents.
         2. Allows inspection of the Document objects.
-        3. Formats the documents' page_content into a single string.
+        3. Packs the documents' most relevant sentences into a single string.
         4. Assigns that string to the 'context' variable.
-        5. Logs the final prompt before sending it to the LLM.
+        5. Logs the final prompt before sending it to the LLM (when this
+           module's DEBUG records are logged).
         6. Invokes the LLM and parses the output.
 
         Args:
@@ -68,35 +107,80 @@ class LcGeneration(Generation):
         Returns:
             A runnable RAG chain.
         """
-        llm = ChatGoogleGenerativeAI(model=config.LLM_MODEL_NAME)
-
-        with measure_time("retrieve relevant documents", log):
-            retrieval_and_formatting_chain = (
-                itemgetter("input")
-                | retriever
-                | RunnableLambda(self.format_retrieved_document)
-            )
-
-        with measure_time("Chain initialization", log):
-            answer_generation_chain = (
-                config.RAG_GENERATION_PROMPT
-                | RunnableLambda(self._log_final_prompt)
-                | llm
-                | StrOutputParser()
+        retrieval_and_formatting_chain = RunnablePassthrough.assign(
+            documents=itemgetter("input") | retriever
+        ) | RunnableLambda(
+            lambda inputs: self.format_retrieved_document(
+                inputs["documents"], inputs["input"]
             )
+        )
 
-        with measure_time("Prompt Augment + generation", log):
-            rag_chain = (
-                RunnablePassthrough.assign(context=retrieval_and_formatting_chain)
-                | answer_generation_chain
-            )
+        # Also used on its own when the documents were retrieved beforehand.
+        # The prompt logging step is left out when this module's DEBUG
+        # records are not logged, as it costs a runnable call per request
+        prompt = config.RAG_GENERATION_PROMPT
+        if debug_enabled(__name__):
+            prompt = prompt | RunnableLambda(self._log_final_prompt)
+        self.answer_chain = prompt | self.llm | StrOutputParser()
+
+        rag_chain = (
+            RunnablePassthrough.assign(context=retrieval_and_formatting_chain)
+            | self.answer_chain
+        )
 
         log.info(
             "RAG chain with document formatting and prompt inspection created successfully."
         )
-        response = rag_chain.invoke({"input": query})
-        return (
-            response
-            if response and isinstance(response, str)
-            else "Sorry I am unable to answer from Jira Knowledge base"
-        )
+        return rag_chain
+
+    def _postprocess(self, response) -> str:
+        return response if response and isinstance(response, str) else FALLBACK_ANSWER
+
+    def _select_chain(self, query: str, documents: List[Document] = None):
+        """Uses already retrieved `documents` when given, otherwise retrieves."""
+        if documents is None:
+            return self.rag_chain, {"input": query}
+        context = self.format_retrieved_document(documents, query)
+        return self.answer_chain, {"input": query, "context": context}
+
+    def invoke(self, query: str, documents: List[Document] = None) -> str:
+        chain, inputs = self._select_chain(query, documents)
+        with measure_time("Retrieval + Prompt Augment + generation", log):
+            response = chain.invoke(inputs)
+        return self._postprocess(response)
+
+    async def ainvoke(self, query: str, documents: List[Document] = None) -> str:
+        chain, inputs = self._select_chain(query, documents)
+        with measure_time("Async retrieval + Prompt Augment + generation", log):
+            response = await chain.ainvoke(inputs)
+        return self._postprocess(response)
+
+    def batch(self, queries: List[str]) -> List[str]:
+        with measure_time(f"Batch RAG generation for {len(queries)} queries", log):
+            responses = self.rag_chain.batch([{"input": query} for query in queries])
+        return [self._postprocess(response) for response in responses]
+
+    def stream(
+        self,
+        query: str,
+        config: RunnableConfig = None,
+        documents: List[Document] = None,
+    ) -> Iterator[str]:
+        """
+        Yields the answer token by token as the LLM produces it. Passing the
+        caller's `config` keeps the LLM run attached to the caller's callbacks
+        (e.g. LangGraph's `messages` stream mode).
+        """
+        chain, inputs = self._select_chain(query, documents)
+        for chunk in chain.stream(inputs, config=config):
+            yield chunk
+
+    async def astream(
+        self,
+        query: str,
+        config: RunnableConfig = None,
+        documents: List[Document] = None,
+    ) -> AsyncIterator[str]:
+        chain, inputs = self._select_chain(query, documents)
+        async for chunk in chain.astream(inputs, config=config):
+            yield chunk
@@ -0,0 +1,189 @@
+from threading import Lock
+from typing import Callable, List, Optional, Tuple
+from langchain_core.documents import Document
+from pydantic import BaseModel
+from src.common import config
+from src.common.logger import log
+import math
+import re
+
+
+# Sections written by standardize_review_values, in order
+SECTIONS = ("title", "review_detail", "pros", "cons")
+_SECTION = re.compile(rf"^({'|'.join(SECTIONS)}): ?", re.MULTILINE)
+# Sentence ends, including the "time.Review" runs left by the scraper
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[a-z][.!?])(?=[A-Z])")
+_BOILERPLATE = re.compile(r"^Review collected by and hosted on G2\.com\.?$", re.IGNORECASE)
+_WORD = re.compile(r"[a-z0-9]+")
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i in is it its "
+    "jira me my of on or so that the their them they this to was what when which "
+    "who why will with you your about users people reviewers reviews review".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local estimate of the LLM token count: words and punctuation marks, plus
+    a third for the sub-word pieces of longer words.
+    """
+    return math.ceil(len(_TOKEN.findall(text)) * 4 / 3)
+
+
+def load_token_counter(tokenizer_name: Optional[str] = None) -> Callable[[str], int]:
+    """
+    Token counter of the Hugging Face tokenizer `tokenizer_name`, or the
+    `estimate_tokens` heuristic when None.
+    """
+    if tokenizer_name is None:
+        return estimate_tokens
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def split_sentences(page_content: str) -> List[Tuple[str, str]]:
+    """(section, sentence) pairs of a review, without the G2 boilerplate."""
+    parts = _SECTION.split(page_content)
+    # With a leading section label, parts is ["", label, text, label, text, ...]
+    sections = (
+        list(zip(parts[1::2], parts[2::2])) if len(parts) > 1 else [("", page_content)]
+    )
+    sentences = []
+    for section, text in sections:
+        for sentence in _SENTENCE_END.split(text.strip()):
+            sentence = sentence.strip()
+            if sentence and not _BOILERPLATE.match(sentence):
+                sentences.append((section, sentence))
+    return sentences
+
+
+def query_terms(query: Optional[str]) -> set:
+    return {w for w in _WORD.findall((query or "").lower()) if w not in STOPWORDS}
+
+
+class PackedContext(BaseModel):
+    """The prompt context and its size before and after compression."""
+
+    text: str
+    documents: int
+    tokens: int
+    original_tokens: int
+
+
+class ContextBuilder:
+    """
+    Packs retrieved reviews into a token budget for the RAG prompt.
+
+    Each review gets a one-line header ("[1] author | rating/5 | date") and
+    its most query-relevant sentences (overlap with the query's content
+    words), at most `max_sentences` of them, in their original order and
+    grouped under their title/review_detail/pros/cons section. Reviews are
+    added in retrieval order until the budget is spent; the one that
+    overflows is cut to its best sentences that still fit.
+
+    Tokens in, and what the uncompressed context would have cost, are logged
+    per request and summed in `stats()`.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = config.CONTEXT_TOKEN_BUDGET,
+        max_sentences: int = config.CONTEXT_MAX_SENTENCES_PER_REVIEW,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        self.token_budget = token_budget
+        self.max_sentences = max_sentences
+        self.count_tokens = count_tokens
+        self._lock = Lock()
+        self._stats = {"requests": 0, "tokens": 0, "original_tokens": 0}
+
+    @classmethod
+    def from_config(cls) -> "ContextBuilder":
+        return cls(count_tokens=load_token_counter(config.CONTEXT_TOKENIZER))
+
+    @staticmethod
+    def header(i: int, doc: Document) -> str:
+        metadata = doc.metadata
+        return (
+            f"[{i}] {metadata.get('author', 'Unknown')} | "
+            f"{metadata.get('rating', '?')}/5 | {metadata.get('review_date', 'Unknown')}"
+        )
+
+    @staticmethod
+    def original_format(i: int, doc: Document) -> str:
+        """The uncompressed format: every metadata key and the full review."""
+        metadata = "".join(f"{k}: {v}\n" for k, v in doc.metadata.items())
+        return f"Document-{i}:\n{metadata}**Review detail**:\n{doc.page_content}"
+
+    def _ranked_sentences(self, doc: Document, terms: set) -> List[Tuple[int, str, str]]:
+        """(position, section, sentence) of the best sentences, best first."""
+        sentences = split_sentences(doc.page_content)
+        scored = []
+        for position, (section, sentence) in enumerate(sentences):
+            words = set(_WORD.findall(sentence.lower()))
+            overlap = len(words & terms)
+            # Titles are short summaries: kept when nothing else matches
+            bonus = 0.5 if section == "title" else 0.0
+            scored.append(
+                (overlap / math.sqrt(len(words) or 1) + bonus, position, section, sentence)
+            )
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(p, section, sentence) for _, p, section, sentence in scored]
+
+    def _render(self, header: str, sentences: List[Tuple[int, str, str]]) -> str:
+        lines, section = [header], None
+        for _, sentence_section, sentence in sorted(sentences):
+            if sentence_section != section:
+                section = sentence_section
+                lines.append(f"{section}: {sentence}" if section else sentence)
+            else:
+                lines[-1] += f" {sentence}"
+        return "\n".join(lines)
+
+    def build(self, docs: List[Document], query: Optional[str] = None) -> PackedContext:
+        terms = query_terms(query)
+        blocks, used = [], 0
+        for doc in docs:
+            header = self.header(len(blocks) + 1, doc)
+            ranked = self._ranked_sentences(doc, terms)[: self.max_sentences]
+            # Drops the weakest sentences until the review fits
+            while ranked:
+                block = self._render(header, ranked)
+                tokens = self.count_tokens(block) + 1  # Blank separator line
+                if used + tokens <= self.token_budget:
+                    break
+                ranked = ranked[:-1]
+            if not ranked:
+                break
+            blocks.append(block)
+            used += tokens
+
+        text = "\n\n".join(blocks)
+        packed = PackedContext(
+            text=text,
+            documents=len(blocks),
+            tokens=self.count_tokens(text),
+            original_tokens=self.count_tokens(
+                "\n\n".join(self.original_format(i, doc) for i, doc in enumerate(docs))
+            ),
+        )
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["tokens"] += packed.tokens
+            self._stats["original_tokens"] += packed.original_tokens
+        log.info(
+            f"Context: {packed.documents}/{len(docs)} reviews, {packed.tokens} tokens "
+            f"in (uncompressed {packed.original_tokens}, budget {self.token_budget})"
+        )
+        return packed
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["saved_ratio"] = (
+            1 - stats["tokens"] / stats["original_tokens"] if stats["original_tokens"] else 0.0
+        )
+        return stats
@@ -0,0 +1,340 @@
+from threading import Lock
+from typing import Any, Iterable, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from src.common import config
+from src.common.logger import log
+from src.common.utils import measure_time
+from src.rag.docstore import DocStore, InMemoryDocStore, replace_directory
+from src.rag.embedding_cache import embed_queries
+from src.rag.quantization import CHUNK_ROWS, Quantizer, get_quantizer
+import json
+import numpy as np
+import os
+import shutil
+
+
+class DenseIndex:
+    """
+    Exact dense index: every document embedding as one row of a contiguous,
+    unit-normalized float32 matrix (`embeddings.npy`, memory-mapped).
+
+    A query is scored with one matrix-vector product (cosine similarity) and
+    the top k are picked with argpartition; a batch of queries is one
+    matrix-matrix product. Rows are positions in the DocStore written by
+    ingestion, like the BM25 index ids.
+
+    With a quantization other than float32, compact codes (`codes.npy`) are
+    scanned instead, and only the best `k * rescore_multiplier` candidates
+    are rescored with their full-precision rows, so only those pages of
+    `embeddings.npy` are read.
+    """
+
+    EMBEDDINGS_FILE = "embeddings.npy"
+    CODES_FILE = "codes.npy"
+    QUANTIZER_FILE = "quantizer.npz"
+    META_FILE = "meta.json"
+    FIT_SAMPLE_ROWS = 100_000
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        meta: Optional[dict] = None,
+        codes: Optional[np.ndarray] = None,
+        quantizer: Optional[Quantizer] = None,
+        rescore_multiplier: int = 10,
+    ):
+        self.embeddings = embeddings
+        self.meta = meta or {}
+        self.codes = codes
+        self.quantizer = quantizer
+        self.rescore_multiplier = rescore_multiplier
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    @property
+    def quantization(self) -> str:
+        return self.quantizer.name if self.quantizer else "float32"
+
+    @staticmethod
+    def normalize(vectors) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, scores.shape[1])
+        if k < scores.shape[1]:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        return (
+            np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1),
+        )
+
+    def _rescored_search(self, queries: np.ndarray, k: int, rows=None):
+        codes = self.codes if rows is None else self.codes[rows]
+        approximate = self.quantizer.scores(codes, queries)
+        candidates, _ = self._top_k(approximate, k * self.rescore_multiplier)
+        if rows is not None:
+            candidates = rows[candidates]
+        ids, scores = [], []
+        for query, candidate_rows in zip(queries, candidates):
+            # Sequential reads of the full-precision rows
+            candidate_rows = np.sort(candidate_rows)
+            exact = self.embeddings[candidate_rows] @ query
+            best, best_scores = self._top_k(exact[None, :], k)
+            ids.append(candidate_rows[best[0]])
+            scores.append(best_scores[0])
+        return np.array(ids), np.array(scores)
+
+    def search_batch(
+        self, query_vectors, k: int, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (ids, cosine similarities) of the top k rows for each query vector.
+        With sorted `rows` (e.g. the reviews passing a metadata filter), only
+        those rows are scored.
+        """
+        n_rows = len(self) if rows is None else len(rows)
+        if n_rows == 0:
+            empty = np.zeros((len(query_vectors), 0))
+            return empty.astype(np.int64), empty
+        queries = self.normalize(query_vectors)
+        if self.quantizer is not None:
+            return self._rescored_search(queries, k, rows)
+        if rows is None:
+            return self._top_k(queries @ self.embeddings.T, k)
+        ids, scores = self._top_k(queries @ self.embeddings[rows].T, k)
+        return rows[ids], scores
+
+    def search(
+        self, query_vector, k: int, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        ids, scores = self.search_batch([query_vector], k, rows)
+        return ids[0], scores[0]
+
+    @classmethod
+    def _write_codes(cls, directory: str, quantization: str):
+        """Encodes the full-precision matrix in `directory` chunk by chunk."""
+        embeddings = np.load(os.path.join(directory, cls.EMBEDDINGS_FILE), mmap_mode="r")
+        quantizer = get_quantizer(quantization)
+        step = max(1, len(embeddings) // cls.FIT_SAMPLE_ROWS)
+        quantizer.fit(np.asarray(embeddings[::step]))
+        sample_codes = quantizer.encode(embeddings[:1])
+        codes = np.lib.format.open_memmap(
+            os.path.join(directory, cls.CODES_FILE),
+            mode="w+",
+            dtype=sample_codes.dtype,
+            shape=(len(embeddings), sample_codes.shape[1]),
+        )
+        for start in range(0, len(embeddings), CHUNK_ROWS):
+            codes[start : start + CHUNK_ROWS] = quantizer.encode(
+                embeddings[start : start + CHUNK_ROWS]
+            )
+        codes.flush()
+        np.savez(os.path.join(directory, cls.QUANTIZER_FILE), **quantizer.state())
+
+    @classmethod
+    def write(
+        cls,
+        batches: Iterable[np.ndarray],
+        n_docs: int,
+        dim: int,
+        directory: str,
+        meta: Optional[dict] = None,
+        quantization: str = "float32",
+    ):
+        """
+        Streams embedding batches (in DocStore order) into a new index at
+        `directory`, replacing it atomically. Codes for `quantization` are
+        written from the full-precision matrix in a second pass.
+        """
+        tmp_dir = f"{directory}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        matrix = np.lib.format.open_memmap(
+            os.path.join(tmp_dir, cls.EMBEDDINGS_FILE),
+            mode="w+",
+            dtype=np.float32,
+            shape=(n_docs, dim),
+        )
+        position = 0
+        for batch in batches:
+            matrix[position : position + len(batch)] = cls.normalize(batch)
+            position += len(batch)
+        if position != n_docs:
+            raise ValueError(f"Expected {n_docs} embeddings, got {position}")
+        matrix.flush()
+        del matrix
+        if quantization != "float32" and n_docs:
+            cls._write_codes(tmp_dir, quantization)
+        with open(os.path.join(tmp_dir, cls.META_FILE), "w") as f:
+            meta = {**(meta or {}), "n_docs": n_docs, "dim": dim}
+            json.dump({**meta, "quantization": quantization}, f)
+        replace_directory(tmp_dir, directory)
+
+    @classmethod
+    def load(cls, directory: str, rescore_multiplier: int = 10) -> "DenseIndex":
+        embeddings = np.load(os.path.join(directory, cls.EMBEDDINGS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, cls.META_FILE)) as f:
+            meta = json.load(f)
+        codes, quantizer = None, None
+        if meta.get("quantization", "float32") != "float32" and meta["n_docs"]:
+            codes = np.load(os.path.join(directory, cls.CODES_FILE), mmap_mode="r")
+            quantizer = get_quantizer(meta["quantization"])
+            with np.load(os.path.join(directory, cls.QUANTIZER_FILE)) as state:
+                quantizer.load_state(dict(state))
+        return cls(embeddings, meta, codes, quantizer, rescore_multiplier)
+
+
+class DenseIndexVectorStore(VectorStore):
+    """
+    Read-only langchain VectorStore over a DenseIndex and its DocStore.
+
+    The index and the document store are opened lazily on the first query.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        index_directory: Optional[str] = None,
+        docstore_directory: Optional[str] = None,
+        index: Optional[DenseIndex] = None,
+        docstore=None,
+    ):
+        self._embedding = embedding
+        self.index_directory = index_directory
+        self.docstore_directory = docstore_directory
+        self._index = index
+        self._docstore = docstore
+        self._lock = Lock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _load(self):
+        with self._lock:
+            if self._index is None:
+                with measure_time("Dense index loading", log):
+                    self._docstore = DocStore(self.docstore_directory)
+                    self._index = DenseIndex.load(
+                        self.index_directory,
+                        rescore_multiplier=config.DENSE_INDEX_RESCORE_MULTIPLIER,
+                    )
+                if len(self._index) != len(self._docstore):
+                    raise ValueError(
+                        f"Dense index at {self.index_directory} does not match the "
+                        "document store; run ingest.py again."
+                    )
+        return self._index, self._docstore
+
+    def _documents(self, ids, scores) -> List[Tuple[Document, float]]:
+        _, docstore = self._load()
+        return list(zip(docstore.get_many(ids), scores.tolist()))
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, rows: Optional[np.ndarray] = None
+    ) -> List[Tuple[Document, float]]:
+        """`rows` restricts the search to those DocStore positions."""
+        index, _ = self._load()
+        return self._documents(*index.search(embedding, k, rows))
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, rows: Optional[np.ndarray] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(
+            self._embedding.embed_query(query), k, rows
+        )
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    def similarity_search_with_score_batch_by_vector(
+        self, embeddings: List[List[float]], k: int = 4
+    ) -> List[List[Tuple[Document, float]]]:
+        """Searches many query vectors with one matrix product."""
+        index, _ = self._load()
+        ids, scores = index.search_batch(embeddings, k)
+        return [self._documents(row_ids, row_scores) for row_ids, row_scores in zip(ids, scores)]
+
+    def similarity_search_batch(self, queries: List[str], k: int = 4) -> List[List[Document]]:
+        """Embeds and searches many queries at once (one matrix product)."""
+        index, docstore = self._load()
+        ids, _ = index.search_batch(embed_queries(self._embedding, queries), k)
+        return [docstore.get_many(row) for row in ids]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        **kwargs: Any,
+    ) -> "DenseIndexVectorStore":
+        """Builds an in-memory store, e.g. for tests and benchmarks."""
+        metadatas = metadatas or [{} for _ in texts]
+        documents = [
+            Document(page_content=text, metadata=metadata)
+            for text, metadata in zip(texts, metadatas)
+        ]
+        vectors = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+        index = DenseIndex(DenseIndex.normalize(vectors).reshape(len(texts), -1))
+        return cls(embedding, index=index, docstore=InMemoryDocStore(documents))
+
+
+def build_dense_index(
+    collection,
+    docstore_dir: str,
+    index_dir: str,
+    quantization: Optional[str] = None,
+    batch_size: int = 1024,
+):
+    """
+    Exports the Chroma collection's embeddings, in DocStore order, into a
+    DenseIndex quantized as `quantization` (DENSE_INDEX_QUANTIZATION by
+    default). Vectors are fetched and written batch by batch.
+    """
+    quantization = quantization or config.DENSE_INDEX_QUANTIZATION
+    docstore = DocStore(docstore_dir)
+    n_docs = len(docstore)
+    dim = None
+    if n_docs:
+        first_id = docstore.get(0).metadata["review_id"]
+        dim = len(collection.get(ids=[first_id], include=["embeddings"])["embeddings"][0])
+
+    def batches():
+        for start in range(0, n_docs, batch_size):
+            ids = [
+                docstore.get(position).metadata["review_id"]
+                for position in range(start, min(start + batch_size, n_docs))
+            ]
+            result = collection.get(ids=ids, include=["embeddings"])
+            by_id = dict(zip(result["ids"], result["embeddings"]))
+            missing = [doc_id for doc_id in ids if doc_id not in by_id]
+            if missing:
+                raise ValueError(f"{len(missing)} documents have no embedding in Chroma")
+            yield np.asarray([by_id[doc_id] for doc_id in ids], dtype=np.float32)
+
+    with measure_time("Dense index build", log):
+        DenseIndex.write(
+            batches(), n_docs, dim or 0, index_dir, quantization=quantization
+        )
+    log.info(f"Dense index ({n_docs} x {dim}, {quantization}) written to {index_dir}")
@@ -0,0 +1,102 @@
+from array import array
+from typing import Iterable, Iterator, List
+from langchain_core.documents import Document
+from src.common.logger import log
+import json
+import numpy as np
+import os
+import shutil
+
+
+def replace_directory(tmp_dir: str, target_dir: str):
+    """Swaps a fully written `tmp_dir` into place of `target_dir`."""
+    if os.path.exists(target_dir):
+        shutil.rmtree(target_dir)
+    os.replace(tmp_dir, target_dir)
+
+
+class DocStore:
+    """
+    Read-only, memory-mapped store of the review documents.
+
+    Every document is stored as one JSON record ({"page_content", "metadata"})
+    in a single UTF-8 blob, and `offsets.npy` holds the byte offset of each
+    record. Opening the store only maps the two files, so start-up time and
+    resident memory do not depend on the corpus size, and worker processes
+    share the pages through the OS page cache. Documents are decoded on access.
+    Positions in the store are the document ids used by the on-disk indexes.
+    """
+
+    BLOB_FILE = "documents.jsonl"
+    OFFSETS_FILE = "offsets.npy"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.offsets = np.load(
+            os.path.join(directory, self.OFFSETS_FILE), mmap_mode="r"
+        )
+        blob_path = os.path.join(directory, self.BLOB_FILE)
+        # np.memmap cannot map an empty file
+        self.blob = (
+            np.memmap(blob_path, dtype=np.uint8, mode="r")
+            if os.path.getsize(blob_path)
+            else np.zeros(0, dtype=np.uint8)
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get(self, position: int) -> Document:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        record = json.loads(self.blob[start:end].tobytes())
+        return Document(page_content=record["page_content"], metadata=record["metadata"])
+
+    def get_many(self, positions: Iterable[int]) -> List[Document]:
+        return [self.get(int(position)) for position in positions]
+
+    def __iter__(self) -> Iterator[Document]:
+        for position in range(len(self)):
+            yield self.get(position)
+
+    @classmethod
+    def write(cls, documents: Iterable[Document], directory: str):
+        """
+        Writes `documents` (in order) to `directory`, replacing it atomically.
+        Documents are streamed to disk, so `documents` can be a generator.
+        """
+        tmp_dir = f"{directory}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        offsets = array("q", [0])
+        with open(os.path.join(tmp_dir, cls.BLOB_FILE), "wb") as f:
+            for doc in documents:
+                record = json.dumps(
+                    {"page_content": doc.page_content, "metadata": doc.metadata},
+                    ensure_ascii=False,
+                ).encode("utf-8")
+                f.write(record + b"\n")
+                offsets.append(offsets[-1] + len(record) + 1)
+        np.save(
+            os.path.join(tmp_dir, cls.OFFSETS_FILE),
+            np.frombuffer(offsets, dtype=np.int64),
+        )
+
+        replace_directory(tmp_dir, directory)
+        log.info(f"Wrote {len(offsets) - 1} documents to {directory}")
+
+
+class InMemoryDocStore:
+    """DocStore interface over documents held in memory."""
+
+    def __init__(self, documents: List[Document]):
+        self.documents = documents
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def get(self, position: int) -> Document:
+        return self.documents[position]
+
+    def get_many(self, positions: Iterable[int]) -> List[Document]:
+        return [self.documents[int(position)] for position in positions]
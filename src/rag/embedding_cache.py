@@ -0,0 +1,342 @@
+from threading import Lock
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+from src.common import config
+from src.common.logger import log
+import hashlib
+import json
+import numpy as np
+import os
+import re
+import sqlite3
+import time
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of embedding vectors, bounded by an LRU size cap.
+
+    Vectors live in `vectors.bin`, a memory-mapped (capacity x dim) array of
+    `dtype` that grows in blocks up to `max_entries` rows. `index.sqlite`
+    maps sha256(model, normalize flag, query/document, text) to a row and
+    records when the entry was last used; when the cap is reached, the least
+    recently used rows are overwritten. Each model / normalize flag gets its
+    own directory, as their vectors are not interchangeable.
+
+    Hits are read-only: their last-used times are kept in memory and written
+    in one batch every `recency_flush_seconds`, before any eviction, or on
+    `flush()`. Query vectors are held the same way (`put_many(defer=True)`).
+    What is not yet written when the process exits is lost, which only makes
+    entries look older to the eviction or embeds a query again.
+    """
+
+    GROW_ROWS = 4096
+    MAX_PENDING_RECENCY = 10_000  # Last-used times held before a flush
+    MAX_DEFERRED_VECTORS = 1000  # Deferred vectors (see put_many) held before a flush
+
+    def __init__(
+        self,
+        directory: str,
+        model_name: str,
+        normalize: bool,
+        dtype: str = "float16",
+        max_entries: int = 500_000,
+        recency_flush_seconds: float = 30.0,
+    ):
+        self.model_name = model_name
+        self.normalize = normalize
+        self.dtype = np.dtype(dtype)
+        self.max_entries = max_entries
+        self.recency_flush_seconds = recency_flush_seconds
+        namespace = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.directory = os.path.join(
+            directory, f"{namespace}-{'norm' if normalize else 'raw'}-{self.dtype.name}"
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, "vectors.bin")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._vectors = None
+        # key -> last-used time (ns) of hits not yet written to the index
+        self._recency = {}
+        # key -> vector stored with `defer=True`, not yet written
+        self._deferred = {}
+        self._next_recency_flush = time.monotonic() + recency_flush_seconds
+        self.dim = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.dim = json.load(f)["dim"]
+        self._db = sqlite3.connect(
+            os.path.join(self.directory, "index.sqlite"),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key BLOB PRIMARY KEY, slot INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+        )
+
+    @classmethod
+    def from_config(cls) -> "EmbeddingCache":
+        return cls(
+            config.EMBEDDING_CACHE_DIRECTORY,
+            config.EMBEDDING_MODEL_NAME,
+            bool(config.ENCODE_KWARGS.get("normalize_embeddings", False)),
+            dtype=config.EMBEDDING_CACHE_DTYPE,
+            max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+            recency_flush_seconds=config.EMBEDDING_CACHE_RECENCY_FLUSH_SECONDS,
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "entries": self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0],
+        }
+
+    def key(self, text: str, kind: str = "document") -> bytes:
+        # Queries and documents are kept apart, as some models embed them
+        # differently (e.g. with an instruction prefix)
+        digest = hashlib.sha256()
+        digest.update(f"{self.model_name}\0{self.normalize}\0{kind}\0".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.digest()
+
+    def _lookup(self, keys: List[bytes]) -> dict:
+        slots = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            slots.update(
+                self._db.execute(
+                    "SELECT key, slot FROM entries WHERE key IN "
+                    f"({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+            )
+        return slots
+
+    def _map_vectors(self, rows: int):
+        """(Re)maps the vector file with room for at least `rows` rows."""
+        if self._vectors is not None and len(self._vectors) >= rows:
+            return
+        capacity = min(
+            self.max_entries,
+            max(rows, -(-rows // self.GROW_ROWS) * self.GROW_ROWS),
+        )
+        size = capacity * self.dim * self.dtype.itemsize
+        with open(self.vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._vectors = np.memmap(
+            self.vectors_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim)
+        )
+
+    def _write_recency(self):
+        """Writes the pending last-used times; the caller holds the lock."""
+        recency, self._recency = self._recency, {}
+        if recency:
+            # Another process (or put_many) may have used the entry later
+            self._db.executemany(
+                "UPDATE entries SET last_used = MAX(last_used, ?) WHERE key = ?",
+                [(last_used, key) for key, last_used in recency.items()],
+            )
+        self._next_recency_flush = time.monotonic() + self.recency_flush_seconds
+
+    def _flush_due(self) -> bool:
+        return (
+            len(self._recency) >= self.MAX_PENDING_RECENCY
+            or len(self._deferred) >= self.MAX_DEFERRED_VECTORS
+            or time.monotonic() >= self._next_recency_flush
+        )
+
+    def flush(self):
+        """Writes the deferred vectors and the last-used times of the hits."""
+        with self._lock:
+            self._store({})
+
+    def get_many(
+        self, texts: List[str], kind: str = "document"
+    ) -> List[Optional[np.ndarray]]:
+        """Cached float32 vectors of `texts`, None for the misses."""
+        keys = [self.key(text, kind) for text in texts]
+        with self._lock:
+            slots = self._lookup([key for key in keys if key not in self._deferred])
+            results = []
+            if slots:
+                self._map_vectors(max(slots.values()) + 1)
+                self._recency.update(dict.fromkeys(slots, time.time_ns()))
+            for key in keys:
+                slot = slots.get(key)
+                if key in self._deferred:
+                    # Rounded to `dtype` like the stored vectors
+                    vector = np.asarray(self._deferred[key], self.dtype)
+                    results.append(vector.astype(np.float32))
+                elif slot is not None:
+                    results.append(np.array(self._vectors[slot], np.float32))
+                else:
+                    results.append(None)
+            if self._flush_due():
+                self._store({})
+            found = sum(result is not None for result in results)
+            self.hits += found
+            self.misses += len(keys) - found
+        return results
+
+    def put_many(
+        self,
+        texts: List[str],
+        vectors: List[List[float]],
+        kind: str = "document",
+        defer: bool = False,
+    ):
+        """
+        Stores vectors, evicting the least recently used ones above the cap.
+
+        With `defer`, the vectors are served from memory and written with the
+        next flush (like the last-used times), so the caller does not wait
+        for a disk write; the chat path stores query vectors this way.
+        """
+        entries = dict(zip((self.key(text, kind) for text in texts), vectors))
+        if not entries:
+            return
+        with self._lock:
+            if defer:
+                self._deferred.update(entries)
+                if not self._flush_due():
+                    return
+                entries = {}
+            self._store(entries)
+
+    def _store(self, entries: dict):
+        """
+        Writes `entries`, the deferred vectors and the pending last-used
+        times in one transaction; the caller holds the lock.
+        """
+        entries = {**self._deferred, **entries}
+        self._deferred = {}
+        if not entries:
+            self._db.execute("BEGIN")
+            self._write_recency()
+            self._db.execute("COMMIT")
+            return
+        entries = dict(list(entries.items())[-self.max_entries :])
+        if self.dim is None:
+            self.dim = len(next(iter(entries.values())))
+            with open(self.meta_path, "w") as f:
+                json.dump({"model": self.model_name, "dim": self.dim}, f)
+        # Slots are allocated inside a write transaction, so processes
+        # sharing the cache do not hand out the same row
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            # The eviction below must see this process's recent hits
+            self._write_recency()
+            existing = self._lookup(list(entries))
+            next_slot = self._db.execute(
+                "SELECT COALESCE(MAX(slot) + 1, 0) FROM entries"
+            ).fetchone()[0]
+            new_keys = [key for key in entries if key not in existing]
+            free_slots = list(
+                range(next_slot, min(self.max_entries, next_slot + len(new_keys)))
+            )
+            evict = len(new_keys) - len(free_slots)
+            if evict > 0:
+                # Entries being rewritten are not candidates for eviction
+                evicted = [
+                    (key, slot)
+                    for key, slot in self._db.execute(
+                        "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?",
+                        (evict + len(existing),),
+                    ).fetchall()
+                    if key not in existing
+                ][:evict]
+                self._db.executemany(
+                    "DELETE FROM entries WHERE key = ?", [(k,) for k, _ in evicted]
+                )
+                free_slots += [slot for _, slot in evicted]
+            slots = {**existing, **dict(zip(new_keys, free_slots))}
+            self._map_vectors(max(slots.values()) + 1)
+            for key, slot in slots.items():
+                self._vectors[slot] = entries[key]
+            self._vectors.flush()
+            now = time.time_ns()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries (key, slot, last_used) "
+                "VALUES (?, ?, ?)",
+                [(key, slot, now) for key, slot in slots.items()],
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings served from an EmbeddingCache, computing only the misses."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(texts, "document")
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            computed = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            self.cache.put_many(
+                missing, [computed[text] for text in missing], "document"
+            )
+            vectors = [
+                computed[text] if vector is None else vector
+                for text, vector in zip(texts, vectors)
+            ]
+        log.debug(
+            f"Embedding cache: {len(texts) - len(missing)}/{len(texts)} cached, "
+            f"hit rate {self.cache.hit_rate:.1%}"
+        )
+        return [list(map(float, vector)) for vector in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """The `embed_query` vectors of `texts`, computing the misses in one batch."""
+        vectors = self.cache.get_many(texts, "query")
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            computed = dict(zip(missing, embed_queries(self.embeddings, missing)))
+            # Not written while the request waits, see EmbeddingCache.put_many
+            self.cache.put_many(
+                missing, [computed[text] for text in missing], "query", defer=True
+            )
+            vectors = [
+                computed[text] if vector is None else vector
+                for text, vector in zip(texts, vectors)
+            ]
+        return [list(map(float, vector)) for vector in vectors]
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    What `embeddings.embed_query` returns for each of `texts`. Instruction-tuned
+    models embed queries and documents differently, so batches of questions
+    must not go through `embed_documents`. Hugging Face models and
+    CachedEmbeddings encode the batch at once; other models one text at a time.
+    """
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.embed_queries(texts)
+    query_kwargs = getattr(embeddings, "query_encode_kwargs", None)
+    if query_kwargs is not None and hasattr(embeddings, "_embed"):
+        # The encode arguments HuggingFaceEmbeddings.embed_query uses
+        return embeddings._embed(texts, query_kwargs or embeddings.encode_kwargs)
+    return [embeddings.embed_query(text) for text in texts]
@@ -1,8 +1,9 @@
 from abc import ABC, abstractmethod
-from langchain_huggingface import HuggingFaceEmbeddings
+from threading import Lock
 from src.common import config
 from src.common.utils import measure_time
 from src.common.logger import log
+from src.rag.embedding_cache import CachedEmbeddings, EmbeddingCache
 
 
 class Embedder(ABC):
@@ -14,20 +15,55 @@ class Embedder(ABC):
         return
 
 
+def build_hf_embeddings(**encode_kwargs):
+    """
+    A new instance of the configured Hugging Face embedding model; keyword
+    arguments override `config.ENCODE_KWARGS` (e.g. the ingestion batch size).
+    The app uses the shared instance of HfEmbedder instead.
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(
+        model_name=config.EMBEDDING_MODEL_NAME,
+        model_kwargs=config.MODEL_KWARGS,
+        encode_kwargs={**config.ENCODE_KWARGS, **encode_kwargs},
+    )
+
+
 class HfEmbedder(Embedder):
+    # The model is loaded once and shared by every user in the process
+    # (vector store, query router, query cache, ...), on first use.
+    # `_model` is the bare model: it holds no connection or thread, so
+    # serve.py loads it before forking its workers, which share its weights.
+    _model = None
+    _embeddings = None
+    _lock = Lock()
+
     def __init__(self):
         super().__init__()
 
+    def get_model(self):
+        """The shared Hugging Face model, without the embedding cache."""
+        if HfEmbedder._model is not None:
+            return HfEmbedder._model
+        with HfEmbedder._lock:
+            if HfEmbedder._model is None:
+                try:
+                    log.info("Loading embedding model...")
+                    with measure_time("embedding model loading", log):
+                        HfEmbedder._model = build_hf_embeddings()
+                except Exception as e:
+                    log.error(f"Failed to load the HuggingFace embedding Instance: {e}")
+                    raise
+            return HfEmbedder._model
+
     def get_embeder(self):
-        try:
-            log.info("Loading embedding model...")
-            with measure_time("embedding model loading", log):
-                embeddings = HuggingFaceEmbeddings(
-                    model_name=config.EMBEDDING_MODEL_NAME,
-                    model_kwargs=config.MODEL_KWARGS,
-                    encode_kwargs=config.ENCODE_KWARGS,
-                )
-                return embeddings
-        except Exception as e:
-            log.error(f"Failed to load the HuggingFace embedding Instance: {e}")
-            raise
+        if HfEmbedder._embeddings is not None:
+            return HfEmbedder._embeddings
+        embeddings = self.get_model()
+        with HfEmbedder._lock:
+            if HfEmbedder._embeddings is None:
+                if config.EMBEDDING_CACHE_ENABLED:
+                    embeddings = CachedEmbeddings(embeddings, EmbeddingCache.from_config())
+                HfEmbedder._embeddings = embeddings
+            return HfEmbedder._embeddings
@@ -0,0 +1,155 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple
+from langchain_core.documents import Document
+import numpy as np
+
+
+# Metadata key under which retrievers pass their score to the fusion stage;
+# it is stripped before the fused documents reach the prompt
+SCORE_KEY = "retrieval_score"
+
+
+def document_key(doc: Document) -> str:
+    """Stable identity of a review: its content-hashed id, else its text."""
+    return doc.metadata.get("review_id") or doc.page_content
+
+
+def with_score(doc: Document, score: float) -> Document:
+    """Copy of `doc` carrying its retriever score for the fusion stage."""
+    return doc.model_copy(update={"metadata": {**doc.metadata, SCORE_KEY: float(score)}})
+
+
+def scored_results(doc_lists: List[List[Document]]) -> List[List[Tuple[Document, float]]]:
+    """
+    Splits the score attached by `with_score` off each document. Documents of
+    retrievers that report no score get 1 / rank, so every method still
+    ranks them in their retriever's order.
+    """
+    results = []
+    for docs in doc_lists:
+        result = []
+        for rank, doc in enumerate(docs, start=1):
+            if SCORE_KEY in doc.metadata:
+                metadata = dict(doc.metadata)
+                score = metadata.pop(SCORE_KEY)
+                doc = doc.model_copy(update={"metadata": metadata})
+            else:
+                score = 1.0 / rank
+            result.append((doc, score))
+        results.append(result)
+    return results
+
+
+class ScoreFusion(ABC):
+    """
+    Fuses the ranked (document, score) lists of several retrievers into one
+    list of at most `k` distinct reviews.
+
+    Candidates are keyed by `document_key`, so a review returned twice (by
+    two retrievers, or twice by one) fills a single slot; within a list
+    only its best rank counts. Scores are then fused over fixed-size
+    (lists x candidates) arrays, and the list is truncated to `k` after
+    deduplication.
+    """
+
+    name = None
+
+    def __init__(self, weights: Optional[Sequence[float]] = None):
+        self.weights = weights
+
+    def _weights(self, n_lists: int) -> np.ndarray:
+        if self.weights is None:
+            return np.full(n_lists, 1.0 / n_lists)
+        if len(self.weights) != n_lists:
+            raise ValueError(f"Expected {n_lists} weights, got {len(self.weights)}")
+        return np.asarray(self.weights, dtype=np.float64)
+
+    @abstractmethod
+    def _fused_scores(self, ranks: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """
+        ranks, scores: (lists x candidates), 1-based ranks; absent candidates
+        have rank inf and score nan. Returns one fused score per candidate.
+        """
+        return
+
+    def fuse(
+        self, results: List[List[Tuple[Document, float]]], k: Optional[int] = None
+    ) -> List[Document]:
+        n_lists = len(results)
+        capacity = sum(len(result) for result in results)
+        ranks = np.full((n_lists, capacity), np.inf)
+        scores = np.full((n_lists, capacity), np.nan)
+        slots, documents = {}, []
+        for i, result in enumerate(results):
+            for rank, (doc, score) in enumerate(result, start=1):
+                slot = slots.setdefault(document_key(doc), len(slots))
+                if slot == len(documents):
+                    documents.append(doc)
+                if ranks[i, slot] == np.inf:
+                    ranks[i, slot] = rank
+                    scores[i, slot] = score
+        n_candidates = len(documents)
+        if n_candidates == 0:
+            return []
+        fused = self._fused_scores(ranks[:, :n_candidates], scores[:, :n_candidates])
+        order = np.argsort(-fused, kind="stable")[:k]
+        return [documents[slot] for slot in order]
+
+
+class ReciprocalRankFusion(ScoreFusion):
+    """Weighted RRF: sum of weight / (c + rank); raw scores are ignored."""
+
+    name = "rrf"
+
+    def __init__(self, weights: Optional[Sequence[float]] = None, c: int = 60):
+        super().__init__(weights)
+        self.c = c
+
+    def _fused_scores(self, ranks: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        return self._weights(len(ranks)) @ (1.0 / (self.c + ranks))
+
+
+class MinMaxFusion(ScoreFusion):
+    """
+    Weighted sum of scores min-max normalized to [0, 1] within each list;
+    a list's single (or all equal) score maps to 1, an absent one to 0.
+    """
+
+    name = "minmax"
+
+    def _fused_scores(self, ranks: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        present = ~np.isnan(scores)
+        low = np.min(np.where(present, scores, np.inf), axis=1, keepdims=True)
+        high = np.max(np.where(present, scores, -np.inf), axis=1, keepdims=True)
+        spread = np.where(high > low, high - low, 1.0)
+        normalized = np.where(present, (scores - low) / spread, 0.0)
+        normalized[present & (high == low)] = 1.0
+        return self._weights(len(scores)) @ normalized
+
+
+class ConvexCombinationFusion(ScoreFusion):
+    """
+    Weighted sum of the raw scores (an absent one counts as 0). Only
+    meaningful when the retrievers' scores share a scale, or the weights
+    compensate for it.
+    """
+
+    name = "convex"
+
+    def _fused_scores(self, ranks: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        return self._weights(len(scores)) @ np.nan_to_num(scores, nan=0.0)
+
+
+FUSION_METHODS = {
+    fusion.name: fusion
+    for fusion in (ReciprocalRankFusion, MinMaxFusion, ConvexCombinationFusion)
+}
+
+
+def get_fusion(method: str, weights: Optional[Sequence[float]] = None, **kwargs) -> ScoreFusion:
+    """Returns the `method` fusion ("rrf", "minmax" or "convex")."""
+    if method not in FUSION_METHODS:
+        raise ValueError(
+            f"Unknown fusion method: {method} (expected one of {list(FUSION_METHODS)})"
+        )
+    return FUSION_METHODS[method](weights, **kwargs)
@@ -0,0 +1,160 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from src.common import config
+from src.common.utils import measure_time
+from src.common.logger import log
+import asyncio
+import re
+import time
+
+
+class ChatLLM(ABC):
+    def __init__(self):
+        super().__init__()
+
+    @abstractmethod
+    def get_llm(self):
+        return
+
+
+class GoogleGenAiLLM(ChatLLM):
+    def __init__(self):
+        super().__init__()
+
+    def get_llm(self):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        try:
+            log.info(f"Initializing LLM client: {config.LLM_MODEL_NAME}")
+            with measure_time("LLM client initialization", log):
+                llm = ChatGoogleGenerativeAI(model=config.LLM_MODEL_NAME)
+                return llm
+        except Exception as e:
+            log.error(f"Failed to initialize the Google GenAI LLM client: {e}")
+            raise
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """
+    Deterministic, offline chat model used for tests and benchmarks.
+
+    It answers every prompt with the same response and streams it word by word,
+    sleeping `latency` seconds before the first token and `token_latency`
+    seconds between tokens to emulate a remote LLM. Structured output calls
+    (e.g. the router) return `structured_output` after `latency` seconds.
+    """
+
+    response: str = "Jira helps teams plan and track agile work [1]."
+    latency: float = 0.0
+    token_latency: float = 0.0
+    structured_output: Dict[str, Any] = {"route": "rag"}
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming-chat-model"
+
+    def _tokens(self) -> List[str]:
+        return re.findall(r"\S+\s*", self.response)
+
+    def _total_latency(self) -> float:
+        return self.latency + self.token_latency * len(self._tokens())
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._total_latency())
+        message = AIMessage(content=self.response)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self._total_latency())
+        message = AIMessage(content=self.response)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for i, token in enumerate(self._tokens()):
+            if i:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for i, token in enumerate(self._tokens()):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    def with_structured_output(self, schema, **kwargs):
+        def structured(_):
+            time.sleep(self.latency)
+            return schema(**self.structured_output)
+
+        async def astructured(_):
+            await asyncio.sleep(self.latency)
+            return schema(**self.structured_output)
+
+        return RunnableLambda(structured, afunc=astructured)
+
+
+class FakeLLM(ChatLLM):
+    def __init__(
+        self, latency: float = 0.0, token_latency: float = 0.0, route: str = "rag"
+    ):
+        super().__init__()
+        self.latency = latency
+        self.token_latency = token_latency
+        self.route = route
+
+    def get_llm(self):
+        return FakeStreamingChatModel(
+            latency=self.latency,
+            token_latency=self.token_latency,
+            structured_output={"route": self.route},
+        )
+
+
+@lru_cache(maxsize=None)
+def load_llm(llm_type="google_genai"):
+    """
+    Returns the process-wide LLM client for `llm_type`.
+
+    The client is created on first use and cached, so every chain in the
+    process shares one client (and its underlying connection pool).
+    """
+    if llm_type == "google_genai":
+        return GoogleGenAiLLM().get_llm()
+    elif llm_type == "fake":
+        return FakeLLM().get_llm()
+    raise ValueError(f"Unknown LLM type: {llm_type}")
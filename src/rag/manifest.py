@@ -0,0 +1,74 @@
+from typing import Iterable
+from src.common.logger import log
+import hashlib
+import json
+import os
+
+
+# Version of the metadata stored with each review in Chroma. Stores written
+# with an older version get it rewritten by the next ingestion (2: "month")
+METADATA_VERSION = 2
+
+
+def corpus_version(review_ids: Iterable[str]) -> str:
+    """Short hash identifying a set of review ids."""
+    digest = hashlib.sha256()
+    for doc_id in sorted(review_ids):
+        digest.update(doc_id.encode("ascii"))
+    return digest.hexdigest()[:16]
+
+
+class IngestManifest:
+    """
+    Ids of the reviews currently stored in the vector store and the indexes,
+    written by ingest.py after every successful run.
+
+    Review ids are content hashes, so diffing the incoming ids against the
+    manifest yields exactly the new or edited reviews (to embed) and the
+    removed or edited-away ones (to delete). `corpus_version` changes
+    whenever the stored corpus does. `metadata_version` is the
+    METADATA_VERSION the stored reviews' metadata was written with.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        review_ids: Iterable[str] = (),
+        metadata_version: int = METADATA_VERSION,
+    ):
+        self.path = path
+        self.review_ids = set(review_ids)
+        self.metadata_version = metadata_version
+
+    @property
+    def corpus_version(self) -> str:
+        return corpus_version(self.review_ids)
+
+    @classmethod
+    def load(cls, path: str) -> "IngestManifest":
+        # A store without a manifest, or with one written before the
+        # metadata was versioned, has the first version
+        if not os.path.exists(path):
+            return cls(path, metadata_version=1)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(path, data["review_ids"], data.get("metadata_version", 1))
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def save(self):
+        """Writes the manifest atomically."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "corpus_version": self.corpus_version,
+                    "metadata_version": self.metadata_version,
+                    "review_ids": sorted(self.review_ids),
+                },
+                f,
+            )
+        os.replace(tmp_path, self.path)
+        log.info(f"Ingest manifest ({len(self.review_ids)} reviews) written to {self.path}")
@@ -0,0 +1,312 @@
+from typing import Iterable, Optional, Tuple
+from langchain_core.documents import Document
+from pydantic import BaseModel
+from src.common.logger import log
+from src.common.utils import measure_time
+from src.rag.docstore import DocStore, replace_directory
+import json
+import numpy as np
+import os
+import re
+import shutil
+
+
+MONTHS = {
+    month: number
+    for number, month in enumerate(
+        "january february march april may june july august september october "
+        "november december".split(),
+        start=1,
+    )
+}
+_MONTH = r"(january|february|march|april|may|june|july|august|september|october|november|december)"
+_YEAR = r"((?:19|20)\d{2})"
+_RATING = r"(\d(?:\.5)?)"
+# A polarity only filters when it qualifies the reviews ("negative reviews",
+# not "critical features"); it is followed by one of these
+_REVIEWS = r"(?= (?:reviews?|reviewers?|ratings?|feedback)\b)"
+
+# Phrases stripped from the query once turned into a filter
+_PATTERNS = [
+    ("stars_at_least", rf"\b(?:at least|minimum of) {_RATING}[- ]?stars?\b"),
+    ("stars_at_least", rf"\b{_RATING} ?\+ ?[- ]?stars?\b"),
+    ("stars", rf"\b{_RATING}[- ]?stars?\b"),
+    ("negative", rf"\b(?:negative|critical|low[- ]rated){_REVIEWS}"),
+    ("positive", rf"\b(?:positive|glowing|high(?:ly)?[- ]rated|top[- ]rated){_REVIEWS}"),
+    ("between", rf"\bbetween {_YEAR} and {_YEAR}\b"),
+    ("since", rf"\b(?:since|from|after) {_YEAR} (?:on(?:wards?)?|and later)\b"),
+    ("since", rf"\bsince {_YEAR}\b"),
+    ("after", rf"\bafter {_YEAR}\b"),
+    ("before", rf"\bbefore {_YEAR}\b"),
+    ("month", rf"\b(?:in |from |of |during )?{_MONTH},? {_YEAR}\b"),
+    ("year", rf"\b(?:in |from |during ){_YEAR}\b"),
+    # "reviews of 2024", but not "teams of 2000"
+    ("year", rf"(?:(?<=reviews )|(?<=ratings )|(?<=feedback ))of {_YEAR}\b"),
+    ("year", rf"\b{_YEAR}(?= reviews?\b)"),
+]
+_COMPILED = [(kind, re.compile(pattern, re.IGNORECASE)) for kind, pattern in _PATTERNS]
+_DATE_KINDS = {"between", "since", "after", "before", "month", "year"}
+# Dates are only read as a filter in queries about the reviews: in "a team of
+# 2000 engineers" or "Jira in 2024", the number is not a review date
+_ABOUT_REVIEWS = re.compile(
+    r"\b(?:reviews?|reviewers?|reviewed|ratings?|rated|stars?|feedback)\b",
+    re.IGNORECASE,
+)
+
+
+def parse_review_month(review_date: str) -> int:
+    """"September 2025" -> 202509; 0 when the date cannot be parsed."""
+    match = re.fullmatch(rf"\s*{_MONTH}\s+{_YEAR}\s*", review_date or "", re.IGNORECASE)
+    if match is None:
+        return 0
+    return int(match.group(2)) * 100 + MONTHS[match.group(1).lower()]
+
+
+def chroma_metadata(metadata: dict) -> dict:
+    """
+    Metadata of a document as stored in Chroma: its own, plus the review
+    month (yyyymm, 0 when unknown) that date filters compare against.
+    """
+    return {**metadata, "month": parse_review_month(metadata.get("review_date", ""))}
+
+
+class MetadataFilter(BaseModel):
+    """Inclusive bounds on the rating and on the review month (yyyymm)."""
+
+    min_rating: Optional[float] = None
+    max_rating: Optional[float] = None
+    start_month: Optional[int] = None
+    end_month: Optional[int] = None
+
+    def matches(self, rating: float, month: int) -> bool:
+        return (
+            (self.min_rating is None or rating >= self.min_rating)
+            and (self.max_rating is None or rating <= self.max_rating)
+            and (self.start_month is None or month >= self.start_month)
+            and (self.end_month is None or (0 < month <= self.end_month))
+        )
+
+
+def extract_filter(query: str) -> Tuple[Optional[MetadataFilter], str]:
+    """
+    Extracts rating and date constraints such as "5-star", "negative reviews"
+    or "reviews from 2024" from `query`. Polarities count only right before
+    "reviews" (or "reviewers", "ratings", "feedback"), and dates only in
+    queries about reviews or ratings, so "critical features" or "a team of
+    2000" are left alone. Returns the filter (None without constraints) and
+    the query with the matched phrases removed, for scoring (the whole query
+    when nothing else is left).
+    """
+    original, bounds = query, {}
+    about_reviews = _ABOUT_REVIEWS.search(query) is not None
+    for kind, pattern in _COMPILED:
+        if kind in _DATE_KINDS and not about_reviews:
+            continue
+        match = pattern.search(query)
+        if match is None:
+            continue
+        groups = match.groups()
+        if kind == "stars_at_least":
+            bounds.setdefault("min_rating", float(groups[0]))
+        elif kind == "stars":
+            # Exactly that rating: "4 stars" is not 4.5, "4.5 stars" not 5
+            bounds.setdefault("min_rating", float(groups[0]))
+            bounds.setdefault("max_rating", float(groups[0]))
+        elif kind == "negative":
+            bounds.setdefault("max_rating", 3.0)
+        elif kind == "positive":
+            bounds.setdefault("min_rating", 4.0)
+        elif "start_month" in bounds or "end_month" in bounds:
+            continue  # The first date phrase wins
+        elif kind == "between":
+            bounds["start_month"] = int(groups[0]) * 100 + 1
+            bounds["end_month"] = int(groups[1]) * 100 + 12
+        elif kind == "since":
+            bounds["start_month"] = int(groups[0]) * 100 + 1
+        elif kind == "after":
+            bounds["start_month"] = (int(groups[0]) + 1) * 100 + 1
+        elif kind == "before":
+            bounds["end_month"] = (int(groups[0]) - 1) * 100 + 12
+        elif kind == "month":
+            month = int(groups[1]) * 100 + MONTHS[groups[0].lower()]
+            bounds["start_month"] = bounds["end_month"] = month
+        elif kind == "year":
+            bounds["start_month"] = int(groups[0]) * 100 + 1
+            bounds["end_month"] = int(groups[0]) * 100 + 12
+        query = query[: match.start()] + query[match.end() :]
+    if not bounds:
+        return None, query
+    return MetadataFilter(**bounds), " ".join(query.split()) or original
+
+
+class MetadataIndex:
+    """
+    Rating and review month of every document, in DocStore order, with each
+    field also sorted so a range filter is two binary searches.
+
+    Files in the index directory:
+        ratings.npy / months.npy              per-document values (month is
+                                              yyyymm, 0 when unknown)
+        rating_order.npy / month_order.npy    positions sorted by the value
+        review_ids.npy                        review ids (fixed-width bytes)
+
+    `positions(filter)` returns the sorted positions passing a filter, which
+    the BM25 and dense indexes restrict their scoring to.
+    """
+
+    ARRAY_NAMES = ["ratings", "months", "rating_order", "month_order", "review_ids"]
+
+    def __init__(self, arrays: dict):
+        self.ratings = arrays["ratings"]
+        self.months = arrays["months"]
+        self.rating_order = arrays["rating_order"]
+        self.month_order = arrays["month_order"]
+        self.review_ids = arrays["review_ids"]
+        # Sorted values, for the binary searches
+        self._sorted_ratings = np.asarray(self.ratings[self.rating_order])
+        self._sorted_months = np.asarray(self.months[self.month_order])
+
+    def __len__(self) -> int:
+        return len(self.ratings)
+
+    @staticmethod
+    def _range(sorted_values, order, low, high) -> Optional[np.ndarray]:
+        if low is None and high is None:
+            return None
+        start = 0 if low is None else np.searchsorted(sorted_values, low, side="left")
+        end = (
+            len(sorted_values)
+            if high is None
+            else np.searchsorted(sorted_values, high, side="right")
+        )
+        return np.sort(order[start:end])
+
+    def positions(self, metadata_filter: MetadataFilter) -> np.ndarray:
+        """Sorted positions of the documents passing `metadata_filter`."""
+        start_month = metadata_filter.start_month
+        if metadata_filter.end_month is not None and start_month is None:
+            start_month = 1  # Unknown dates (0) never pass a date filter
+        selections = [
+            self._range(
+                self._sorted_ratings,
+                self.rating_order,
+                metadata_filter.min_rating,
+                metadata_filter.max_rating,
+            ),
+            self._range(
+                self._sorted_months,
+                self.month_order,
+                start_month,
+                metadata_filter.end_month,
+            ),
+        ]
+        selections = [s for s in selections if s is not None]
+        if not selections:
+            return np.arange(len(self))
+        positions = selections[0]
+        for selection in selections[1:]:
+            positions = np.intersect1d(positions, selection, assume_unique=True)
+        return positions
+
+    def restrict(
+        self, query: str
+    ) -> Tuple[str, Optional[MetadataFilter], Optional[np.ndarray]]:
+        """
+        The query left for scoring, the filter extracted from it and the
+        sorted positions passing that filter. Without a constraint, or when
+        no review passes it (e.g. a year the corpus does not cover), the
+        query is searched unfiltered: (query, None, None).
+        """
+        metadata_filter, rest = extract_filter(query)
+        if metadata_filter is None:
+            return query, None, None
+        positions = self.positions(metadata_filter)
+        if len(positions) == 0:
+            log.info(f"No review passes {metadata_filter!r}; searching without it")
+            return query, None, None
+        return rest, metadata_filter, positions
+
+    def mask(self, metadata_filter: MetadataFilter) -> np.ndarray:
+        """Boolean mask over every document of the ones passing the filter."""
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.positions(metadata_filter)] = True
+        return mask
+
+    @staticmethod
+    def where_clause(metadata_filter: MetadataFilter) -> dict:
+        """
+        The filter as a Chroma `where` clause: bounds on the stored `rating`
+        and `month` metadata (see chroma_metadata).
+        """
+        start_month = metadata_filter.start_month
+        if metadata_filter.end_month is not None and start_month is None:
+            start_month = 1  # Unknown dates (0) never pass a date filter
+        bounds = [
+            ("rating", "$gte", metadata_filter.min_rating),
+            ("rating", "$lte", metadata_filter.max_rating),
+            ("month", "$gte", start_month),
+            ("month", "$lte", metadata_filter.end_month),
+        ]
+        clauses = [
+            {field: {operator: value}}
+            for field, operator, value in bounds
+            if value is not None
+        ]
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    @classmethod
+    def build(cls, documents: Iterable[Document]) -> "MetadataIndex":
+        ratings, months, review_ids = [], [], []
+        for doc in documents:
+            ratings.append(float(doc.metadata.get("rating") or 0))
+            months.append(parse_review_month(doc.metadata.get("review_date", "")))
+            review_ids.append(doc.metadata.get("review_id", ""))
+        ratings = np.array(ratings, dtype=np.float32)
+        months = np.array(months, dtype=np.int32)
+        return cls(
+            {
+                "ratings": ratings,
+                "months": months,
+                "rating_order": np.argsort(ratings, kind="stable"),
+                "month_order": np.argsort(months, kind="stable"),
+                "review_ids": np.array(review_ids, dtype="S64"),
+            }
+        )
+
+    def save(self, directory: str):
+        """Writes the index to `directory`, replacing it atomically."""
+        tmp_dir = f"{directory}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name in self.ARRAY_NAMES:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump({"n_docs": len(self)}, f)
+        replace_directory(tmp_dir, directory)
+
+    @classmethod
+    def load(cls, directory: str) -> "MetadataIndex":
+        return cls(
+            {
+                name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                for name in cls.ARRAY_NAMES
+            }
+        )
+
+
+def load_metadata_index(directory: str) -> Optional[MetadataIndex]:
+    """The persisted index, or None (no metadata filtering) when missing."""
+    if not os.path.exists(directory):
+        log.warning(
+            f"No metadata index at {directory}; queries are not filtered by "
+            "rating or date. Run ingest.py to build it."
+        )
+        return None
+    return MetadataIndex.load(directory)
+
+
+def build_metadata_index(docstore_dir: str, index_dir: str):
+    """Indexes the rating and review month of the documents in the DocStore."""
+    with measure_time("Metadata index build", log):
+        MetadataIndex.build(DocStore(docstore_dir)).save(index_dir)
+    log.info(f"Metadata index written to {index_dir}")
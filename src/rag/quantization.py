@@ -0,0 +1,127 @@
+from abc import ABC, abstractmethod
+import numpy as np
+
+
+# Rows scored per step: the chunk decoded to float32 stays in the CPU cache
+CHUNK_ROWS = 2048
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(codes: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(codes)
+    return _POPCOUNT_TABLE[codes]
+
+
+class Quantizer(ABC):
+    """
+    Compact codes for unit-normalized float32 vectors. `scores` ranks rows
+    approximately (higher is more similar); DenseIndex rescores the best
+    candidates with the full-precision vectors.
+    """
+
+    name = None
+
+    def fit(self, sample: np.ndarray):
+        """Learns the code parameters from a sample of the vectors."""
+
+    @abstractmethod
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return
+
+    @abstractmethod
+    def _chunk_scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        return
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """(queries x rows) approximate similarities, computed in row chunks."""
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), CHUNK_ROWS):
+            chunk = codes[start : start + CHUNK_ROWS]
+            scores[:, start : start + len(chunk)] = self._chunk_scores(chunk, queries)
+        return scores
+
+    def state(self) -> dict:
+        """Arrays to persist next to the codes."""
+        return {}
+
+    def load_state(self, state: dict):
+        pass
+
+
+class Float16Quantizer(Quantizer):
+    """Half-precision vectors: 2 bytes per dimension."""
+
+    name = "float16"
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float16)
+
+    def _chunk_scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        return queries @ codes.astype(np.float32).T
+
+
+class Int8Quantizer(Quantizer):
+    """
+    Symmetric per-dimension scalar quantization: 1 byte per dimension. With
+    x ~ scale * code, the dot product q.x is approximated by (q * scale).code.
+    """
+
+    name = "int8"
+
+    def __init__(self):
+        self.scale = None
+
+    def fit(self, sample: np.ndarray):
+        self.scale = np.abs(sample).max(axis=0).astype(np.float32) / 127.0
+        self.scale[self.scale == 0] = 1.0
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def _chunk_scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        return (queries * self.scale) @ codes.astype(np.float32).T
+
+    def state(self) -> dict:
+        return {"scale": self.scale}
+
+    def load_state(self, state: dict):
+        self.scale = np.asarray(state["scale"], dtype=np.float32)
+
+
+class BinaryQuantizer(Quantizer):
+    """
+    Sign bits packed 8 per byte: 1 bit per dimension. Rows are ranked by
+    Hamming distance to the query's sign bits.
+    """
+
+    name = "binary"
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+    def _chunk_scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        query_codes = self.encode(queries)
+        n_bits = codes.shape[1] * 8
+        return np.stack(
+            [
+                n_bits
+                - _popcount(np.bitwise_xor(codes, query_code)).sum(axis=1, dtype=np.int32)
+                for query_code in query_codes
+            ]
+        ).astype(np.float32)
+
+
+QUANTIZERS = {
+    quantizer.name: quantizer
+    for quantizer in (Float16Quantizer, Int8Quantizer, BinaryQuantizer)
+}
+
+
+def get_quantizer(name: str) -> Quantizer:
+    if name not in QUANTIZERS:
+        raise ValueError(
+            f"Unknown quantization: {name} (expected float32 or one of {list(QUANTIZERS)})"
+        )
+    return QUANTIZERS[name]()
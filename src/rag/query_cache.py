@@ -0,0 +1,284 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Optional
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from src.common import config
+from src.common.logger import log
+from src.rag.manifest import IngestManifest
+from src.rag.metadata_index import extract_filter
+import numpy as np
+import os
+import time
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the question."""
+    return " ".join(query.lower().split()).strip(" ?!.")
+
+
+class TtlLruCache:
+    """Thread-safe LRU mapping whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key):
+        """Like `get`, without counting the lookup or refreshing the entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                return None
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SemanticAnswerCache:
+    """
+    Answers of previous queries, returned for a new query whose embedding has
+    a cosine similarity of at least `threshold` with a cached query stored
+    under the same `key` (e.g. the query's metadata filter).
+
+    Unit-normalized query embeddings are kept in one matrix, so a lookup is a
+    single matrix-vector product over the cached queries.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._vectors = None
+        # slot -> (query, key, answer, expires_at), least recently used first
+        self._entries = OrderedDict()
+        self._free_slots = list(range(max_entries))
+        self._lock = Lock()
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, embedding, key=None) -> Optional[str]:
+        with self._lock:
+            now = time.monotonic()
+            for slot in [s for s, entry in self._entries.items() if entry[3] < now]:
+                del self._entries[slot]
+                self._free_slots.append(slot)
+            candidates = [s for s, entry in self._entries.items() if entry[1] == key]
+            if candidates:
+                slots = np.array(candidates, dtype=np.int64)
+                similarities = self._vectors[slots] @ self._unit(embedding)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    slot = int(slots[best])
+                    self._entries.move_to_end(slot)
+                    self.hits += 1
+                    log.info(
+                        f"Semantic cache hit ({similarities[best]:.3f}) "
+                        f"for cached query '{self._entries[slot][0]}'"
+                    )
+                    return self._entries[slot][2]
+            self.misses += 1
+            return None
+
+    def put(self, query: str, embedding, answer: str, key=None):
+        with self._lock:
+            vector = self._unit(embedding)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), np.float32)
+            if self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                slot, _ = self._entries.popitem(last=False)
+            self._vectors[slot] = vector
+            self._entries[slot] = (query, key, answer, time.monotonic() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._free_slots = list(range(self.max_entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CorpusVersion:
+    """Version of the ingested corpus, re-read when the manifest changes."""
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = manifest_path
+        self._mtime = None
+        self._version = None
+
+    def current(self) -> Optional[str]:
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) != self._mtime:
+            self._mtime = (stat.st_mtime_ns, stat.st_size)
+            self._version = IngestManifest.load(self.manifest_path).corpus_version
+        return self._version
+
+
+class QueryCache:
+    """
+    Two-tier cache in front of the RAG chain.
+
+    - Tier 1, exact match: normalized query -> query embedding and the
+      retrieved documents, so a repeated question is neither re-embedded nor
+      re-retrieved.
+    - Tier 2, semantic (optional): a stored answer is returned for a query
+      close enough to a previously answered one with the same rating and
+      date filter, so "negative reviews from 2024" never gets the answer
+      about 2023.
+
+    Both tiers expire entries after their TTL and are cleared when ingestion
+    changes the corpus (the manifest's corpus version).
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        retrieval_cache: TtlLruCache,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        corpus_version: Optional[CorpusVersion] = None,
+    ):
+        self.embeddings = embeddings
+        self.retrieval_cache = retrieval_cache
+        self.answer_cache = answer_cache
+        self.corpus_version = corpus_version
+        self._version = corpus_version.current() if corpus_version else None
+
+    @classmethod
+    def from_config(cls, embeddings: Embeddings) -> "QueryCache":
+        return cls(
+            embeddings,
+            TtlLruCache(
+                config.RETRIEVAL_CACHE_MAX_ENTRIES, config.RETRIEVAL_CACHE_TTL_SECONDS
+            ),
+            (
+                SemanticAnswerCache(
+                    config.ANSWER_CACHE_MAX_ENTRIES,
+                    config.ANSWER_CACHE_TTL_SECONDS,
+                    config.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+                )
+                if config.ANSWER_CACHE_ENABLED
+                else None
+            ),
+            CorpusVersion(config.INGEST_MANIFEST_PATH),
+        )
+
+    def _check_corpus_version(self):
+        if self.corpus_version is None:
+            return
+        version = self.corpus_version.current()
+        if version != self._version:
+            log.info(f"Corpus changed ({self._version} -> {version}); clearing query caches")
+            self.retrieval_cache.clear()
+            if self.answer_cache is not None:
+                self.answer_cache.clear()
+            self._version = version
+
+    def _entry(self, query: str, count: bool = True) -> dict:
+        self._check_corpus_version()
+        key = normalize_query(query)
+        entry = (
+            self.retrieval_cache.get(key) if count else self.retrieval_cache.peek(key)
+        )
+        return entry or {}
+
+    def embedding(self, query: str) -> List[float]:
+        entry = self._entry(query)
+        if "embedding" not in entry:
+            entry = {**entry, "embedding": self.embeddings.embed_query(query)}
+            self.retrieval_cache.put(normalize_query(query), entry)
+        return entry["embedding"]
+
+    async def aembedding(self, query: str) -> List[float]:
+        entry = self._entry(query)
+        if "embedding" not in entry:
+            entry = {**entry, "embedding": await self.embeddings.aembed_query(query)}
+            self.retrieval_cache.put(normalize_query(query), entry)
+        return entry["embedding"]
+
+    def documents(self, query: str, count: bool = False) -> Optional[List[Document]]:
+        """
+        Cached documents of the query. Only counted as a lookup with `count`,
+        as the request path has already looked the query up for its embedding.
+        """
+        return self._entry(query, count).get("documents")
+
+    def put_documents(self, query: str, documents: List[Document]):
+        entry = self.retrieval_cache.peek(normalize_query(query)) or {}
+        self.retrieval_cache.put(
+            normalize_query(query), {**entry, "documents": documents}
+        )
+
+    @staticmethod
+    def _answer_key(query: str) -> Optional[str]:
+        """Answers are only shared between queries with the same filter."""
+        metadata_filter, _ = extract_filter(query)
+        return None if metadata_filter is None else metadata_filter.model_dump_json()
+
+    def answer(self, query: str, embedding) -> Optional[str]:
+        if self.answer_cache is None:
+            return None
+        self._check_corpus_version()
+        return self.answer_cache.get(embedding, self._answer_key(query))
+
+    def put_answer(self, query: str, embedding, answer: str):
+        if self.answer_cache is not None:
+            self.answer_cache.put(
+                normalize_query(query), embedding, answer, self._answer_key(query)
+            )
+
+    def stats(self) -> dict:
+        stats = {
+            "retrieval": {
+                "hits": self.retrieval_cache.hits,
+                "misses": self.retrieval_cache.misses,
+                "entries": len(self.retrieval_cache),
+            },
+        }
+        if self.answer_cache is not None:
+            stats["answer"] = {
+                "hits": self.answer_cache.hits,
+                "misses": self.answer_cache.misses,
+                "entries": len(self.answer_cache),
+            }
+        return stats
@@ -1,7 +1,15 @@
-from src.common.utils import measure_time
+from src.common.utils import lazy, measure_time
 from src.rag.retriever import create_ensemble_retriever
-from src.rag.chain import LcGeneration
+from src.rag.chain import FALLBACK_ANSWER, LcGeneration
 from src.common.logger import log
+from src.common import config
+from src.rag.embeddings import HfEmbedder
+from src.rag.query_cache import QueryCache
+from typing import AsyncIterator, Iterator
+import time
+
+
+ERROR_ANSWER = "An error occurred while processing your request."
 
 
 class RAGExecutor:
@@ -12,35 +20,172 @@ class RAGExecutor:
     and retrievers to be used throughout the application's lifecycle.
     """
 
-    _instance = None
-    _initialized = False
+    def __init__(self, retriever=None, llm=None, embeddings=None, query_cache=None):
+        """
+        Initializes the RAG components. The retriever and the LLM can be
+        injected (e.g. offline fakes for tests and load tests); by default the
+        ensemble retriever and the configured LLM are used.
 
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            cls._instance = super(RAGExecutor, cls).__new__(cls)
-        return cls._instance
+        With QUERY_CACHE_ENABLED, repeated questions (and near-duplicate ones,
+        with ANSWER_CACHE_ENABLED) are served from a QueryCache built on
+        `embeddings` (the shared embedding model by default). With an injected
+        retriever and no embeddings, no cache is used unless `query_cache` is
+        given.
+        """
+        log.info("Initializing JiraRAGExecutor...")
+        self.ensemble_retriever = (
+            retriever if retriever is not None else create_ensemble_retriever()
+        )
+        # The generator builds the LLM client and the RAG chain once per process
+        self.generator = LcGeneration(retriever=self.ensemble_retriever, llm=llm)
+        self.query_cache = query_cache
+        if query_cache is None and config.QUERY_CACHE_ENABLED:
+            if embeddings is None and retriever is None:
+                embeddings = HfEmbedder().get_embeder()
+            if embeddings is not None:
+                self.query_cache = QueryCache.from_config(embeddings)
 
-    def __init__(self):
+    def _cached(self, query: str, documents):
         """
-        Initializes the RAG components. This is done only once.
+        Looks the query up in the cache: returns the cached answer (or None),
+        the query embedding and the documents to answer from.
         """
-        if self._initialized:
-            return
+        if self.query_cache is None:
+            return None, None, documents
+        embedding = self.query_cache.embedding(query)
+        answer = self.query_cache.answer(query, embedding)
+        if answer is None and documents is None:
+            documents = self._retrieve(query, count=False)
+        return answer, embedding, documents
 
-        log.info("Initializing JiraRAGExecutor...")
-        self.ensemble_retriever = create_ensemble_retriever()
-        self.generator = LcGeneration()
-        self._initialized = True
+    async def _acached(self, query: str, documents):
+        if self.query_cache is None:
+            return None, None, documents
+        embedding = await self.query_cache.aembedding(query)
+        answer = self.query_cache.answer(query, embedding)
+        if answer is None and documents is None:
+            documents = await self._aretrieve(query, count=False)
+        return answer, embedding, documents
+
+    def _store_answer(self, query: str, embedding, answer: str):
+        # Fallback and error texts are not answers to the question
+        if not answer.strip() or answer in (FALLBACK_ANSWER, ERROR_ANSWER):
+            return
+        if self.query_cache is not None:
+            self.query_cache.put_answer(query, embedding, answer)
+            log.opt(lazy=True).debug("Query cache stats: {}", self.query_cache.stats)
 
-    def get_response(self, query: str) -> str:
+    def get_response(self, query: str, documents=None) -> str:
         try:
             log.info(f"Invoking RAG chain with query: '{query}'")
-            return self.generator.generate_response(
-                retriever=self.ensemble_retriever, query=query
-            )
+            answer, embedding, documents = self._cached(query, documents)
+            if answer is None:
+                answer = self.generator.invoke(query=query, documents=documents)
+                self._store_answer(query, embedding, answer)
+            return answer
         except Exception as e:
             log.error(f"Failed to get RAG response: {e}")
-            return "An error occurred while processing your request."
+            return ERROR_ANSWER
+
+    async def aget_response(self, query: str, documents=None) -> str:
+        try:
+            log.info(f"Invoking async RAG chain with query: '{query}'")
+            answer, embedding, documents = await self._acached(query, documents)
+            if answer is None:
+                answer = await self.generator.ainvoke(query=query, documents=documents)
+                self._store_answer(query, embedding, answer)
+            return answer
+        except Exception as e:
+            log.error(f"Failed to get async RAG response: {e}")
+            return ERROR_ANSWER
+
+    def stream_response(
+        self, query: str, config=None, documents=None
+    ) -> Iterator[str]:
+        """
+        Streams the RAG answer token by token. Already retrieved `documents`
+        (e.g. from speculative retrieval) skip the retrieval step. A cached
+        answer is yielded in one piece.
+        """
+        try:
+            log.info(f"Streaming RAG chain with query: '{query}'")
+            start = time.perf_counter()
+            answer, embedding, documents = self._cached(query, documents)
+            if answer is not None:
+                yield answer
+                return
+            tokens = []
+            for i, token in enumerate(
+                self.generator.stream(query=query, config=config, documents=documents)
+            ):
+                if i == 0:
+                    log.info(
+                        f"RAG time to first token: {time.perf_counter() - start:.2f} seconds"
+                    )
+                tokens.append(token)
+                yield token
+            self._store_answer(query, embedding, "".join(tokens))
+        except Exception as e:
+            log.error(f"Failed to stream RAG response: {e}")
+            yield ERROR_ANSWER
+
+    async def astream_response(
+        self, query: str, config=None, documents=None
+    ) -> AsyncIterator[str]:
+        """Streams the RAG answer token by token without blocking the event loop."""
+        try:
+            log.info(f"Async streaming RAG chain with query: '{query}'")
+            start = time.perf_counter()
+            answer, embedding, documents = await self._acached(query, documents)
+            if answer is not None:
+                yield answer
+                return
+            tokens = []
+            async for token in self.generator.astream(
+                query=query, config=config, documents=documents
+            ):
+                if not tokens:
+                    log.info(
+                        f"RAG time to first token: {time.perf_counter() - start:.2f} seconds"
+                    )
+                tokens.append(token)
+                yield token
+            self._store_answer(query, embedding, "".join(tokens))
+        except Exception as e:
+            log.error(f"Failed to stream async RAG response: {e}")
+            yield ERROR_ANSWER
+
+    def _retrieve(self, query: str, count: bool = True):
+        if self.query_cache is not None:
+            documents = self.query_cache.documents(query, count=count)
+            if documents is not None:
+                return documents
+        with measure_time("Ensemble retrieval", log):
+            documents = self.ensemble_retriever.invoke(query)
+        if self.query_cache is not None:
+            self.query_cache.put_documents(query, documents)
+        return documents
+
+    async def _aretrieve(self, query: str, count: bool = True):
+        if self.query_cache is not None:
+            documents = self.query_cache.documents(query, count=count)
+            if documents is not None:
+                return documents
+        with measure_time("Async ensemble retrieval", log):
+            documents = await self.ensemble_retriever.ainvoke(query)
+        if self.query_cache is not None:
+            self.query_cache.put_documents(query, documents)
+        return documents
+
+    def retrieve(self, query: str):
+        return self._retrieve(query)
+
+    async def aretrieve(self, query: str):
+        """Retrieves documents without blocking the event loop."""
+        return await self._aretrieve(query)
 
 
-jira_rag_agent = RAGExecutor()
+@lazy
+def get_rag_agent() -> RAGExecutor:
+    """Returns the process-wide RAGExecutor, creating it on first use."""
+    return RAGExecutor()
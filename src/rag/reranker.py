@@ -0,0 +1,65 @@
+from abc import ABC, abstractmethod
+from threading import Lock
+from typing import List
+from langchain_core.documents import Document
+from src.common import config
+from src.common.logger import log
+from src.common.utils import measure_time
+
+
+class Reranker(ABC):
+    def __init__(self):
+        super().__init__()
+
+    def load(self):
+        """Loads the model ahead of the first query; a no-op by default."""
+        return
+
+    @abstractmethod
+    def score(self, query: str, documents: List[Document]) -> List[float]:
+        """Relevance of each document to the query; higher is more relevant."""
+        return
+
+
+class CrossEncoderReranker(Reranker):
+    """
+    Scores (query, review) pairs with a small sentence-transformers
+    cross-encoder on the CPU, all candidates in one batched forward pass.
+    The model is loaded on first use.
+    """
+
+    def __init__(
+        self,
+        model_name: str = config.RERANK_MODEL_NAME,
+        max_length: int = config.RERANK_MAX_LENGTH,
+        device: str = config.MODEL_KWARGS["device"],
+    ):
+        super().__init__()
+        self.model_name = model_name
+        self.max_length = max_length
+        self.device = device
+        self._model = None
+        self._lock = Lock()
+
+    def load(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                log.info(f"Loading reranking model {self.model_name}...")
+                with measure_time("reranking model loading", log):
+                    self._model = CrossEncoder(
+                        self.model_name, max_length=self.max_length, device=self.device
+                    )
+        return self._model
+
+    def score(self, query: str, documents: List[Document]) -> List[float]:
+        if not documents:
+            return []
+        model = self.load()
+        scores = model.predict(
+            [(query, doc.page_content) for doc in documents],
+            batch_size=len(documents),
+            show_progress_bar=False,
+        )
+        return [float(score) for score in scores]
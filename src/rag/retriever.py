@@ -1,10 +1,31 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from threading import Event
+from typing import Any, Dict, List, Optional
 from langchain.retrievers import EnsembleRetriever
-from langchain_community.retrievers import BM25Retriever
-from src.common.utils import load_reviews_documents
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import patch_config
+from langchain_core.vectorstores import VectorStoreRetriever
+from pydantic import PrivateAttr
+from src.common.utils import LatencyStats, load_reviews_documents
 from src.rag.vector_stores import load_vector_store
+from src.rag.bm25_index import Bm25IndexRetriever
+from src.rag.dense_index import DenseIndexVectorStore
+from src.rag.fusion import ScoreFusion, get_fusion, scored_results, with_score
+from src.rag.metadata_index import MetadataIndex, load_metadata_index
+from src.rag.reranker import CrossEncoderReranker, Reranker
 from src.common import config
 from src.common.logger import log
+import asyncio
+import os
+import time
 
 
 class DenseRetriever(ABC):
@@ -25,15 +46,71 @@ class SparseRetriever(ABC):
         return
 
 
+class ScoredVectorStoreRetriever(VectorStoreRetriever):
+    """
+    Similarity search whose documents carry their relevance score (see
+    `fusion.with_score`), for score-based fusion.
+
+    With a `metadata_index`, rating and date constraints in the query are
+    pushed down into the search: the NumPy store scores only the matching
+    rows, Chroma gets them as a `where` filter. A filter no review passes is
+    ignored.
+    """
+
+    metadata_index: Optional[MetadataIndex] = None
+
+    def _search_kwargs(self, query: str, kwargs: dict) -> tuple:
+        """The query left for scoring and the search kwargs."""
+        search_kwargs = {**self.search_kwargs, **kwargs}
+        if self.metadata_index is None:
+            return query, search_kwargs
+        query, metadata_filter, rows = self.metadata_index.restrict(query)
+        if metadata_filter is None:
+            return query, search_kwargs
+        if isinstance(self.vectorstore, DenseIndexVectorStore):
+            search_kwargs["rows"] = rows
+        else:
+            search_kwargs["filter"] = self.metadata_index.where_clause(metadata_filter)
+        return query, search_kwargs
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, **kwargs: Any
+    ) -> List[Document]:
+        query, search_kwargs = self._search_kwargs(query, kwargs)
+        docs_and_scores = self.vectorstore._similarity_search_with_relevance_scores(
+            query, **search_kwargs
+        )
+        return [with_score(doc, score) for doc, score in docs_and_scores]
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        **kwargs: Any,
+    ) -> List[Document]:
+        query, search_kwargs = self._search_kwargs(query, kwargs)
+        docs_and_scores = await self.vectorstore._asimilarity_search_with_relevance_scores(
+            query, **search_kwargs
+        )
+        return [with_score(doc, score) for doc, score in docs_and_scores]
+
+
 class ChromaRetriever(DenseRetriever):
     def __init__(self):
         super().__init__()
 
-    def get_retriever(self, vector_store):
-        retriever = vector_store.as_retriever(
+    def get_retriever(self, vector_store, k=None):
+        retriever = ScoredVectorStoreRetriever(
+            vectorstore=vector_store,
             search_kwargs={
-                "k": config.DENSE_RETRIEVED_DOCUMENTS,
-            }
+                "k": k or config.DENSE_RETRIEVED_DOCUMENTS,
+            },
+            metadata_index=(
+                load_metadata_index(config.METADATA_INDEX_DIRECTORY)
+                if config.METADATA_FILTERING
+                else None
+            ),
         )
         return retriever
 
@@ -42,34 +119,300 @@ class Bm25Retriever(SparseRetriever):
     def __init__(self):
         super().__init__()
 
-    def get_retriever(self, documents):
-        retriever = BM25Retriever.from_documents(
-            documents,
-            k=config.SPARSE_RETRIEVED_DOCUMENTS,
+    def get_retriever(self, documents=None, k=None):
+        """
+        Returns a retriever over the persisted BM25 index written by ingest.py,
+        which is memory-mapped lazily on the first query. Without a persisted
+        index, the same vectorized BM25 index is built in memory from
+        `documents` (or the reviews file).
+        """
+        if os.path.exists(config.BM25_INDEX_DIRECTORY) and documents is None:
+            log.info(f"Using persisted BM25 index at {config.BM25_INDEX_DIRECTORY}")
+            return Bm25IndexRetriever(
+                index_directory=config.BM25_INDEX_DIRECTORY,
+                docstore_directory=config.DOCSTORE_DIRECTORY,
+                metadata_index_directory=(
+                    config.METADATA_INDEX_DIRECTORY if config.METADATA_FILTERING else None
+                ),
+                k=k or config.SPARSE_RETRIEVED_DOCUMENTS,
+            )
+
+        if documents is None:
+            log.warning(
+                f"No BM25 index at {config.BM25_INDEX_DIRECTORY}; building it in "
+                "memory. Run ingest.py to persist it."
+            )
+        retriever = Bm25IndexRetriever.from_documents(
+            documents if documents is not None else load_reviews_documents(),
+            metadata_filtering=config.METADATA_FILTERING,
+            k=k or config.SPARSE_RETRIEVED_DOCUMENTS,
         )
         return retriever
 
 
-def create_ensemble_retriever() -> EnsembleRetriever:
+class ParallelEnsembleRetriever(EnsembleRetriever):
     """
-    Creates and returns an EnsembleRetriever combining a dense and a sparse retriever.
+    EnsembleRetriever that queries its child retrievers concurrently, on a
+    thread pool (sync path) or the event loop (async path), so retrieval
+    takes as long as the slowest child rather than the sum of all of them.
+
+    A child that fails or does not answer within `timeout` seconds
+    contributes no documents; the others are still fused. Only when every
+    child fails is the error raised. Per-child latencies are logged and
+    summarized by `latency_stats()`.
+
+    On the sync path the `max_workers` threads are shared by concurrent
+    requests. The timeout of a search starts when it gets a thread, not when
+    it is queued, so a busy pool makes requests slower but does not drop
+    their searches as timed out.
+
+    Results are merged by `fusion` (weighted RRF by default), which
+    deduplicates by review id and keeps at most `k` documents.
+    """
+
+    timeout: Optional[float] = None
+    names: Optional[List[str]] = None
+    max_workers: int = 8
+    fusion: Optional[ScoreFusion] = None
+    k: Optional[int] = None
+
+    _executor: ThreadPoolExecutor = PrivateAttr()
+    _latencies: LatencyStats = PrivateAttr()
+
+    def model_post_init(self, __context: Any):
+        super().model_post_init(__context)
+        if self.names is None:
+            self.names = [
+                f"{retriever.get_name()}_{i + 1}"
+                for i, retriever in enumerate(self.retrievers)
+            ]
+        # Timed-out searches cannot be cancelled and keep their thread until
+        # they return, hence more threads than retrievers
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="ensemble-retrieval"
+        )
+        self._latencies = LatencyStats(self.names)
+        if self.fusion is None:
+            self.fusion = get_fusion("rrf", self.weights, c=self.c)
+
+    def latency_stats(self) -> Dict[str, dict]:
+        return self._latencies.summary()
+
+    @staticmethod
+    def _as_documents(docs) -> List[Document]:
+        return [
+            doc if isinstance(doc, Document) else Document(page_content=doc)
+            for doc in docs
+        ]
+
+    def _fuse(self, results: list, latencies_ms: list) -> List[Document]:
+        """`results` holds each child's documents, or the exception it raised."""
+        doc_lists = []
+        for name, result, latency_ms in zip(self.names, results, latencies_ms):
+            if isinstance(result, BaseException):
+                timed_out = isinstance(result, TimeoutError)
+                outcome = "timeouts" if timed_out else "errors"
+                log.warning(
+                    f"Retriever {name} {'timed out' if timed_out else 'failed'} "
+                    f"after {latency_ms:.1f} ms: {result!r}"
+                )
+                doc_lists.append([])
+            else:
+                outcome = "ok"
+                doc_lists.append(self._as_documents(result))
+            self._latencies.record(name, latency_ms, outcome)
+        log.info(
+            "Ensemble retrieval: "
+            + ", ".join(f"{n} {ms:.1f} ms" for n, ms in zip(self.names, latencies_ms))
+        )
+        if all(isinstance(result, BaseException) for result in results):
+            raise results[0]
+        return self.fusion.fuse(scored_results(doc_lists), self.k)
 
-    Args:
-        vectorstore: The Chroma vector store for dense retrieval.
-        documents: The list of documents for initializing the sparse retriever.
-        weights: A list of two floats to weigh the dense and sparse retrievers.
+    def rank_fusion(
+        self,
+        query: str,
+        run_manager: CallbackManagerForRetrieverRun,
+        *,
+        config: Optional[RunnableConfig] = None,
+    ) -> List[Document]:
+        def timed(i, retriever):
+            starts[i] = time.perf_counter()
+            started[i].set()
+            child_config = patch_config(
+                config, callbacks=run_manager.get_child(tag=f"retriever_{i + 1}")
+            )
+            try:
+                return retriever.invoke(query, child_config)
+            finally:
+                finished[i] = (time.perf_counter() - starts[i]) * 1000
+
+        starts, finished = {}, {}
+        started = [Event() for _ in self.retrievers]
+        futures = [
+            self._executor.submit(timed, i, retriever)
+            for i, retriever in enumerate(self.retrievers)
+        ]
+        results, latencies_ms = [], []
+        for i, future in enumerate(futures):
+            # Time spent queued for a thread does not count against the timeout
+            started[i].wait()
+            if self.timeout is not None:
+                remaining = starts[i] + self.timeout - time.perf_counter()
+                wait([future], timeout=max(0.0, remaining))
+            else:
+                wait([future])
+            if not future.done():
+                results.append(TimeoutError(f"no result within {self.timeout} s"))
+                latencies_ms.append((time.perf_counter() - starts[i]) * 1000)
+            else:
+                results.append(future.exception() or future.result())
+                latencies_ms.append(finished[i])
+        return self._fuse(results, latencies_ms)
+
+    async def arank_fusion(
+        self,
+        query: str,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        *,
+        config: Optional[RunnableConfig] = None,
+    ) -> List[Document]:
+        async def timed(i, retriever):
+            start = time.perf_counter()
+            child_config = patch_config(
+                config, callbacks=run_manager.get_child(tag=f"retriever_{i + 1}")
+            )
+            try:
+                result = await asyncio.wait_for(
+                    retriever.ainvoke(query, child_config), self.timeout
+                )
+            except Exception as e:
+                result = e
+            return result, (time.perf_counter() - start) * 1000
+
+        timed_results = await asyncio.gather(
+            *[timed(i, retriever) for i, retriever in enumerate(self.retrievers)]
+        )
+        results, latencies_ms = zip(*timed_results)
+        return self._fuse(list(results), list(latencies_ms))
+
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Reranks the candidates of `retriever` with `reranker` and keeps the best
+    `top_n`.
+
+    Scoring runs on a worker thread under a `timeout` budget: when it fails
+    or runs over, the first `top_n` candidates are kept in the retriever's
+    (fused) order. The reranking model is loaded in the background as soon
+    as the retriever is created.
+    """
+
+    retriever: Any
+    reranker: Reranker
+    top_n: int = 4
+    timeout: Optional[float] = None
+
+    _executor: ThreadPoolExecutor = PrivateAttr()
+    _latencies: LatencyStats = PrivateAttr()
+
+    def model_post_init(self, __context: Any):
+        super().model_post_init(__context)
+        # A timed-out batch cannot be interrupted and keeps its thread
+        self._executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="reranking"
+        )
+        self._latencies = LatencyStats(["reranker"])
+        self._executor.submit(self.reranker.load)
+
+    def latency_stats(self) -> Dict[str, dict]:
+        return self._latencies.summary()
+
+    def _select(
+        self, candidates: List[Document], scores, latency_ms: float
+    ) -> List[Document]:
+        """`scores` holds the reranker's scores, or the exception it raised."""
+        if isinstance(scores, BaseException):
+            timed_out = isinstance(
+                scores, (TimeoutError, FutureTimeoutError, asyncio.TimeoutError)
+            )
+            self._latencies.record(
+                "reranker", latency_ms, "timeouts" if timed_out else "errors"
+            )
+            log.warning(
+                f"Reranking {'timed out' if timed_out else 'failed'} after "
+                f"{latency_ms:.1f} ms ({scores!r}); keeping the fused order."
+            )
+            return candidates[: self.top_n]
+        self._latencies.record("reranker", latency_ms)
+        log.info(f"Reranked {len(candidates)} candidates in {latency_ms:.1f} ms")
+        order = sorted(range(len(candidates)), key=lambda i: -scores[i])
+        return [candidates[i] for i in order[: self.top_n]]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        candidates = self.retriever.invoke(
+            query, {"callbacks": run_manager.get_child()}
+        )
+        start = time.perf_counter()
+        future = self._executor.submit(self.reranker.score, query, candidates)
+        try:
+            scores = future.result(timeout=self.timeout)
+        except Exception as e:
+            scores = e
+        return self._select(candidates, scores, (time.perf_counter() - start) * 1000)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        candidates = await self.retriever.ainvoke(
+            query, {"callbacks": run_manager.get_child()}
+        )
+        start = time.perf_counter()
+        future = self._executor.submit(self.reranker.score, query, candidates)
+        try:
+            scores = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except Exception as e:
+            scores = e
+        return self._select(candidates, scores, (time.perf_counter() - start) * 1000)
+
+
+def create_ensemble_retriever():
+    """
+    Creates and returns a ParallelEnsembleRetriever combining the dense and
+    the sparse retriever, queried concurrently. With RERANK_ENABLED, the
+    retrievers over-fetch RERANK_CANDIDATES and the ensemble is wrapped in a
+    cross-encoder RerankingRetriever.
 
     Returns:
-        An configured EnsembleRetriever.
+        A configured ParallelEnsembleRetriever (or RerankingRetriever).
     """
 
-    sparse_retriever = Bm25Retriever().get_retriever(documents=load_reviews_documents())
-    dense_retriever = ChromaRetriever().get_retriever(vector_store=load_vector_store())
+    candidates = config.RERANK_CANDIDATES if config.RERANK_ENABLED else None
+    sparse_retriever = Bm25Retriever().get_retriever(k=candidates)
+    dense_retriever = ChromaRetriever().get_retriever(
+        vector_store=load_vector_store(), k=candidates
+    )
 
-    ensemble_retriever = EnsembleRetriever(
+    fusion_kwargs = {"c": config.FUSION_RRF_C} if config.FUSION_METHOD == "rrf" else {}
+    ensemble_retriever = ParallelEnsembleRetriever(
         retrievers=[dense_retriever, sparse_retriever],
-    weights=config.ENSEMBLE_RETRIEVER_WEIGHTS,
+        weights=config.ENSEMBLE_RETRIEVER_WEIGHTS,
+        names=["dense", "sparse"],
+        timeout=config.RETRIEVER_TIMEOUT_SECONDS,
+        fusion=get_fusion(
+            config.FUSION_METHOD, config.ENSEMBLE_RETRIEVER_WEIGHTS, **fusion_kwargs
+        ),
+        k=candidates or config.FUSED_RETRIEVED_DOCUMENTS,
     )
 
     log.info("Ensemble retriever created successfully.")
+    if config.RERANK_ENABLED:
+        return RerankingRetriever(
+            retriever=ensemble_retriever,
+            reranker=CrossEncoderReranker(),
+            top_n=config.RERANK_TOP_N,
+            timeout=config.RERANK_TIMEOUT_SECONDS,
+        )
     return ensemble_retriever
@@ -2,8 +2,8 @@ from abc import ABC, abstractmethod
 from src.common import config
 from src.common.logger import log
 from src.common.utils import measure_time
-from langchain_community.vectorstores import Chroma
 from src.rag.embeddings import HfEmbedder
+from src.rag.dense_index import DenseIndexVectorStore
 import os
 
 
@@ -21,6 +21,8 @@ class ChromaVectorStore(VectorStores):
         super().__init__()
 
     def load(self, embeddings):
+        from langchain_community.vectorstores import Chroma
+
         if not os.path.exists(config.DB_PERSIST_DIRECTORY):
             raise FileNotFoundError(
                 f"Chroma DB directory not found at '{config.DB_PERSIST_DIRECTORY}'. "
@@ -40,10 +42,36 @@ class ChromaVectorStore(VectorStores):
             raise
 
 
-def load_vector_store(store_type="chroma"):
-    embeddings = HfEmbedder().get_embeder()
-    if store_type:
-        vector_store = ChromaVectorStore().load(embeddings=embeddings)
-    else:
+class NumpyVectorStore(VectorStores):
+    """Exact search over the memory-mapped dense index written by ingest.py."""
+
+    def __init__(self):
+        super().__init__()
+
+    def load(self, embeddings):
+        if not os.path.exists(config.DENSE_INDEX_DIRECTORY):
+            raise FileNotFoundError(
+                f"Dense index not found at '{config.DENSE_INDEX_DIRECTORY}'. "
+                "Please run the ingestion script first (ingest.py)."
+            )
+        log.info(f"Using dense index at {config.DENSE_INDEX_DIRECTORY}...")
+        return DenseIndexVectorStore(
+            embeddings,
+            index_directory=config.DENSE_INDEX_DIRECTORY,
+            docstore_directory=config.DOCSTORE_DIRECTORY,
+        )
+
+
+VECTOR_STORES = {
+    "chroma": ChromaVectorStore,
+    "numpy": NumpyVectorStore,
+}
+
+
+def load_vector_store(store_type=None):
+    """Loads the `store_type` vector store (VECTOR_STORE_TYPE by default)."""
+    store_type = store_type or config.VECTOR_STORE_TYPE
+    if store_type not in VECTOR_STORES:
         raise ValueError(f"Unknown vector store type: {store_type}")
-    return vector_store
+    embeddings = HfEmbedder().get_embeder()
+    return VECTOR_STORES[store_type]().load(embeddings=embeddings)
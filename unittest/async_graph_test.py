@@ -0,0 +1,93 @@
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import MemorySaver
+from src.bot.graph import GraphBuilder
+from src.bot.router import build_router
+from src.rag.llms import FakeLLM
+from src.rag.rag_executor import RAGExecutor
+import asyncio
+import pytest
+import time
+
+
+DOCUMENTS = [
+    Document(
+        page_content="pros: Great for sprints.",
+        metadata={"author": "Test A.", "review_date": "June 2024", "rating": 5.0},
+    )
+]
+
+
+async def aretrieve(query):
+    return DOCUMENTS
+
+
+def build_graph(route: str, latency: float = 0.0):
+    llm = FakeLLM(latency=latency, route=route).get_llm()
+    retriever = RunnableLambda(lambda query: DOCUMENTS, afunc=aretrieve)
+    return GraphBuilder.build_graph(
+        chat_model=llm,
+        rag_agent=RAGExecutor(retriever=retriever, llm=llm),
+        router=build_router("llm", chat_model=llm),
+        speculative_retrieval=False,
+        checkpointer=MemorySaver(),
+    )
+
+
+def request(query: str = "Is Jira good for agile teams?"):
+    return {"messages": [HumanMessage(content=query)]}
+
+
+def thread(thread_id: str = "t"):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+@pytest.mark.parametrize("route", ["rag", "chat"])
+def test_ainvoke_matches_invoke(route):
+    expected = build_graph(route).invoke(request(), thread())
+    result = asyncio.run(build_graph(route).ainvoke(request(), thread()))
+
+    assert isinstance(result["messages"][-1], AIMessage)
+    assert result["messages"][-1].content
+    assert result["messages"][-1].content == expected["messages"][-1].content
+
+
+@pytest.mark.parametrize("route, node", [("rag", "rag_search"), ("chat", "chatbot")])
+def test_astream_yields_answer_tokens(route, node):
+    graph = build_graph(route)
+
+    async def collect():
+        chunks = []
+        async for msg, metadata in graph.astream(
+            request(), thread(), stream_mode="messages"
+        ):
+            if isinstance(msg, AIMessageChunk):
+                assert metadata["langgraph_node"] == node
+                chunks.append(msg.content)
+        return chunks
+
+    chunks = asyncio.run(collect())
+    # Only the answer is streamed, token by token; the router output is not
+    assert len(chunks) > 1
+    answer = graph.get_state(thread()).values["messages"][-1].content
+    assert "".join(chunks) == answer
+
+
+def test_concurrent_conversations_do_not_block():
+    latency = 0.2
+    graph = build_graph("rag", latency=latency)
+
+    async def run(n):
+        return await asyncio.gather(
+            *(graph.ainvoke(request(), thread(f"t{i}")) for i in range(n))
+        )
+
+    start = time.perf_counter()
+    results = asyncio.run(run(20))
+    elapsed = time.perf_counter() - start
+
+    assert all(result["messages"][-1].content for result in results)
+    # Each chat waits for the router and the answer: 2 * latency when they
+    # overlap, 20 times that when run one after another
+    assert elapsed < 10 * latency
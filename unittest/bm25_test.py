@@ -0,0 +1,62 @@
+from langchain_community.retrievers import BM25Retriever
+from rank_bm25 import BM25Okapi
+from src.common import config
+from src.common.utils import load_json_from_file, convert_to_documents
+from src.rag.bm25_index import Bm25Index, Bm25IndexRetriever, build_bm25_index
+import numpy as np
+import pytest
+
+
+QUERIES = [
+    "agile sprint planning",
+    "learning curve for new users",
+    "Jira is too expensive",
+    "customer support response",
+    "termthatdoesnotexist",
+]
+
+
+@pytest.fixture(scope="module")
+def documents():
+    return convert_to_documents(load_json_from_file(config.REVIEW_DATA_PATH)[:500])
+
+
+def test_scores_match_rank_bm25(documents, tmp_path):
+    texts = [doc.page_content for doc in documents]
+    Bm25Index.build(texts).save(str(tmp_path / "bm25"))
+    index = Bm25Index.load(str(tmp_path / "bm25"))
+    reference = BM25Okapi([text.split() for text in texts])
+
+    for query in QUERIES:
+        tokens = query.split()
+        np.testing.assert_allclose(
+            index.get_scores(tokens), reference.get_scores(tokens), rtol=1e-6
+        )
+
+
+def test_retriever_matches_langchain_bm25(documents, tmp_path):
+    index_dir, docstore_dir = str(tmp_path / "bm25"), str(tmp_path / "docstore")
+    build_bm25_index(documents, index_dir=index_dir, docstore_dir=docstore_dir)
+    retriever = Bm25IndexRetriever(
+        index_directory=index_dir, docstore_directory=docstore_dir, k=5
+    )
+    reference = BM25Retriever.from_documents(documents, k=5)
+
+    for query in QUERIES[:-1]:
+        assert [d.page_content for d in retriever.invoke(query)] == [
+            d.page_content for d in reference.invoke(query)
+        ]
+
+
+def test_batch_matches_single_queries(documents):
+    retriever = Bm25IndexRetriever.from_documents(documents, k=5)
+    # Filtered queries are filtered in a batch too
+    queries = QUERIES + [
+        "negative reviews about the learning curve",
+        "5-star reviews from 2024 on agile boards",
+    ]
+    batch = retriever.search_batch(queries)
+    assert batch == [retriever.invoke(query) for query in queries]
+    assert batch[4] == []
+    assert batch[-2] and all(doc.metadata["rating"] <= 3.0 for doc in batch[-2])
+    assert retriever.search_batch([]) == []
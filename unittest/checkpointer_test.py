@@ -0,0 +1,133 @@
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
+from src.bot.checkpointer import SqliteCheckpointer
+from src.bot.graph import GraphBuilder
+from src.bot.router import build_router
+from src.rag.llms import FakeLLM
+from src.rag.rag_executor import RAGExecutor
+import asyncio
+import pytest
+import subprocess
+import sys
+
+
+DOCUMENTS = [
+    Document(
+        page_content="pros: Great for sprints.",
+        metadata={"author": "Test A.", "review_date": "June 2024", "rating": 5.0},
+    )
+]
+
+
+def build_graph(checkpointer):
+    llm = FakeLLM().get_llm()
+    return GraphBuilder.build_graph(
+        chat_model=llm,
+        rag_agent=RAGExecutor(retriever=RunnableLambda(lambda q: DOCUMENTS), llm=llm),
+        router=build_router("llm", chat_model=llm),
+        speculative_retrieval=False,
+        checkpointer=checkpointer,
+    )
+
+
+def chat(graph, thread_id: str, turns: int):
+    for i in range(turns):
+        graph.invoke(
+            {"messages": [HumanMessage(content=f"Is Jira good for agile teams? #{i}")]},
+            {"configurable": {"thread_id": thread_id}},
+        )
+
+
+@pytest.fixture
+def checkpointer(tmp_path):
+    saver = SqliteCheckpointer(str(tmp_path / "checkpoints.sqlite"), max_messages=6)
+    yield saver
+    saver.close()
+
+
+def stored(saver, thread_id: str):
+    return saver.get_tuple({"configurable": {"thread_id": thread_id}})
+
+
+def test_conversations_survive_a_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    saver = SqliteCheckpointer(path)
+    chat(build_graph(saver), "thread-1", turns=2)
+    saver.close()
+
+    restarted = SqliteCheckpointer(path)
+    graph = build_graph(restarted)
+    messages = graph.get_state({"configurable": {"thread_id": "thread-1"}}).values["messages"]
+    assert len(messages) == 4 and messages[0].content.endswith("#0")
+    chat(graph, "thread-1", turns=1)
+    assert len(stored(restarted, "thread-1").checkpoint["channel_values"]["messages"]) == 6
+    restarted.close()
+
+
+def test_async_graph_uses_the_checkpointer(checkpointer):
+    graph = build_graph(checkpointer)
+
+    async def run():
+        for i in range(2):
+            await graph.ainvoke(
+                {"messages": [HumanMessage(content=f"Is Jira good? #{i}")]},
+                {"configurable": {"thread_id": "async"}},
+            )
+
+    asyncio.run(run())
+    checkpointer.flush()
+    assert checkpointer.stats()["threads"] == 1
+    assert len(stored(checkpointer, "async").checkpoint["channel_values"]["messages"]) == 4
+
+
+def test_old_messages_and_checkpoints_are_compacted(checkpointer):
+    chat(build_graph(checkpointer), "long", turns=8)
+    checkpointer.flush()
+    messages = stored(checkpointer, "long").checkpoint["channel_values"]["messages"]
+    assert len(messages) == 6 and messages[-2].content.endswith("#7")
+    history = list(checkpointer.list({"configurable": {"thread_id": "long"}}))
+    assert len(history) == checkpointer.keep_checkpoints
+
+
+def test_idle_and_least_recently_used_threads_are_evicted(checkpointer):
+    graph = build_graph(checkpointer)
+    for thread_id in ("a", "b", "c", "d"):
+        chat(graph, thread_id, turns=1)
+    checkpointer.max_threads = 3
+    assert checkpointer.sweep() == 1
+    assert stored(checkpointer, "a") is None and stored(checkpointer, "d") is not None
+
+    # An hour past the TTL, every thread is idle
+    assert checkpointer.sweep(now=checkpointer.thread_ttl + 3600 + 2e9) == 3
+    assert checkpointer.stats()["threads"] == 0
+
+
+def test_memory_cache_is_bounded(tmp_path):
+    saver = SqliteCheckpointer(
+        str(tmp_path / "checkpoints.sqlite"), max_cached_threads=2, max_memory_bytes=10**6
+    )
+    graph = build_graph(saver)
+    for i in range(5):
+        chat(graph, f"thread-{i}", turns=1)
+    stats = saver.stats()
+    assert stats["cached_threads"] == 2 and stats["cache_bytes"] <= 10**6
+    # Evicted threads are read back from the database
+    assert len(stored(saver, "thread-0").checkpoint["channel_values"]["messages"]) == 2
+
+    saver.max_memory_bytes = 0
+    chat(graph, "thread-0", turns=1)
+    assert saver.stats()["cached_threads"] == 0
+    assert stats["latencies"]["put"]["calls"] > 0
+    saver.close()
+
+
+def test_importing_the_checkpointer_loads_no_retrieval_code():
+    code = (
+        "import sys, src.bot.checkpointer; "
+        "print([m for m in ('src.rag.retriever', 'chromadb') if m in sys.modules])"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip().splitlines()[-1] == "[]"
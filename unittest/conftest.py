@@ -0,0 +1,24 @@
+import os
+import shutil
+import tempfile
+
+# The logger is set up when src.common.logger is first imported, while the
+# test modules are collected, so point it away from logs/ before that. Child
+# processes (ingestion workers, subprocess tests) inherit the variable.
+_collection_log_dir = os.environ["LOG_DIR"] = tempfile.mkdtemp(
+    prefix="ragbot-test-logs-"
+)
+
+from src.common import config  # noqa: E402
+import pytest  # noqa: E402
+
+
+@pytest.fixture(autouse=True, scope="session")
+def log_to_tmp_path(tmp_path_factory):
+    """Writes the logs of the test run to a temporary directory."""
+    from src.common.logger import setup_logger
+
+    config.LOG_DIR = os.environ["LOG_DIR"] = str(tmp_path_factory.mktemp("logs"))
+    setup_logger()
+    shutil.rmtree(_collection_log_dir, ignore_errors=True)
+    yield config.LOG_DIR
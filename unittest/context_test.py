@@ -0,0 +1,58 @@
+from langchain_core.documents import Document
+from src.common import config
+from src.common.utils import convert_to_documents, load_json_from_file
+from src.rag.context import ContextBuilder, estimate_tokens, split_sentences
+
+
+REVIEW = Document(
+    page_content=(
+        "title: Best Tool for Tracking Tasks\n"
+        "review_detail: Jira keeps every bug in one place. Reporting gives managers "
+        "real-time insights.Review collected by and hosted on G2.com.\n"
+        "pros: Boards are great for Agile teams. Integrations with Slack help.\n"
+        "cons: The interface feels slow on large projects. Setup takes time.\n"
+    ),
+    metadata={
+        "review_id": "abc",
+        "author": "Test A.",
+        "review_date": "June 2024",
+        "rating": 4.5,
+    },
+)
+
+
+def test_split_sentences_drops_boilerplate():
+    sentences = split_sentences(REVIEW.page_content)
+    assert sentences[0] == ("title", "Best Tool for Tracking Tasks")
+    assert ("review_detail", "Reporting gives managers real-time insights.") in sentences
+    assert not any("G2.com" in sentence for _, sentence in sentences)
+    assert len(sentences) == 7
+
+
+def test_keeps_query_relevant_sentences_under_compact_header():
+    builder = ContextBuilder(token_budget=1000, max_sentences=2)
+    packed = builder.build([REVIEW], "Is the interface slow?")
+    assert packed.text == (
+        "[1] Test A. | 4.5/5 | June 2024\n"
+        "title: Best Tool for Tracking Tasks\n"
+        "cons: The interface feels slow on large projects."
+    )
+    assert packed.documents == 1
+    assert packed.tokens < packed.original_tokens
+
+
+def test_packs_reviews_into_the_token_budget():
+    docs = convert_to_documents(load_json_from_file(config.REVIEW_DATA_PATH)[:20])
+    for budget in (50, 300, 1200):
+        builder = ContextBuilder(token_budget=budget)
+        packed = builder.build(docs, "learning curve for new users")
+        assert 0 < packed.tokens <= budget
+        assert packed.text.startswith("[1] ")
+    stats = builder.stats()
+    assert stats["requests"] == 1 and 0 < stats["saved_ratio"] < 1
+
+
+def test_empty_context():
+    packed = ContextBuilder().build([], "anything")
+    assert packed.text == "" and packed.documents == 0
+    assert estimate_tokens("") == 0
@@ -0,0 +1,61 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.rag.dense_index import DenseIndex, DenseIndexVectorStore
+import numpy as np
+
+
+def test_search_matches_exhaustive_ranking(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 32)).astype(np.float32)
+    DenseIndex.write(np.array_split(vectors, 7), 500, 32, str(tmp_path / "dense"))
+    index = DenseIndex.load(str(tmp_path / "dense"))
+
+    queries = rng.normal(size=(10, 32))
+    ids, scores = index.search_batch(queries, k=5)
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    for query, row_ids, row_scores in zip(queries, ids, scores):
+        expected = unit @ (query / np.linalg.norm(query))
+        assert row_ids.tolist() == np.argsort(-expected)[:5].tolist()
+        np.testing.assert_allclose(row_scores, expected[row_ids], rtol=1e-5)
+        assert index.search(query, k=5)[0].tolist() == row_ids.tolist()
+
+
+def test_vector_store_retriever():
+    texts = [f"review number {i}" for i in range(50)]
+    store = DenseIndexVectorStore.from_texts(
+        texts, DeterministicFakeEmbedding(size=16), [{"i": i} for i in range(50)]
+    )
+    retriever = store.as_retriever(search_kwargs={"k": 3})
+    docs = retriever.invoke("review number 7")
+    assert len(docs) == 3
+    assert docs[0].metadata == {"i": 7}
+    assert store.similarity_search_batch(["review number 7", "review number 9"], k=1) == [
+        [docs[0]],
+        store.similarity_search("review number 9", k=1),
+    ]
+
+
+def test_quantized_search_rescores_to_the_exact_ranking(tmp_path):
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(20, 64))
+    vectors = centers[rng.integers(0, 20, size=2000)]
+    vectors = vectors + rng.normal(scale=0.6, size=(2000, 64))
+    queries = vectors[rng.integers(0, 2000, size=20)]
+    queries = queries + rng.normal(scale=0.05, size=(20, 64))
+    DenseIndex.write([vectors], 2000, 64, str(tmp_path / "exact"))
+    exact_ids, _ = DenseIndex.load(str(tmp_path / "exact")).search_batch(queries, 5)
+
+    for quantization in ("float16", "int8", "binary"):
+        directory = str(tmp_path / quantization)
+        DenseIndex.write(
+            np.array_split(vectors, 3), 2000, 64, directory, quantization=quantization
+        )
+        index = DenseIndex.load(directory, rescore_multiplier=20)
+        assert index.quantization == quantization
+        ids, scores = index.search_batch(queries, 5)
+        recall = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(ids, exact_ids)])
+        assert recall >= 0.95, quantization
+        # Returned scores are the full-precision cosine similarities
+        expected = np.einsum(
+            "qkd,qd->qk", index.embeddings[ids], DenseIndex.normalize(queries)
+        )
+        np.testing.assert_allclose(scores, expected, rtol=1e-5)
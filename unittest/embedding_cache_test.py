@@ -0,0 +1,135 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.rag.dense_index import DenseIndexVectorStore
+from src.rag.embedding_cache import CachedEmbeddings, EmbeddingCache, embed_queries
+import numpy as np
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.embedded += 1
+        return super().embed_query(text)
+
+
+class InstructedEmbedding(CountingEmbedding):
+    """Embeds queries with an instruction, like instruction-tuned models."""
+
+    def embed_query(self, text):
+        return super().embed_query(f"query: {text}")
+
+
+def cached_embeddings(directory, max_entries=100, recency_flush_seconds=30.0):
+    model = CountingEmbedding(size=32)
+    cache = EmbeddingCache(
+        str(directory),
+        "fake-model",
+        normalize=False,
+        max_entries=max_entries,
+        recency_flush_seconds=recency_flush_seconds,
+    )
+    return CachedEmbeddings(model, cache), model
+
+
+def test_embeddings_are_computed_once_and_persisted(tmp_path):
+    embeddings, model = cached_embeddings(tmp_path)
+    texts = ["boards are easy", "workflows are complex", "boards are easy"]
+    first = embeddings.embed_documents(texts)
+    assert model.embedded == 2
+
+    again = embeddings.embed_documents(texts)
+    assert model.embedded == 2
+    # float16 storage
+    np.testing.assert_allclose(again, first, rtol=1e-2, atol=1e-3)
+    assert embeddings.cache.stats()["hits"] == 3
+
+    reopened, reopened_model = cached_embeddings(tmp_path)
+    reopened.embed_documents(texts[:2])
+    reopened.embed_query("boards are easy")
+    reopened.embed_query("boards are easy")
+    # Queries are cached apart from documents
+    assert reopened_model.embedded == 1
+    assert reopened.cache.hit_rate == 0.75
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    embeddings, model = cached_embeddings(tmp_path, max_entries=3)
+    embeddings.embed_documents(["a", "b", "c"])
+    embeddings.embed_documents(["a"])  # "b" is now the oldest entry
+    embeddings.embed_documents(["d"])
+    assert embeddings.cache.stats()["entries"] == 3
+
+    model.embedded = 0
+    embeddings.embed_documents(["a", "c", "d"])
+    assert model.embedded == 0
+    embeddings.embed_documents(["b"])
+    assert model.embedded == 1
+
+
+def test_hits_do_not_write_to_the_index_until_flushed(tmp_path):
+    embeddings, _ = cached_embeddings(tmp_path, max_entries=3)
+    embeddings.embed_documents(["a", "b", "c"])
+    db = embeddings.cache._db
+    changes = db.total_changes
+    for _ in range(10):
+        embeddings.embed_documents(["a"])
+    assert db.total_changes == changes
+
+    # Once flushed, another process's eviction sees that "a" was used
+    embeddings.cache.flush()
+    other, model = cached_embeddings(tmp_path, max_entries=3)
+    other.embed_documents(["d"])
+    model.embedded = 0
+    other.embed_documents(["a"])
+    assert model.embedded == 0
+    other.embed_documents(["b"])
+    assert model.embedded == 1
+
+
+def test_recency_is_written_periodically(tmp_path):
+    embeddings, _ = cached_embeddings(tmp_path, recency_flush_seconds=0.0)
+    embeddings.embed_documents(["a", "b"])
+    changes = embeddings.cache._db.total_changes
+    embeddings.embed_documents(["a"])
+    assert embeddings.cache._db.total_changes == changes + 1
+
+
+def test_query_vectors_are_written_in_batches(tmp_path):
+    embeddings, model = cached_embeddings(tmp_path)
+    db = embeddings.cache._db
+    changes = db.total_changes
+    first = embeddings.embed_query("are boards easy?")
+    embeddings.embed_query("is it slow?")
+    # Served from memory until written, with the stored precision
+    np.testing.assert_allclose(embeddings.embed_query("are boards easy?"), first, atol=1e-3)
+    assert model.embedded == 2
+    assert db.total_changes == changes
+
+    embeddings.cache.flush()
+    assert db.total_changes == changes + 2
+    reopened, reopened_model = cached_embeddings(tmp_path)
+    reopened.embed_query("are boards easy?")
+    assert reopened_model.embedded == 0
+
+
+def test_query_batches_match_embed_query(tmp_path):
+    model = InstructedEmbedding(size=32)
+    queries = ["are boards easy?", "is it slow?"]
+    expected = [model.embed_query(query) for query in queries]
+    assert embed_queries(model, queries) == expected
+
+    cache = EmbeddingCache(str(tmp_path), "fake-model", normalize=False)
+    embeddings = CachedEmbeddings(model, cache)
+    np.testing.assert_allclose(embed_queries(embeddings, queries), expected, atol=1e-3)
+    # Stored as queries, not documents
+    assert cache.get_many(queries, "document") == [None, None]
+    assert all(vector is not None for vector in cache.get_many(queries, "query"))
+
+    store = DenseIndexVectorStore.from_texts(["boards are easy", "it is slow"], model)
+    assert store.similarity_search_batch(queries, k=2) == [
+        store.similarity_search(query, k=2) for query in queries
+    ]
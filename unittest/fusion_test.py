@@ -0,0 +1,72 @@
+from langchain_core.documents import Document
+from src.rag.fusion import (
+    SCORE_KEY,
+    ConvexCombinationFusion,
+    MinMaxFusion,
+    ReciprocalRankFusion,
+    get_fusion,
+    scored_results,
+    with_score,
+)
+import pytest
+
+
+def review(review_id, text=None):
+    return Document(
+        page_content=text or f"review {review_id}", metadata={"review_id": review_id}
+    )
+
+
+def ids(docs):
+    return [doc.metadata["review_id"] for doc in docs]
+
+
+DENSE = [(review("a"), 0.9), (review("b"), 0.8), (review("c"), 0.1)]
+SPARSE = [(review("c"), 12.0), (review("d"), 3.0), (review("a"), 2.0)]
+
+
+def test_rrf_matches_weighted_reciprocal_rank():
+    fused = ReciprocalRankFusion([0.5, 0.5], c=60).fuse([DENSE, SPARSE])
+    # a: 1/61 + 1/63, c: 1/63 + 1/61 (tie, first seen wins), b: 1/62, d: 1/62
+    assert ids(fused) == ["a", "c", "b", "d"]
+
+
+def test_score_fusions():
+    # Normalized: dense a=1, b=0.875, c=0; sparse c=1, d=0.1, a=0
+    assert ids(MinMaxFusion([0.4, 0.6]).fuse([DENSE, SPARSE])) == ["c", "a", "b", "d"]
+    assert ids(ConvexCombinationFusion([0.5, 0.5]).fuse([DENSE, SPARSE])) == [
+        "c",
+        "d",
+        "a",
+        "b",
+    ]
+
+
+def test_duplicates_are_merged_before_truncation():
+    # The same review ingested twice, with different text, fills one slot
+    dense = [(review("a"), 0.9), (review("a", "copy of a"), 0.85), (review("b"), 0.5)]
+    sparse = [(review("a"), 4.0), (review("c"), 1.0)]
+    expected = {"rrf": ["a", "c"], "minmax": ["a", "b"], "convex": ["a", "c"]}
+    for method, expected_ids in expected.items():
+        fused = get_fusion(method).fuse([dense, sparse], k=2)
+        assert ids(fused) == expected_ids
+        assert fused[0].page_content == "review a"
+
+
+def test_empty_and_failed_lists():
+    assert MinMaxFusion().fuse([[], []]) == []
+    assert ids(MinMaxFusion().fuse([[], SPARSE])) == ["c", "d", "a"]
+
+
+def test_scores_are_stripped_from_fused_documents():
+    docs = [with_score(review("a"), 0.7), review("b")]
+    [[(a, a_score), (b, b_score)]] = scored_results([docs])
+    assert (a_score, b_score) == (0.7, 0.5)
+    assert SCORE_KEY not in a.metadata and SCORE_KEY in docs[0].metadata
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        get_fusion("borda")
+    with pytest.raises(ValueError):
+        get_fusion("rrf", [1.0]).fuse([DENSE, SPARSE])
@@ -0,0 +1,176 @@
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.common import config
+from src.common.utils import load_json_from_file
+from src.rag.dense_index import DenseIndex
+from src.rag.docstore import DocStore
+from src.rag.manifest import IngestManifest
+from src.ingestion.pipeline import iter_json_array, open_collection
+from src.rag.metadata_index import parse_review_month
+from ingest import ingest_data
+from functools import partial
+import json
+import pytest
+
+
+@pytest.fixture
+def ingest_env(tmp_path, monkeypatch):
+    """Points ingestion at a small reviews file and temporary stores."""
+    reviews_path = tmp_path / "reviews.json"
+    monkeypatch.setattr(config, "REVIEW_DATA_PATH", str(reviews_path))
+    monkeypatch.setattr(config, "DB_PERSIST_DIRECTORY", str(tmp_path / "chroma_db"))
+    monkeypatch.setattr(config, "DOCSTORE_DIRECTORY", str(tmp_path / "docstore"))
+    monkeypatch.setattr(config, "BM25_INDEX_DIRECTORY", str(tmp_path / "bm25"))
+    monkeypatch.setattr(config, "DENSE_INDEX_DIRECTORY", str(tmp_path / "dense"))
+    monkeypatch.setattr(config, "METADATA_INDEX_DIRECTORY", str(tmp_path / "metadata"))
+    monkeypatch.setattr(
+        config, "INGEST_MANIFEST_PATH", str(tmp_path / "manifest.json")
+    )
+    monkeypatch.setattr(
+        config, "INGEST_CHECKPOINT_PATH", str(tmp_path / "checkpoint.json")
+    )
+    monkeypatch.setattr(
+        config, "EMBEDDING_CACHE_DIRECTORY", str(tmp_path / "embedding_cache")
+    )
+
+    def write_reviews(reviews):
+        reviews_path.write_text(json.dumps(reviews), encoding="utf-8")
+
+    return write_reviews
+
+
+def unique_reviews(n: int) -> list:
+    reviews = {}
+    for review in load_json_from_file("data/all_reviews.json"):
+        reviews.setdefault(review["review_detail"], review)
+    return list(reviews.values())[:n]
+
+
+def collection_ids() -> set:
+    store = Chroma(persist_directory=config.DB_PERSIST_DIRECTORY)
+    return set(store.get(include=[])["ids"])
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    embedded: int = 0
+    fail_after: int = -1
+
+    def embed_documents(self, texts):
+        if self.embedded == self.fail_after:
+            raise RuntimeError("Simulated crash")
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_reruns_keep_collection_stable(ingest_env):
+    reviews = unique_reviews(40)
+    ingest_env(reviews + reviews[:5])  # duplicates share a content hash
+    embeddings = CountingEmbedding(size=16)
+
+    ingest_data(embeddings=embeddings)
+    first_ids = collection_ids()
+    assert len(first_ids) == 40
+    assert embeddings.embedded == 40
+
+    for _ in range(2):
+        ingest_data(embeddings=embeddings)
+        assert collection_ids() == first_ids
+    assert embeddings.embedded == 40
+
+    manifest = IngestManifest.load(config.INGEST_MANIFEST_PATH)
+    assert manifest.review_ids == first_ids
+    assert len(DocStore(config.DOCSTORE_DIRECTORY)) == 40
+
+
+def test_only_changes_are_embedded(ingest_env):
+    reviews = unique_reviews(43)
+    ingest_env(reviews[:40])
+    embeddings = CountingEmbedding(size=16)
+    ingest_data(embeddings=embeddings)
+    version = IngestManifest.load(config.INGEST_MANIFEST_PATH).corpus_version
+
+    edited = dict(reviews[0], rating=1.0)
+    ingest_env([edited] + reviews[1:35] + reviews[40:])
+    ingest_data(embeddings=embeddings)
+
+    # 1 edited + 3 new reviews embedded; the edited-away and 5 removed deleted
+    assert embeddings.embedded == 44
+    assert len(collection_ids()) == 38
+    assert len(DocStore(config.DOCSTORE_DIRECTORY)) == 38
+
+    # The dense index rows follow the DocStore
+    docstore = DocStore(config.DOCSTORE_DIRECTORY)
+    index = DenseIndex.load(config.DENSE_INDEX_DIRECTORY)
+    ids, _ = index.search(embeddings.embed_query(docstore.get(7).page_content), k=1)
+    assert ids.tolist() == [7]
+    assert IngestManifest.load(config.INGEST_MANIFEST_PATH).corpus_version != version
+
+
+def test_stores_written_before_the_month_metadata_get_it(ingest_env):
+    ingest_env(unique_reviews(20))
+    embeddings = CountingEmbedding(size=16)
+    ingest_data(embeddings=embeddings)
+
+    # A store from before the month was added to the Chroma metadata
+    collection = open_collection(config.DB_PERSIST_DIRECTORY)
+    stored = collection.get(include=["metadatas"])
+    for metadata in stored["metadatas"]:
+        metadata.pop("month")
+    collection.delete(ids=stored["ids"])
+    collection.add(
+        ids=stored["ids"],
+        embeddings=[[0.0] * 16] * len(stored["ids"]),
+        metadatas=stored["metadatas"],
+    )
+    manifest_path = config.INGEST_MANIFEST_PATH
+    manifest = json.loads(open(manifest_path).read())
+    del manifest["metadata_version"]
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+
+    ingest_data(embeddings=embeddings)
+    assert embeddings.embedded == 20  # Nothing embedded again
+    stored = open_collection(config.DB_PERSIST_DIRECTORY).get(include=["metadatas"])
+    assert all(
+        metadata["month"] == parse_review_month(metadata["review_date"]) > 0
+        for metadata in stored["metadatas"]
+    )
+    assert IngestManifest.load(manifest_path).metadata_version == 2
+
+
+def test_streaming_reader_matches_json_load(tmp_path):
+    reviews = unique_reviews(25)
+    path = tmp_path / "reviews.json"
+    path.write_text(json.dumps(reviews, indent=2), encoding="utf-8")
+    # Tiny blocks split every review across reads
+    assert list(iter_json_array(str(path), block_size=7)) == reviews
+
+
+def test_interrupted_run_resumes_after_last_committed_batch(ingest_env, monkeypatch):
+    monkeypatch.setattr(config, "INGEST_BATCH_SIZE", 8)
+    reviews = unique_reviews(40)
+    ingest_env(reviews[:8])
+    ingest_data(embeddings=CountingEmbedding(size=16))
+
+    ingest_env(reviews)
+    crashing = CountingEmbedding(size=16, fail_after=16)
+    with pytest.raises(RuntimeError):
+        ingest_data(embeddings=crashing)
+    assert len(collection_ids()) == 24
+
+    # Two of the four new batches were committed before the crash
+    embeddings = CountingEmbedding(size=16)
+    ingest_data(embeddings=embeddings)
+    assert embeddings.embedded == 16
+    assert len(collection_ids()) == 40
+
+
+def test_worker_processes(ingest_env, monkeypatch):
+    monkeypatch.setattr(config, "INGEST_BATCH_SIZE", 8)
+    ingest_env(unique_reviews(40))
+    pipeline_factory = partial(DeterministicFakeEmbedding, size=16)
+    monkeypatch.setattr(
+        "src.ingestion.pipeline.default_embeddings_factory", pipeline_factory
+    )
+    ingest_data(workers=2)
+    assert len(collection_ids()) == 40
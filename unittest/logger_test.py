@@ -0,0 +1,52 @@
+from src.common import config
+from src.common.logger import debug_enabled, debug_payload, log, setup_logger
+import pytest
+
+
+@pytest.fixture
+def log_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "LOG_DEBUG_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(config, "LOG_PAYLOAD_MAX_CHARS", 50)
+    yield tmp_path
+    setup_logger()
+
+
+def read(path) -> str:
+    log.complete()
+    return path.read_text(encoding="utf-8")
+
+
+def test_debug_payloads_follow_the_module_levels(log_dir):
+    setup_logger(dir=str(log_dir), module_levels={__name__: "DEBUG"})
+    assert debug_enabled(__name__) and not debug_enabled("src.bot.graph")
+
+    debug_payload("Documents", lambda: "x" * 500)
+    text = read(log_dir / "app.log")
+    assert "Documents: " + "x" * 50 + "... [450 more characters]" in text
+
+    # Not logged, so not even built
+    setup_logger(dir=str(log_dir), module_levels={})
+    debug_payload("State", lambda: pytest.fail("payload built"))
+    assert "State" not in read(log_dir / "app.log")
+
+
+def test_debug_payloads_are_sampled(log_dir, monkeypatch):
+    monkeypatch.setattr(config, "LOG_DEBUG_SAMPLE_RATE", 0.1)
+    setup_logger(dir=str(log_dir), module_levels={__name__: "DEBUG"})
+    for i in range(1000):
+        debug_payload("Sample", lambda: i)
+    assert 30 < read(log_dir / "app.log").count("Sample: ") < 200
+
+
+def test_setup_logger_keeps_other_handlers(log_dir):
+    messages = []
+    sink = log.add(messages.append, level="INFO")
+    try:
+        setup_logger(file_name="ingest.log", dir=str(log_dir))
+        setup_logger(file_name="ingest.log", dir=str(log_dir))
+        log.info("ingesting")
+        log.complete()
+        assert sum("ingesting" in m for m in messages) == 1
+        assert read(log_dir / "ingest.log").count("ingesting") == 1
+    finally:
+        log.remove(sink)
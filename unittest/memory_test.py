@@ -0,0 +1,140 @@
+import re
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import MemorySaver
+from src.bot.graph import GraphBuilder
+from src.bot.memory import RollingSummaryMemory
+from src.bot.router import build_router
+from src.rag.llms import FakeLLM, FakeStreamingChatModel
+from src.common import config
+from src.rag.rag_executor import RAGExecutor
+
+
+class RecordingChatModel(FakeStreamingChatModel):
+    """Summarizes by listing the messages it was asked to fold in."""
+
+    prompts: list = []
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(messages[-1].content)
+        self.response = f"summary #{len(self.prompts)}"
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+def conversation(n: int) -> list:
+    return [
+        (HumanMessage if i % 2 == 0 else AIMessage)(content=f"message {i}", id=str(i))
+        for i in range(n)
+    ]
+
+
+def test_window_and_background_summary():
+    model = RecordingChatModel(prompts=[])
+    memory = RollingSummaryMemory(model, window=4, max_summary_words=50)
+    messages = conversation(12)
+    for n in range(1, 13):
+        history = memory.history("t", messages[:n])
+        memory.wait("t")
+
+    # The window holds the last 4 messages before the query
+    assert history.splitlines()[-4:] == [
+        "AI: message 7",
+        "Human: message 8",
+        "AI: message 9",
+        "Human: message 10",
+    ]
+    assert history.startswith("Summary of the earlier conversation: summary #")
+    # Every message that left the window was folded in exactly once
+    assert folded(model) == list(range(7))
+    assert memory.summary("t") == f"summary #{len(model.prompts)}"
+
+
+def test_prompt_size_stays_constant():
+    memory = RollingSummaryMemory(FakeStreamingChatModel(response="short summary"), window=4)
+    messages = conversation(40)
+    sizes = []
+    for n in range(2, 41):
+        sizes.append(len(memory.history("t", messages[:n])))
+        memory.wait("t")
+    # Only the message numbers grow, a digit at a time
+    assert max(sizes[10:]) - min(sizes[10:]) <= 4
+    assert len(memory.history("t", conversation(400))) < max(sizes) + 8
+
+
+def test_uncached_thread_continues_from_saved_summary():
+    memory = RollingSummaryMemory(FakeStreamingChatModel(), window=4)
+    history = memory.history("t", conversation(12), summary="saved summary")
+    assert history.splitlines() == [
+        "Summary of the earlier conversation: saved summary",
+        "AI: message 7",
+        "Human: message 8",
+        "AI: message 9",
+        "Human: message 10",
+    ]
+
+
+class FlakyChatModel(RecordingChatModel):
+    """Fails the summary calls listed in `failures` (1-based)."""
+
+    failures: set = set()
+    calls: int = 0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        if self.calls in self.failures:
+            raise RuntimeError("LLM unavailable")
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+def folded(model) -> list:
+    return sorted(map(int, re.findall(r"message (\d+)", "\n".join(model.prompts))))
+
+
+def test_failed_summary_keeps_its_messages_for_the_next_turn():
+    model = FlakyChatModel(prompts=[], failures={1})
+    memory = RollingSummaryMemory(model, window=4)
+    messages = conversation(12)
+    memory.history("t", messages[:7])  # Messages 0 and 1 leave the window
+    memory.wait("t")
+    assert model.prompts == [] and memory.summary("t") == ""
+
+    for n in range(8, 13):
+        memory.history("t", messages[:n])
+        memory.wait("t")
+    # Retried, and every message folded in exactly once
+    assert folded(model) == list(range(7))
+    assert memory.state_update("t") == {
+        "summary": f"summary #{len(model.prompts)}",
+        "summary_through": "6",
+    }
+
+
+def test_another_process_summarizes_what_the_saved_summary_lags_behind():
+    model = RecordingChatModel(prompts=[])
+    memory = RollingSummaryMemory(model, window=4)
+    # The saved summary covers messages 0 to 2; 3 to 6 left the window since
+    history = memory.history(
+        "t", conversation(12), summary="saved summary", summary_through="2"
+    )
+    assert history.splitlines()[0] == "Summary of the earlier conversation: saved summary"
+    memory.wait("t")
+    assert folded(model) == [3, 4, 5, 6]
+    assert "saved summary" in model.prompts[0]
+    assert memory.state_update("t")["summary_through"] == "6"
+
+
+def test_chatbot_node_saves_the_summary_in_the_state(monkeypatch):
+    monkeypatch.setattr(config, "CONVERSATION_MEMORY", "summary")
+    llm = FakeLLM(route="chat").get_llm()
+    graph = GraphBuilder.build_graph(
+        chat_model=llm,
+        rag_agent=RAGExecutor(retriever=RunnableLambda(lambda q: []), llm=llm),
+        router=build_router("llm", chat_model=llm),
+        speculative_retrieval=False,
+        checkpointer=MemorySaver(),
+    )
+    thread = {"configurable": {"thread_id": "chat"}}
+    for i in range(8):
+        state = graph.invoke({"messages": [HumanMessage(content=f"Hi #{i}")]}, thread)
+    assert state["summary"] == llm.response
+    assert state["summary_through"] in {m.id for m in state["messages"]}
@@ -0,0 +1,157 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.common import config
+from src.common.utils import convert_to_documents, load_json_from_file
+from src.rag.bm25_index import Bm25IndexRetriever
+from src.rag.dense_index import DenseIndexVectorStore
+from src.rag.docstore import DocStore
+from src.rag.metadata_index import (
+    MetadataFilter,
+    MetadataIndex,
+    chroma_metadata,
+    extract_filter,
+    parse_review_month,
+)
+from src.rag.retriever import ScoredVectorStoreRetriever
+import chromadb
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def documents():
+    return convert_to_documents(load_json_from_file(config.REVIEW_DATA_PATH)[:500])
+
+
+def passes(doc, metadata_filter):
+    return metadata_filter.matches(
+        doc.metadata["rating"], parse_review_month(doc.metadata["review_date"])
+    )
+
+
+@pytest.mark.parametrize(
+    "query, expected, rest",
+    [
+        (
+            "negative reviews from 2024",
+            MetadataFilter(max_rating=3.0, start_month=202401, end_month=202412),
+            "reviews",
+        ),
+        (
+            "what do 5-star reviewers praise",
+            MetadataFilter(min_rating=5.0, max_rating=5.0),
+            "what do reviewers praise",
+        ),
+        (
+            "4.5 stars reviews about pricing",
+            MetadataFilter(min_rating=4.5, max_rating=4.5),
+            "reviews about pricing",
+        ),
+        (
+            "top rated reviews of 2024",
+            MetadataFilter(min_rating=4.0, start_month=202401, end_month=202412),
+            "reviews",
+        ),
+        (
+            "complaints in June 2024 with at least 4 stars",
+            MetadataFilter(min_rating=4.0, start_month=202406, end_month=202406),
+            "complaints with",
+        ),
+        ("reviews before 2020", MetadataFilter(end_month=201912), "reviews"),
+        ("Is Jira good for agile teams?", None, "Is Jira good for agile teams?"),
+        (
+            "critical feedback in 2023",
+            MetadataFilter(max_rating=3.0, start_month=202301, end_month=202312),
+            "feedback",
+        ),
+    ],
+)
+def test_extract_filter(query, expected, rest):
+    assert extract_filter(query) == (expected, rest)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "Is Jira good for a team of 2000 engineers?",
+        "What are the critical features of Jira?",
+        "positive impact on productivity",
+        "How did Jira change in 2024?",
+        "Do reviews mention teams of 2000 people?",
+    ],
+)
+def test_numbers_and_adjectives_outside_review_constraints_are_not_filters(query):
+    assert extract_filter(query) == (None, query)
+
+
+FILTERS = [
+    MetadataFilter(max_rating=3.0),
+    MetadataFilter(min_rating=4.5, max_rating=4.5),
+    MetadataFilter(min_rating=4.5, start_month=202401, end_month=202412),
+    MetadataFilter(end_month=202012),
+    MetadataFilter(start_month=202508, end_month=202508),
+    MetadataFilter(min_rating=6.0),
+]
+
+
+@pytest.mark.parametrize("stars", [4.0, 4.5])
+def test_star_ratings_match_exactly(documents, stars):
+    metadata_filter, _ = extract_filter(f"{stars:g}-star reviews")
+    index = MetadataIndex.build(documents)
+    selected = {documents[i].metadata["rating"] for i in index.positions(metadata_filter)}
+    assert selected == {stars}
+
+
+def test_positions_match_brute_force(documents, tmp_path):
+    DocStore.write(documents, str(tmp_path / "docstore"))
+    MetadataIndex.build(DocStore(str(tmp_path / "docstore"))).save(str(tmp_path / "meta"))
+    index = MetadataIndex.load(str(tmp_path / "meta"))
+    for metadata_filter in FILTERS + [MetadataFilter()]:
+        expected = [i for i, doc in enumerate(documents) if passes(doc, metadata_filter)]
+        assert index.positions(metadata_filter).tolist() == expected
+
+
+def test_where_clause_selects_the_same_reviews_in_chroma(documents):
+    unique = list({doc.id: doc for doc in documents}.values())
+    collection = chromadb.EphemeralClient().get_or_create_collection("where_clause_test")
+    collection.add(
+        ids=[doc.id for doc in unique],
+        embeddings=np.ones((len(unique), 4)),
+        metadatas=[chroma_metadata(doc.metadata) for doc in unique],
+    )
+    for metadata_filter in FILTERS:
+        # Month bounds on the stored metadata, not a list of review ids
+        where = MetadataIndex.where_clause(metadata_filter)
+        assert "review_id" not in str(where)
+        expected = {doc.id for doc in unique if passes(doc, metadata_filter)}
+        assert set(collection.get(where=where, include=[])["ids"]) == expected
+
+
+def test_filters_are_pushed_into_both_retrievers(documents):
+    metadata_filter, _ = extract_filter("negative reviews from 2024")
+    sparse = Bm25IndexRetriever.from_documents(documents, k=5)
+    vector_store = DenseIndexVectorStore.from_texts(
+        [doc.page_content for doc in documents],
+        DeterministicFakeEmbedding(size=16),
+        [doc.metadata for doc in documents],
+    )
+    dense = ScoredVectorStoreRetriever(
+        vectorstore=vector_store,
+        search_kwargs={"k": 5},
+        metadata_index=MetadataIndex.build(documents),
+    )
+    unfiltered = [
+        Bm25IndexRetriever.from_documents(documents, metadata_filtering=False, k=5),
+        ScoredVectorStoreRetriever(vectorstore=vector_store, search_kwargs={"k": 5}),
+    ]
+    for retriever, unfiltered_retriever in zip((sparse, dense), unfiltered):
+        docs = retriever.invoke("negative reviews from 2024 about the learning curve")
+        assert docs and all(passes(doc, metadata_filter) for doc in docs)
+        # A filter no review passes is ignored rather than emptying the context
+        query = "reviews from 1990 about the learning curve"
+        docs = retriever.invoke(query)
+        assert len(docs) == 5 and docs == unfiltered_retriever.invoke(query)
+
+    # Rows outside the filter are never scored
+    rows = np.array([3, 17, 42])
+    ids, _ = vector_store._load()[0].search(np.ones(16), k=5, rows=rows)
+    assert sorted(ids.tolist()) == [3, 17, 42]
@@ -0,0 +1,142 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from src.rag.chain import FALLBACK_ANSWER
+from src.rag.llms import FakeLLM
+from src.rag.manifest import IngestManifest
+from src.rag.query_cache import (
+    CorpusVersion,
+    QueryCache,
+    SemanticAnswerCache,
+    TtlLruCache,
+)
+from src.rag.rag_executor import RAGExecutor
+import asyncio
+import time
+import zlib
+
+
+class WordEmbedding(Embeddings):
+    """Bag-of-words vectors, so rephrasings of a question are close."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _embed(self, text):
+        vector = [0.0] * 64
+        for word in text.lower().replace("?", "").split():
+            vector[zlib.crc32(word.encode()) % 64] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self._embed(text)
+
+
+def build_executor(ttl=60.0, corpus_version=None, llm=None):
+    retrievals = []
+
+    def retrieve(query):
+        retrievals.append(query)
+        return [Document(page_content="pros: Boards and sprints are easy.")]
+
+    embeddings = WordEmbedding()
+    cache = QueryCache(
+        embeddings,
+        TtlLruCache(max_entries=16, ttl=ttl),
+        SemanticAnswerCache(max_entries=16, ttl=ttl, threshold=0.8),
+        corpus_version,
+    )
+    executor = RAGExecutor(
+        retriever=RunnableLambda(retrieve),
+        llm=llm or FakeLLM(latency=0, token_latency=0).get_llm(),
+        query_cache=cache,
+    )
+    return executor, retrievals, embeddings
+
+
+def test_repeated_and_similar_questions_are_cached():
+    executor, retrievals, embeddings = build_executor()
+    answer = executor.get_response("Is Jira good for agile?")
+
+    assert executor.get_response("is jira good for agile") == answer
+    assert "".join(executor.stream_response("Is Jira good for Agile teams?")) == answer
+    assert len(retrievals) == 1
+    # The exact repeat reused the cached query embedding
+    assert embeddings.calls == 2
+    stats = executor.query_cache.stats()
+    assert stats["retrieval"] == {"hits": 1, "misses": 2, "entries": 2}
+    assert stats["answer"] == {"hits": 2, "misses": 1, "entries": 1}
+
+    executor.get_response("What do people dislike about the pricing?")
+    assert len(retrievals) == 2
+
+
+def test_answers_are_not_shared_across_filters():
+    executor, retrievals, _ = build_executor()
+    executor.get_response("What do negative reviews from 2024 say about pricing?")
+    # Close enough embeddings (6 of 7 words), but another year
+    executor.get_response("What do negative reviews from 2023 say about pricing?")
+    assert len(retrievals) == 2
+    executor.get_response("what do negative reviews from 2024 say about pricing")
+    assert executor.query_cache.stats()["answer"]["hits"] == 1
+
+
+def test_fallback_answers_are_not_cached():
+    calls = []
+
+    def empty_llm(prompt):
+        calls.append(prompt)
+        return AIMessage(content="")
+
+    executor, _, _ = build_executor(llm=RunnableLambda(empty_llm))
+    assert executor.get_response("Is Jira good for agile?") == FALLBACK_ANSWER
+    assert executor.get_response("Is Jira good for agile?") == FALLBACK_ANSWER
+    assert len(calls) == 2
+    assert executor.query_cache.stats()["answer"]["entries"] == 0
+
+
+def test_answer_tier_is_off_by_default():
+    cache = QueryCache.from_config(WordEmbedding())
+    assert cache.answer_cache is None
+    assert cache.answer("Is Jira good for agile?", [1.0] * 64) is None
+    assert "answer" not in cache.stats()
+
+
+def test_async_path_uses_the_cache():
+    executor, retrievals, _ = build_executor()
+
+    async def ask(query):
+        return "".join([token async for token in executor.astream_response(query)])
+
+    answer = asyncio.run(ask("Is Jira good for agile?"))
+    assert asyncio.run(executor.aget_response("Is Jira good for agile?")) == answer
+    assert len(retrievals) == 1
+
+
+def test_entries_expire():
+    executor, retrievals, _ = build_executor(ttl=0.05)
+    executor.get_response("Is Jira good for agile?")
+    time.sleep(0.1)
+    executor.get_response("Is Jira good for agile?")
+    assert len(retrievals) == 2
+
+
+def test_new_corpus_version_clears_the_cache(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.json"), ["a", "b"])
+    manifest.save()
+    executor, retrievals, _ = build_executor(
+        corpus_version=CorpusVersion(manifest.path)
+    )
+    executor.get_response("Is Jira good for agile?")
+    executor.get_response("Is Jira good for agile?")
+    assert len(retrievals) == 1
+
+    manifest.review_ids.add("c")
+    manifest.save()
+    executor.get_response("Is Jira good for agile?")
+    assert len(retrievals) == 2
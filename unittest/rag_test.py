@@ -1,9 +1,121 @@
-import sys
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.common import config
+from src.common.utils import convert_to_documents, load_json_from_file
+from src.rag.batch_runner import BatchQuestionAnswering, answered_ids
+from src.rag.bm25_index import Bm25IndexRetriever
+from src.rag.chain import LcGeneration
+from src.rag.dense_index import DenseIndexVectorStore
+from src.rag.llms import FakeLLM
+from src.rag.metadata_index import MetadataIndex, extract_filter, parse_review_month
+from src.rag.retriever import ScoredVectorStoreRetriever
+import json
+import pytest
 
-sys.path.append("../")
 
-from src.rag.rag_executor import jira_rag_agent
+QUERIES = [
+    "effect of Jira on productivity",
+    "Is the learning curve steep?",
+    "How good are the Agile boards?",
+    "What do users say about integrations?",
+    "Is Jira expensive for small teams?",
+]
 
 
-rag_response = jira_rag_agent.get_rag_response(query="effect of Jira on productivity")
-print("rag response: ", rag_response)
+@pytest.fixture(scope="module")
+def documents():
+    return convert_to_documents(load_json_from_file(config.REVIEW_DATA_PATH)[:300])
+
+
+@pytest.fixture(scope="module")
+def runner(documents):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    sparse = Bm25IndexRetriever.from_documents(documents, k=3)
+    return BatchQuestionAnswering(
+        generator=LcGeneration(retriever=sparse, llm=FakeLLM().get_llm()),
+        embeddings=embeddings,
+        vector_store=DenseIndexVectorStore.from_texts(
+            [doc.page_content for doc in documents],
+            embeddings,
+            [doc.metadata for doc in documents],
+        ),
+        sparse_retriever=sparse,
+        metadata_index=MetadataIndex.build(documents),
+        batch_size=2,
+        concurrency=2,
+        requests_per_second=None,
+    )
+
+
+def write_queries(path, queries):
+    path.write_text(
+        "".join(json.dumps({"id": f"q{i}", "query": q}) + "\n" for i, q in enumerate(queries))
+    )
+
+
+def read_results(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_answers_every_query_with_timings(runner, tmp_path):
+    write_queries(tmp_path / "in.jsonl", QUERIES)
+    summary = runner.run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+    assert summary["answered"] == len(QUERIES) and summary["failed"] == 0
+
+    results = read_results(tmp_path / "out.jsonl")
+    assert sorted(r["id"] for r in results) == [f"q{i}" for i in range(len(QUERIES))]
+    for result in results:
+        assert result["answer"] and result["error"] is None
+        assert 0 < len(result["review_ids"]) <= config.FUSED_RETRIEVED_DOCUMENTS
+        assert set(result["timings_ms"]) == {"embedding_ms", "retrieval_ms", "generation_ms"}
+
+
+def test_batch_retrieval_matches_per_query_retrieval(runner):
+    documents, _ = runner.retrieve_batch(QUERIES)
+    for query, docs in zip(QUERIES, documents):
+        single, _ = runner.retrieve_batch([query])
+        assert [d.metadata["review_id"] for d in docs] == [
+            d.metadata["review_id"] for d in single[0]
+        ]
+
+
+def test_filtered_questions_are_answered_from_the_same_reviews_as_in_chat(runner):
+    query = "4-star reviews from August 2025 about the learning curve"
+    metadata_filter, _ = extract_filter(query)
+    assert metadata_filter is not None
+    (fused,), _ = runner.retrieve_batch([query])
+    assert fused and all(
+        metadata_filter.matches(
+            doc.metadata["rating"], parse_review_month(doc.metadata["review_date"])
+        )
+        for doc in fused
+    )
+    # Each half matches the retriever the chat uses
+    chat_dense = ScoredVectorStoreRetriever(
+        vectorstore=runner.vector_store,
+        search_kwargs={"k": runner.dense_k},
+        metadata_index=runner.metadata_index,
+    )
+    rest, metadata_filter, rows = runner.metadata_index.restrict(query)
+    vectors = runner.embeddings.embed_documents([rest])
+    dense = runner._dense_search(vectors, [(metadata_filter, rows)])[0]
+    assert dense == chat_dense.invoke(query)
+    assert runner.sparse_retriever.search_batch([query])[0] == (
+        runner.sparse_retriever.invoke(query)
+    )
+
+
+def test_resumes_after_an_interrupted_run(runner, tmp_path):
+    write_queries(tmp_path / "in.jsonl", QUERIES)
+    out = tmp_path / "out.jsonl"
+    # Two answers, one failure, and a line cut short by a crash
+    out.write_text(
+        json.dumps({"id": "q0", "answer": "a", "error": None}) + "\n"
+        + json.dumps({"id": "q1", "answer": "b", "error": None}) + "\n"
+        + json.dumps({"id": "q2", "answer": None, "error": "Timeout"}) + "\n"
+        + '{"id": "q3", "ans'
+    )
+    assert answered_ids(str(out)) == {"q0", "q1"}
+
+    summary = runner.run(str(tmp_path / "in.jsonl"), str(out))
+    assert summary["skipped"] == 2 and summary["answered"] == 3
+    assert answered_ids(str(out)) == {f"q{i}" for i in range(len(QUERIES))}
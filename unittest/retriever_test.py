@@ -0,0 +1,133 @@
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+from src.rag.reranker import Reranker
+from src.rag.retriever import ParallelEnsembleRetriever, RerankingRetriever
+import asyncio
+import pytest
+import time
+
+
+def stub_retriever(name, latency=0.0, error=None):
+    """Returns two documents of its own after `latency` seconds."""
+
+    def documents():
+        if error is not None:
+            raise error
+        return [Document(page_content=f"{name} {i}") for i in range(2)]
+
+    def retrieve(query):
+        time.sleep(latency)
+        return documents()
+
+    async def aretrieve(query):
+        await asyncio.sleep(latency)
+        return documents()
+
+    return RunnableLambda(retrieve, afunc=aretrieve)
+
+
+def ensemble(*retrievers, timeout=None):
+    return ParallelEnsembleRetriever(
+        retrievers=list(retrievers),
+        names=[f"r{i}" for i in range(len(retrievers))],
+        timeout=timeout,
+    )
+
+
+def test_retrievers_run_concurrently():
+    retriever = ensemble(stub_retriever("dense", 0.2), stub_retriever("sparse", 0.2))
+    for invoke in (retriever.invoke, lambda q: asyncio.run(retriever.ainvoke(q))):
+        start = time.perf_counter()
+        docs = invoke("query")
+        assert time.perf_counter() - start < 0.35
+        assert {doc.page_content for doc in docs} == {
+            "dense 0",
+            "dense 1",
+            "sparse 0",
+            "sparse 1",
+        }
+    stats = retriever.latency_stats()
+    assert stats["r0"]["calls"] == 2
+    assert 150 < stats["r0"]["p50_ms"] < 350
+
+
+def test_slow_or_failing_retriever_is_left_out():
+    retriever = ensemble(
+        stub_retriever("dense", 1.0),
+        stub_retriever("sparse", 0.0),
+        stub_retriever("broken", error=ValueError("boom")),
+        timeout=0.2,
+    )
+    for invoke in (retriever.invoke, lambda q: asyncio.run(retriever.ainvoke(q))):
+        start = time.perf_counter()
+        docs = invoke("query")
+        assert time.perf_counter() - start < 0.5
+        assert [doc.page_content for doc in docs] == ["sparse 0", "sparse 1"]
+    stats = retriever.latency_stats()
+    assert stats["r0"]["timeouts"] == 2
+    assert stats["r1"]["timeouts"] == stats["r1"]["errors"] == 0
+    assert stats["r2"]["errors"] == 2
+
+
+def test_time_queued_for_a_thread_is_not_a_timeout():
+    # One thread for two 0.1 s searches: the second waits 0.1 s to start
+    retriever = ParallelEnsembleRetriever(
+        retrievers=[stub_retriever("dense", 0.1), stub_retriever("sparse", 0.1)],
+        names=["r0", "r1"],
+        timeout=0.15,
+        max_workers=1,
+    )
+    docs = retriever.invoke("query")
+    assert len(docs) == 4
+    stats = retriever.latency_stats()
+    assert stats["r0"]["timeouts"] == stats["r1"]["timeouts"] == 0
+
+
+def test_error_is_raised_when_every_retriever_fails():
+    retriever = ensemble(stub_retriever("dense", error=ValueError("boom")))
+    with pytest.raises(ValueError):
+        retriever.invoke("query")
+
+
+class LengthReranker(Reranker):
+    """Prefers longer reviews, after `latency` seconds."""
+
+    def __init__(self, latency=0.0, error=None):
+        super().__init__()
+        self.latency = latency
+        self.error = error
+
+    def score(self, query, documents):
+        time.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return [len(doc.page_content) for doc in documents]
+
+
+def candidates_retriever():
+    docs = [Document(page_content="x" * length) for length in (1, 3, 2, 4)]
+    return RunnableLambda(lambda query: docs)
+
+
+def test_reranker_keeps_best_top_n():
+    retriever = RerankingRetriever(
+        retriever=candidates_retriever(), reranker=LengthReranker(), top_n=2, timeout=1.0
+    )
+    for invoke in (retriever.invoke, lambda q: asyncio.run(retriever.ainvoke(q))):
+        assert [doc.page_content for doc in invoke("query")] == ["xxxx", "xxx"]
+    assert retriever.latency_stats()["reranker"]["calls"] == 2
+
+
+def test_slow_or_failing_reranker_keeps_fused_order():
+    for reranker, outcome in [
+        (LengthReranker(latency=0.5), "timeouts"),
+        (LengthReranker(error=ValueError("boom")), "errors"),
+    ]:
+        retriever = RerankingRetriever(
+            retriever=candidates_retriever(), reranker=reranker, top_n=2, timeout=0.1
+        )
+        for invoke in (retriever.invoke, lambda q: asyncio.run(retriever.ainvoke(q))):
+            start = time.perf_counter()
+            assert [doc.page_content for doc in invoke("query")] == ["x", "xxx"]
+            assert time.perf_counter() - start < 0.4
+        assert retriever.latency_stats()["reranker"][outcome] == 2
@@ -0,0 +1,152 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from src.bot.router import (
+    CascadeRouter,
+    CentroidRouter,
+    KeywordRouter,
+    LlmRouter,
+    build_router,
+)
+from src.common import config
+from src.rag.llms import FakeLLM
+import asyncio
+import pytest
+
+
+EXAMPLES = {"rag": ["rag example"], "chat": ["chat example"]}
+# Queries at a known position between the two route centroids
+VECTORS = {
+    "rag example": [1.0, 0.0],
+    "chat example": [0.0, 1.0],
+    "clearly rag": [1.0, 0.1],  # margin ~0.90 for "rag"
+    "leaning chat": [0.45, 0.55],  # margin ~0.14 for "chat"
+    "ambiguous": [0.51, 0.49],  # margin ~0.03 for "rag"
+}
+
+
+class TableEmbedding(Embeddings):
+    """Embeds the texts of VECTORS and counts the queries it embedded."""
+
+    def __init__(self):
+        self.queries = 0
+
+    def embed_documents(self, texts):
+        return [VECTORS[text] for text in texts]
+
+    def embed_query(self, text):
+        self.queries += 1
+        return VECTORS[text]
+
+
+def keyword_router():
+    return KeywordRouter(["jira", "story points"], ["hi", "thank you"])
+
+
+def cascade(llm_route=None, centroid=True, min_margin=0.1):
+    embeddings = TableEmbedding()
+    return (
+        CascadeRouter(
+            keyword_router=keyword_router(),
+            centroid_router=CentroidRouter(embeddings, EXAMPLES) if centroid else None,
+            llm_router=(
+                LlmRouter(FakeLLM(route=llm_route).get_llm()) if llm_route else None
+            ),
+            min_margin=min_margin,
+        ),
+        embeddings,
+    )
+
+
+@pytest.mark.parametrize(
+    "query, route",
+    [
+        ("What do Jira users complain about?", "rag"),
+        ("How are STORY POINTS estimated?", "rag"),
+        ("hi there", "chat"),
+        ("Thank you!", "chat"),
+        # Both routes match: the keyword stage does not decide
+        ("Hi, what do people think of Jira?", None),
+        # Only whole words count
+        ("Any hiking tips?", None),
+        ("What are story pointers?", None),
+    ],
+)
+def test_keyword_router(query, route):
+    decision = keyword_router().route(query)
+
+    assert decision.stage == "keyword"
+    assert decision.route == route
+    assert decision.confidence == (1.0 if route else 0.0)
+
+
+def test_centroid_router_reports_margin():
+    router = CentroidRouter(TableEmbedding(), EXAMPLES)
+
+    decision = router.route("leaning chat")
+    assert decision.route == "chat"
+    assert decision.stage == "centroid"
+    assert decision.confidence == pytest.approx(0.14, abs=0.01)
+
+
+def test_cascade_keywords_skip_models():
+    router, embeddings = cascade(llm_route="chat")
+
+    decision = router.route("Is Jira good for agile teams?")
+    assert (decision.route, decision.stage) == ("rag", "keyword")
+    assert embeddings.queries == 0
+
+
+def test_cascade_confident_centroid_skips_llm():
+    router, _ = cascade(llm_route="chat")
+
+    decision = router.route("clearly rag")
+    assert (decision.route, decision.stage) == ("rag", "centroid")
+    assert decision.confidence >= router.min_margin
+
+
+def test_cascade_low_margin_asks_llm():
+    router, _ = cascade(llm_route="chat")
+
+    decision = router.route("ambiguous")
+    assert (decision.route, decision.stage) == ("chat", "llm")
+    decision = asyncio.run(router.aroute("ambiguous"))
+    assert (decision.route, decision.stage) == ("chat", "llm")
+
+
+def test_cascade_low_margin_without_llm_keeps_centroid_guess():
+    router, _ = cascade()
+
+    decision = router.route("ambiguous")
+    assert (decision.route, decision.stage) == ("rag", "centroid")
+    assert decision.confidence < router.min_margin
+
+
+def test_cascade_falls_back_to_chat():
+    router, _ = cascade(centroid=False)
+
+    for decision in (
+        router.route("Hi, what do people think of Jira?"),
+        asyncio.run(router.aroute("ambiguous")),
+    ):
+        assert (decision.route, decision.stage) == ("chat", "fallback")
+        assert decision.latency_ms >= 0.0
+
+
+def test_build_router():
+    llm = FakeLLM(route="chat").get_llm()
+    embeddings = DeterministicFakeEmbedding(size=16)
+
+    router = build_router("cascade", chat_model=llm, embeddings=embeddings)
+    assert isinstance(router, CascadeRouter)
+    assert router.min_margin == config.ROUTER_CENTROID_MIN_MARGIN
+    assert router.centroid_router.routes == list(config.ROUTER_EXAMPLES)
+    assert router.route("hello").stage == "keyword"
+    assert router.route("What do reviews say about sprints?").route == "rag"
+
+    # Without a chat model the cascade has no LLM stage
+    assert build_router("cascade", embeddings=embeddings).llm_router is None
+    assert isinstance(build_router("llm", chat_model=llm), LlmRouter)
+    assert build_router("llm", chat_model=llm).route("anything").route == "chat"
+    with pytest.raises(ValueError):
+        build_router("llm")
+    with pytest.raises(ValueError):
+        build_router("unknown", chat_model=llm, embeddings=embeddings)
@@ -0,0 +1,107 @@
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
+from src.bot import server, service
+from src.bot.checkpointer import SqliteCheckpointer, build_checkpointer
+from src.bot.graph import GraphBuilder
+from src.bot.router import build_router
+from src.common import config
+from src.common.utils import lazy
+from src.rag.llms import FakeLLM
+from src.rag.rag_executor import RAGExecutor
+import json
+import pytest
+
+
+DOCUMENTS = [
+    Document(
+        page_content="pros: Great for sprints.",
+        metadata={"author": "Test A.", "review_date": "June 2024", "rating": 5.0},
+    )
+]
+
+
+def build_graph(checkpointer):
+    llm = FakeLLM().get_llm()
+    return GraphBuilder.build_graph(
+        chat_model=llm,
+        rag_agent=RAGExecutor(retriever=RunnableLambda(lambda q: DOCUMENTS), llm=llm),
+        router=build_router("llm", chat_model=llm),
+        speculative_retrieval=False,
+        checkpointer=checkpointer,
+    )
+
+
+def messages(saver, thread_id: str) -> list:
+    stored = saver.get_tuple({"configurable": {"thread_id": thread_id}})
+    return stored.checkpoint["channel_values"]["messages"] if stored else []
+
+
+def test_chat_api_streams_and_saves_each_turn(tmp_path, monkeypatch):
+    saver = SqliteCheckpointer(str(tmp_path / "checkpoints.sqlite"))
+    graph = build_graph(saver)
+    monkeypatch.setattr(service, "get_chatbot_graph", lazy(lambda: graph))
+    monkeypatch.setattr(server, "get_chatbot_graph", service.get_chatbot_graph)
+    client = TestClient(server.create_app())
+
+    for i in range(2):
+        response = client.post("/chat", json={"thread_id": "t", "message": f"Is Jira good? #{i}"})
+        events = [json.loads(line) for line in response.text.splitlines()]
+        answer = ""
+        for event in events:
+            answer = event["text"] if event["replace"] else answer + event["text"]
+        assert answer == FakeLLM().get_llm().response
+        # Committed before the response ended: nothing is left in the queue
+        assert saver.stats()["queued_writes"] == 0
+    assert len(messages(saver, "t")) == 4
+
+    assert client.delete("/threads/t").status_code == 200
+    assert messages(saver, "t") == []
+    assert client.get("/health").json()["pid"] > 0
+    saver.close()
+
+
+def test_turns_of_a_conversation_can_alternate_between_workers(tmp_path):
+    # Two workers: their own checkpointer connection on one database, without
+    # the per-process cache, each turn committed before the next (see serve)
+    path = str(tmp_path / "checkpoints.sqlite")
+    savers = [SqliteCheckpointer(path, max_cached_threads=0) for _ in range(2)]
+    graphs = [build_graph(saver) for saver in savers]
+    for turn in range(6):
+        worker = turn % 2
+        graphs[worker].invoke(
+            {"messages": [HumanMessage(content=f"Is Jira good for sprints? #{turn}")]},
+            {"configurable": {"thread_id": "shared"}},
+        )
+        savers[worker].flush()
+    history = messages(savers[0], "shared")
+    questions = [m.content for m in history if isinstance(m, HumanMessage)]
+    assert questions[-3:] == [f"Is Jira good for sprints? #{turn}" for turn in (3, 4, 5)]
+    assert len(history) == min(12, savers[0].max_messages or 12)
+    for saver in savers:
+        saver.close()
+
+
+def test_workers_checkpointer_is_configured_explicitly(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHECKPOINTER_TYPE", "sqlite")
+    monkeypatch.setattr(config, "CHECKPOINT_DB_PATH", str(tmp_path / "checkpoints.sqlite"))
+    cached = config.CHECKPOINT_MAX_CACHED_THREADS
+    saver = build_checkpointer(max_cached_threads=0)
+    assert saver.max_cached_threads == 0
+    # Nothing process-wide changes
+    assert config.CHECKPOINT_MAX_CACHED_THREADS == cached
+
+    built = {}
+    monkeypatch.setattr(service, "get_chatbot_graph", lazy(service.get_chatbot_graph.__wrapped__))
+    monkeypatch.setattr(service, "_graph_checkpointer", [])
+    monkeypatch.setattr(service, "load_llm", lambda llm_type: FakeLLM().get_llm())
+    monkeypatch.setattr(
+        service.GraphBuilder, "build_graph", lambda **kwargs: built.update(kwargs)
+    )
+    service.use_checkpointer(saver)
+    service.get_chatbot_graph()
+    assert built["checkpointer"] is saver
+    with pytest.raises(RuntimeError):
+        service.use_checkpointer(saver)
+    saver.close()
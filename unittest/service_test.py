@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.bot import service
+from src.common import config
+from src.common.utils import lazy
+from src.rag.embeddings import HfEmbedder
+from src.rag.rag_executor import get_rag_agent
+from ingest import ingest_data
+import json
+import subprocess
+import sys
+import threading
+import time
+
+
+HEAVY_MODULES = (
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "langchain_huggingface",
+    "langchain_google_genai",
+    "chromadb",
+)
+
+
+def test_importing_the_app_modules_loads_no_model():
+    code = (
+        "import sys, src.bot.service; "
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip().splitlines()[-1] == "[]"
+
+
+def test_lazy_factory_builds_once_across_threads():
+    calls = []
+    started = threading.Event()
+
+    @lazy
+    def component():
+        started.set()
+        time.sleep(0.05)
+        calls.append(1)
+        return object()
+
+    assert not component.loaded()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        instances = list(pool.map(lambda _: component(), range(8)))
+    assert len(calls) == 1 and all(i is instances[0] for i in instances)
+    assert component.loaded()
+
+    component.cache_clear()
+    assert component() is not instances[0] and len(calls) == 2
+
+
+def test_warm_up_builds_the_components_and_sets_readiness(tmp_path, monkeypatch):
+    reviews_path = tmp_path / "reviews.json"
+    reviews_path.write_text(
+        json.dumps(
+            [
+                {"review_detail": "pros: Sprint boards are clear.", "rating": 5},
+                {"review_detail": "cons: Workflows are complex.", "rating": 3},
+            ]
+        ),
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(config, "REVIEW_DATA_PATH", str(reviews_path))
+    for name in (
+        "DB_PERSIST_DIRECTORY",
+        "DOCSTORE_DIRECTORY",
+        "BM25_INDEX_DIRECTORY",
+        "DENSE_INDEX_DIRECTORY",
+        "METADATA_INDEX_DIRECTORY",
+        "INGEST_MANIFEST_PATH",
+        "INGEST_CHECKPOINT_PATH",
+        "EMBEDDING_CACHE_DIRECTORY",
+    ):
+        monkeypatch.setattr(config, name, str(tmp_path / name.lower()))
+    monkeypatch.setattr(config, "CHECKPOINT_DB_PATH", str(tmp_path / "checkpoints.sqlite"))
+    monkeypatch.setattr(config, "LLM_TYPE", "fake")
+    embeddings = DeterministicFakeEmbedding(size=32)
+    monkeypatch.setattr(HfEmbedder, "_embeddings", embeddings)
+    ingest_data(embeddings=embeddings)
+
+    monkeypatch.setattr(service, "_ready", threading.Event())
+    monkeypatch.setattr(service, "_status", {"status": "cold", "seconds": None, "error": None})
+    get_rag_agent.cache_clear()
+    service.get_chatbot_graph.cache_clear()
+    try:
+        assert not service.is_ready() and not get_rag_agent.loaded()
+        service.start_warm_up().join()
+        readiness = service.readiness()
+        assert service.is_ready() and readiness["status"] == "ready"
+        assert readiness["seconds"] > 0
+        assert get_rag_agent.loaded() and service.get_chatbot_graph.loaded()
+    finally:
+        get_rag_agent.cache_clear()
+        service.get_chatbot_graph.cache_clear()
@@ -0,0 +1,145 @@
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import MemorySaver
+from src.bot.graph import GraphBuilder, PrefetchedDocuments
+from src.bot.router import RouteDecision, Router
+from src.rag.llms import FakeLLM
+from src.rag.rag_executor import RAGExecutor
+import asyncio
+import time
+
+
+DOCUMENTS = [
+    Document(
+        page_content="pros: Great for sprints.",
+        metadata={"author": "Test A.", "review_date": "June 2024", "rating": 5.0},
+    )
+]
+DELAY = 0.1
+
+
+class StubRouter(Router):
+    """Takes `DELAY` seconds to pick `route`, or fails when it is None."""
+
+    def __init__(self, route):
+        super().__init__()
+        self.fixed_route = route
+
+    def route(self, query: str) -> RouteDecision:
+        time.sleep(DELAY)
+        if self.fixed_route is None:
+            raise RuntimeError("router down")
+        return RouteDecision(route=self.fixed_route, stage="keyword", confidence=1.0)
+
+
+class StubRetriever:
+    """Takes `DELAY` seconds to return DOCUMENTS and counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def retrieve(self, query: str):
+        self.calls += 1
+        time.sleep(DELAY)
+        return DOCUMENTS
+
+
+def build_graph(route):
+    llm = FakeLLM().get_llm()
+    retriever = StubRetriever()
+    graph = GraphBuilder.build_graph(
+        chat_model=llm,
+        rag_agent=RAGExecutor(retriever=RunnableLambda(retriever.retrieve), llm=llm),
+        router=StubRouter(route),
+        speculative_retrieval=True,
+        checkpointer=MemorySaver(),
+    )
+    return graph, retriever
+
+
+def ask(graph, query="Is Jira good for agile teams?"):
+    return graph.invoke(
+        {"messages": [HumanMessage(content=query)]},
+        {"configurable": {"thread_id": "t"}},
+    )
+
+
+def contains_document(value) -> bool:
+    if isinstance(value, Document):
+        return True
+    if isinstance(value, dict):
+        return any(contains_document(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(contains_document(v) for v in value)
+    return False
+
+
+def test_rag_route_answers_from_prefetched_documents():
+    graph, retriever = build_graph("rag")
+    result = ask(graph)
+
+    assert result["route"] == "rag"
+    assert result["messages"][-1].content
+    # RAGNode used the prefetched documents instead of retrieving again
+    assert retriever.calls == 1
+    timings = result["timings"]
+    assert timings["route_ms"] >= DELAY * 1000
+    assert timings["retrieval_ms"] >= DELAY * 1000
+    # Routing and retrieval ran concurrently
+    assert timings["dispatch_ms"] < (timings["route_ms"] + timings["retrieval_ms"])
+    assert timings["overlap_saved_ms"] > DELAY * 1000 / 2
+
+
+def test_chat_route_discards_retrieval():
+    graph, retriever = build_graph("chat")
+    result = ask(graph)
+
+    assert result["route"] == "chat"
+    assert result["prefetch_id"] is None
+    assert result["timings"]["retrieval_ms"] is None
+    assert result["messages"][-1].content
+
+
+def test_router_failure_falls_back_to_chat():
+    graph, _ = build_graph(None)
+    assert ask(graph)["route"] == "chat"
+
+
+def test_prefetched_documents_are_not_checkpointed():
+    graph, _ = build_graph("rag")
+    ask(graph)
+    ask(graph, "What do reviewers say about Jira dashboards?")
+
+    # Every checkpoint, including the one after the dispatch node
+    history = list(graph.get_state_history({"configurable": {"thread_id": "t"}}))
+    assert len(history) > 4
+    assert not any(contains_document(snapshot.values) for snapshot in history)
+
+
+def test_prefetched_documents_are_handed_over_once():
+    prefetched = PrefetchedDocuments(max_entries=2)
+    first = prefetched.put(DOCUMENTS)
+    assert prefetched.pop(first) == DOCUMENTS
+    assert prefetched.pop(first) is None
+    assert prefetched.pop(None) is None
+
+    # Hand-offs left behind by failed turns are dropped, oldest first
+    ids = [prefetched.put(DOCUMENTS) for _ in range(3)]
+    assert prefetched.pop(ids[0]) is None
+    assert prefetched.pop(ids[2]) == DOCUMENTS
+
+
+def test_async_rag_route_uses_prefetched_documents():
+    graph, retriever = build_graph("rag")
+    result = asyncio.run(
+        graph.ainvoke(
+            {"messages": [HumanMessage(content="Is Jira good for agile teams?")]},
+            {"configurable": {"thread_id": "t"}},
+        )
+    )
+
+    assert result["route"] == "rag"
+    assert result["messages"][-1].content
+    assert retriever.calls == 1
+    assert result["timings"]["overlap_saved_ms"] > DELAY * 1000 / 2
@@ -0,0 +1,78 @@
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.graph import StateGraph, START, END
+from src.bot.states import State
+from src.rag.chain import LcGeneration
+from src.rag.llms import FakeLLM
+import asyncio
+import time
+
+
+DOCUMENTS = [
+    Document(
+        page_content="pros: Great for sprints.",
+        metadata={"author": "Test A.", "review_date": "June 2024", "rating": 5.0},
+    )
+]
+
+
+def make_generator(**llm_kwargs):
+    retriever = RunnableLambda(lambda query: DOCUMENTS)
+    return LcGeneration(retriever=retriever, llm=FakeLLM(**llm_kwargs).get_llm())
+
+
+def test_stream_yields_tokens_incrementally():
+    generator = make_generator()
+    tokens = list(generator.stream("Is Jira good for agile?"))
+
+    assert len(tokens) > 1
+    assert "".join(tokens) == generator.invoke("Is Jira good for agile?")
+
+
+def test_first_token_arrives_before_full_answer():
+    generator = make_generator(latency=0.01, token_latency=0.02)
+    start = time.perf_counter()
+    stream = generator.stream("Is Jira good for agile?")
+    next(stream)
+    first_token = time.perf_counter() - start
+    list(stream)
+    full_answer = time.perf_counter() - start
+
+    assert first_token < full_answer / 2
+
+
+def test_astream_matches_invoke():
+    generator = make_generator()
+
+    async def collect():
+        return [token async for token in generator.astream("Is Jira good?")]
+
+    assert "".join(asyncio.run(collect())) == generator.invoke("Is Jira good?")
+
+
+def test_tokens_reach_langgraph_messages_stream():
+    generator = make_generator()
+
+    def rag_node(state: State, config: RunnableConfig) -> dict:
+        query = state["messages"][-1].content
+        answer = "".join(generator.stream(query, config=config))
+        return {"messages": [AIMessage(content=answer)]}
+
+    graph = StateGraph(State)
+    graph.add_node("rag_search", rag_node)
+    graph.add_edge(START, "rag_search")
+    graph.add_edge("rag_search", END)
+
+    chunks = [
+        msg.content
+        for msg, metadata in graph.compile().stream(
+            {"messages": [HumanMessage(content="Is Jira good?")]},
+            stream_mode="messages",
+        )
+        if isinstance(msg, AIMessageChunk)
+        and metadata["langgraph_node"] == "rag_search"
+    ]
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == generator.invoke("Is Jira good?")